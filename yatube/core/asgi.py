@@ -0,0 +1,212 @@
+'''
+Приложение ASGI поверх обработчика Django.
+
+Django 2.2 не поддерживает ASGI, поэтому ASGIHandler переводит
+запрос ASGI в окружение WSGI и выполняет обычный обработчик Django
+в пуле из ASGI_THREADS потоков. Все, что связано с сетью, остается
+в цикле событий сервера (например, uvicorn): медленный клиент, который
+долго передает запрос или читает ответ, не занимает поток Django.
+Поток занят только на время работы представления. Потоковый ответ
+с асинхронным итератором async_streaming_content (posts.live) читается
+в цикле событий и потоков не занимает; части остальных потоковых
+ответов читаются в отдельном пуле из ASGI_STREAM_THREADS потоков,
+а не в потоках обычных запросов.
+'''
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+
+
+def _latin1(value):
+    '''Строка окружения WSGI из байтов или строки UTF-8 (PEP 3333).'''
+    if isinstance(value, str):
+        value = value.encode()
+    return value.decode('latin-1')
+
+
+def environ(scope, body):
+    '''Окружение WSGI для запроса ASGI scope с телом body.'''
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    result = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': _latin1(scope.get('root_path', '')),
+        'PATH_INFO': _latin1(scope['path']),
+        'QUERY_STRING': _latin1(scope.get('query_string', b'')),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': 'HTTP/{}'.format(scope.get('http_version', '1.1')),
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        value = value.decode('latin-1')
+        if name in result:
+            # Повторенный заголовок - значения через запятую (RFC 7230)
+            value = result[name] + ',' + value
+        result[name] = value
+    return result
+
+
+class ASGIHandler:
+    '''Приложение ASGI 3, которое выполняет обработчик WSGI в потоках.'''
+
+    def __init__(self, wsgi_handler, threads, stream_threads):
+        self.wsgi_handler = wsgi_handler
+        self.executor = ThreadPoolExecutor(
+            threads, thread_name_prefix='asgi'
+        )
+        self.stream_executor = ThreadPoolExecutor(
+            stream_threads, thread_name_prefix='asgi-stream'
+        )
+
+    def shutdown(self, wait=True):
+        '''Останавливает пулы потоков.'''
+        self.executor.shutdown(wait=wait)
+        self.stream_executor.shutdown(wait=wait)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError('Неподдерживаемый тип ASGI: ' + scope['type'])
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        '''Тело запроса; None, если клиент отключился раньше.'''
+        body = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                body.seek(0)
+                return body
+
+    def respond(self, environ):
+        '''
+        Выполняет обработчик Django: (статус, заголовки, тело) или
+        (статус, заголовки, итератор частей) для потокового ответа.
+        '''
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers
+            ]
+
+        response = self.wsgi_handler(environ, start_response)
+        if getattr(response, 'streaming', False):
+            return started['status'], started['headers'], response
+        try:
+            # Тело обычного ответа собирается в том же потоке:
+            # закрытие ответа закрывает соединения с базой этого потока
+            return started['status'], started['headers'], b''.join(response)
+        finally:
+            response.close()
+
+    async def http(self, scope, receive, send):
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            status, headers, content = await loop.run_in_executor(
+                self.executor, self.respond, environ(scope, body)
+            )
+        finally:
+            body.close()
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': headers,
+        })
+        if isinstance(content, bytes):
+            await send({'type': 'http.response.body', 'body': content})
+            return
+        await self.stream(content, receive, send)
+
+    async def chunks(self, response):
+        '''
+        Части потокового ответа: из его асинхронного итератора
+        async_streaming_content, если он есть, иначе из обычного
+        итератора в потоках пула stream_executor.
+        '''
+        content = getattr(response, 'async_streaming_content', None)
+        if content is not None:
+            async for chunk in content:
+                yield response.make_bytes(chunk)
+            return
+        loop = asyncio.get_running_loop()
+        chunks = iter(response)
+        while True:
+            chunk = await loop.run_in_executor(
+                self.stream_executor, next, chunks, None
+            )
+            if chunk is None:
+                return
+            yield chunk
+
+    async def stream(self, response, receive, send):
+        '''Передает части потокового ответа, пока клиент подключен.'''
+        loop = asyncio.get_running_loop()
+        disconnected = asyncio.ensure_future(self.disconnect(receive))
+        chunks = self.chunks(response)
+        try:
+            async for chunk in chunks:
+                if disconnected.done():
+                    return
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnected.cancel()
+            await chunks.aclose()
+            await loop.run_in_executor(self.stream_executor, response.close)
+
+    async def disconnect(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+
+def get_asgi_application():
+    '''Приложение ASGI проекта, аналог get_wsgi_application.'''
+    django.setup(set_prefix=False)
+    return ASGIHandler(
+        WSGIHandler(), settings.ASGI_THREADS, settings.ASGI_STREAM_THREADS
+    )
@@ -0,0 +1,124 @@
+'''
+Вспомогательные функции кеширования.
+
+Поколения (generations) — счетчики в кеше, которые входят в ключи
+закешированных данных. Смена поколения делает старые ключи
+недостижимыми, поэтому сбрасывать каждую запись по отдельности
+не нужно. Изменения в транзакции сбрасывают поколения дважды
+(bump_generations_on_commit): сразу и после фиксации, иначе запрос,
+прочитавший данные до фиксации, закешировал бы их под новым поколением.
+Поколение помнит время своего начала: запрос, прочитавший молодое
+поколение, дальше читает с основной базы (core.routers.check_lag),
+чтобы не закешировать под ним данные отстающей реплики.
+
+get_or_recompute защищает от лавины пересчетов: значение
+пересчитывается заранее с вероятностью, растущей к концу срока жизни
+(probabilistic early recomputation), а пересчет выполняет только тот
+процесс, который взял блокировку; остальные отдают прежнее значение.
+'''
+import math
+import random
+import time
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+
+from core import routers
+
+GENERATION_KEY = 'generation:{}'
+# Сколько секунд держится блокировка пересчета
+LOCK_TIMEOUT = 30
+# Сколько раз и с каким интервалом ждать чужого пересчета
+LOCK_WAIT_ATTEMPTS = 10
+LOCK_WAIT_INTERVAL = 0.05
+
+
+def _new_generation():
+    # Время начала поколения (Unix, hex) и случайная часть
+    return '{:x}-{}'.format(int(time.time()), uuid.uuid4().hex[:8])
+
+
+def _started(generation):
+    started, separator, _ = generation.partition('-')
+    if not separator:
+        # Поколение прежнего формата без времени считаем давним
+        return 0
+    return int(started, 16)
+
+
+def generations(*names, using='default'):
+    '''Текущие поколения, склеенные в одну строку для ключа кеша.'''
+    cache = caches[using]
+    keys = [GENERATION_KEY.format(name) for name in names]
+    values = cache.get_many(keys)
+    missing = {key: _new_generation() for key in keys if key not in values}
+    if missing:
+        # Поколение вытеснено из кеша: начинаем новое, а не нулевое,
+        # чтобы не прочитать записи, сохраненные до вытеснения
+        cache.set_many(missing, None)
+        values.update(missing)
+    if values:
+        routers.check_lag(max(map(_started, values.values())))
+    return '.'.join(values[key] for key in keys)
+
+
+def bump_generations(*names, using='default'):
+    '''Начинает новые поколения: все ключи с прежними устаревают.'''
+    if names:
+        caches[using].set_many(
+            {GENERATION_KEY.format(name): _new_generation()
+             for name in names},
+            None,
+        )
+
+
+def bump_generations_on_commit(*names, using='default'):
+    '''
+    Начинает новые поколения сейчас, а внутри транзакции - еще раз
+    после ее фиксации.
+    '''
+    bump_generations(*names, using=using)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(
+            lambda: bump_generations(*names, using=using)
+        )
+
+
+def get_or_recompute(key, compute, timeout, beta=1.0, using='fragments'):
+    '''
+    Значение по ключу; при отсутствии или скором устаревании
+    пересчитывается вызовом compute() не более чем одним процессом.
+    '''
+    cache = caches[using]
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires = entry
+        # Чем дороже пересчет (delta) и ближе срок, тем вероятнее
+        # пересчитать заранее
+        jitter = -delta * beta * math.log(1.0 - random.random())
+        if time.time() + jitter < expires:
+            return value
+    lock = '{}:lock'.format(key)
+    locked = cache.add(lock, 1, LOCK_TIMEOUT)
+    if not locked:
+        if entry is not None:
+            return entry[0]
+        for _ in range(LOCK_WAIT_ATTEMPTS):
+            time.sleep(LOCK_WAIT_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+    try:
+        started = time.time()
+        value = compute()
+        finished = time.time()
+        # Запись живет дольше логического срока, чтобы во время
+        # пересчета остальные процессы отдавали прежнее значение
+        cache.set(
+            key, (value, finished - started, finished + timeout), timeout * 2
+        )
+    finally:
+        if locked:
+            cache.delete(lock)
+    return value
@@ -0,0 +1,107 @@
+'''
+Бэкенд кеша со счетчиками попаданий и промахов.
+
+StatsCache оборачивает любой бэкенд Django, указанный в
+OPTIONS['BACKEND'], и считает попадания и промахи для своего
+псевдонима (OPTIONS['ALIAS']). Счетчики общие для всех потоков
+процесса; снимок возвращает cache_stats(). Отдельно ведутся счетчики
+текущего потока (thread_cache_stats()): по их приросту за запрос
+core.middleware.PerformanceMiddleware узнает попадания этого запроса.
+'''
+import threading
+from collections import defaultdict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.base import BaseCache
+from django.utils.module_loading import import_string
+
+_MISSING = object()
+_lock = threading.Lock()
+_stats = defaultdict(lambda: {'hits': 0, 'misses': 0})
+_thread = threading.local()
+
+
+def _count(alias, hits, misses):
+    with _lock:
+        _stats[alias]['hits'] += hits
+        _stats[alias]['misses'] += misses
+    _thread.hits = getattr(_thread, 'hits', 0) + hits
+    _thread.misses = getattr(_thread, 'misses', 0) + misses
+
+
+def thread_cache_stats():
+    '''Попадания и промахи всех кешей в текущем потоке с его запуска.'''
+    return getattr(_thread, 'hits', 0), getattr(_thread, 'misses', 0)
+
+
+def cache_stats():
+    '''Попадания, промахи и доля попаданий по псевдонимам кешей.'''
+    with _lock:
+        snapshot = {alias: dict(stats) for alias, stats in _stats.items()}
+    for stats in snapshot.values():
+        total = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / total if total else None
+    return snapshot
+
+
+def reset_cache_stats():
+    with _lock:
+        _stats.clear()
+
+
+class StatsCache(BaseCache):
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        backend = options.pop('BACKEND')
+        self.alias = options.pop('ALIAS', location)
+        super().__init__(params)
+        self._cache = import_string(backend)(
+            location, dict(params, OPTIONS=options)
+        )
+
+    def get(self, key, default=None, version=None):
+        value = self._cache.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            _count(self.alias, 0, 1)
+            return default
+        _count(self.alias, 1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = self._cache.get_many(keys, version=version)
+        _count(self.alias, len(values), len(keys) - len(values))
+        return values
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._cache.add(key, value, timeout, version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._cache.set(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._cache.set_many(data, timeout, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._cache.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        return self._cache.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        return self._cache.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        return self._cache.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        return self._cache.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        return self._cache.decr(key, delta, version=version)
+
+    def clear(self):
+        return self._cache.clear()
+
+    def close(self, **kwargs):
+        return self._cache.close(**kwargs)
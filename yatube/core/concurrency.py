@@ -0,0 +1,106 @@
+'''
+Одновременное выполнение независимых частей представления.
+
+В Django 2.2 нет асинхронных представлений и асинхронного ORM,
+поэтому независимые запросы страницы (например, страница постов,
+счетчик постов автора и проверка подписки в профайле) выполняются
+в потоках общего пула из VIEW_THREADS потоков: у каждого потока
+свое соединение с базой, и страница ждет самый долгий запрос,
+а не сумму всех.
+
+Поток пула получает состояние запроса: чтение с реплики
+(core.routers), метрики (core.performance) и журнал запросов
+(core.queries) - его запросы учитываются в метриках запроса.
+Внутри транзакции части выполняются по очереди в текущем потоке:
+другие соединения не видят ее незафиксированных изменений (так же
+выполняются тесты, каждый из которых идет в транзакции).
+'''
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db import connections
+
+from . import performance
+from . import queries
+from . import routers
+
+_thread = threading.local()
+_lock = threading.Lock()
+_pool = None
+
+
+def _executor():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                settings.VIEW_THREADS, thread_name_prefix='view'
+            )
+        return _pool
+
+
+def _sequential():
+    return (
+        not settings.VIEW_THREADS
+        # Поток пула не ждет другие потоки пула: пул мог бы закончиться
+        or getattr(_thread, 'worker', False)
+        or any(connection.in_atomic_block for connection in connections.all())
+    )
+
+
+def _run(call, use_replica, replica, limit):
+    '''Выполняет call в потоке пула с состоянием запроса.'''
+    _thread.worker = True
+    routers.use_replica(use_replica, replica)
+    metrics = performance.start()
+    log = queries.start(limit)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(performance.query_wrapper)
+                )
+                stack.enter_context(
+                    connection.execute_wrapper(queries.query_wrapper)
+                )
+            return call(), metrics, log
+    finally:
+        performance.finish()
+        queries.finish()
+        routers.use_replica(False)
+        _thread.worker = False
+        # Соединение потока живет по правилам CONN_MAX_AGE, как после
+        # обычного запроса
+        close_old_connections()
+
+
+def run_concurrently(*calls):
+    '''
+    Выполняет функции без аргументов calls одновременно и возвращает
+    их результаты в том же порядке. Первая функция выполняется
+    в текущем потоке, остальные - в потоках пула.
+    '''
+    if len(calls) < 2 or _sequential():
+        return [call() for call in calls]
+    log = queries.current()
+    limit = settings.QUERY_REPEAT_LIMIT if log is None else log.limit
+    # Потоки пула читают с той же реплики, что и запрос
+    use_replica = routers.using_replica()
+    replica = routers.replica_alias()
+    futures = [
+        _executor().submit(_run, call, use_replica, replica, limit)
+        for call in calls[1:]
+    ]
+    results = [calls[0]()]
+    metrics = performance.current()
+    for future in futures:
+        result, worker_metrics, worker_log = future.result()
+        if metrics is not None:
+            metrics.merge(worker_metrics)
+        if log is not None:
+            log.merge(worker_log)
+        results.append(result)
+    return results
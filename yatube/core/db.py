@@ -0,0 +1,38 @@
+'''
+Настройка соединений с базой данных.
+
+На каждом новом соединении с SQLite выполняются PRAGMA из настройки
+SQLITE_PRAGMAS: журнал WAL, ожидание занятой базы и т.д.
+
+Долгоживущие соединения (CONN_MAX_AGE) перед каждым запросом
+проверяются, если в настройках базы включен CONN_HEALTH_CHECKS:
+соединение, оборванное сервером или пулом, закрывается, и Django
+открывает новое вместо того, чтобы упасть на первом же запросе.
+'''
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    '''Выполняет PRAGMA SQLite на новом соединении.'''
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute('PRAGMA {} = {}'.format(name, value))
+
+
+@receiver(request_started)
+def check_connections(**kwargs):
+    '''Закрывает долгоживущие соединения, которые перестали отвечать.'''
+    for connection in connections.all():
+        if (
+            connection.connection is not None
+            and connection.settings_dict.get('CONN_HEALTH_CHECKS')
+            and not connection.is_usable()
+        ):
+            connection.close()
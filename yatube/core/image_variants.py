@@ -0,0 +1,177 @@
+'''
+Адаптивные варианты картинок: несколько ширин в нескольких форматах.
+
+Для каждого набора из настройки IMAGE_VARIANTS картинка обрезается
+под пропорции набора и сохраняется рядом с оригиналом во всех
+ширинах и форматах из IMAGE_VARIANT_FORMATS, которые умеет записывать
+установленный Pillow (AVIF и WebP - только при поддержке). Список
+созданных файлов записывается в манифест <имя>.variants.json рядом
+с картинкой и кешируется, поэтому вывод страницы не трогает
+хранилище. Варианты создаются тем же фоновым пулом, что и миниатюры
+(см. core.thumbnails).
+'''
+import json
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+from PIL import ImageOps
+
+MANIFEST_CACHE_KEY = 'image_variants:{}'
+# Значение в кеше вместо манифеста, которого нет в хранилище
+MISSING = 'missing'
+MIME_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+}
+EXTENSIONS = {
+    'avif': 'avif',
+    'webp': 'webp',
+    'jpeg': 'jpg',
+}
+
+
+def supported_formats():
+    '''Форматы из IMAGE_VARIANT_FORMATS, которые Pillow умеет записывать.'''
+    Image.init()
+    return [
+        image_format for image_format in settings.IMAGE_VARIANT_FORMATS
+        if image_format.upper() in Image.SAVE
+    ]
+
+
+def _manifest_name(name):
+    return '{}.variants.json'.format(os.path.splitext(name)[0])
+
+
+def _variant_name(name, variant, width, image_format):
+    return '{}.{}-{}w.{}'.format(
+        os.path.splitext(name)[0], variant, width, EXTENSIONS[image_format]
+    )
+
+
+def _encode(image, image_format):
+    buffer = BytesIO()
+    if image_format == 'jpeg':
+        image.convert('RGB').save(
+            buffer,
+            'JPEG',
+            quality=settings.IMAGE_VARIANT_QUALITY,
+            optimize=True,
+            progressive=True,
+        )
+    else:
+        image.save(
+            buffer,
+            image_format.upper(),
+            quality=settings.IMAGE_VARIANT_QUALITY,
+        )
+    return buffer.getvalue()
+
+
+def _save(name, content):
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(content))
+
+
+def generate(name):
+    '''Создает все варианты картинки name и ее манифест.'''
+    formats = supported_formats()
+    manifest = {}
+    with default_storage.open(name) as source:
+        original = Image.open(source)
+        # JPEG можно сразу декодировать в уменьшенном масштабе
+        largest = max(
+            max(config['widths'])
+            for config in settings.IMAGE_VARIANTS.values()
+        )
+        original.draft('RGB', (largest, largest))
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA')
+        for variant, config in settings.IMAGE_VARIANTS.items():
+            frame_width, frame_height = config['size']
+            # Увеличенные копии не создаются: хватает исходной ширины
+            widths = [
+                width for width in sorted(config['widths'])
+                if width <= original.width
+            ] or [original.width]
+            manifest[variant] = {
+                image_format: [] for image_format in formats
+            }
+            for width in widths:
+                height = max(1, round(width * frame_height / frame_width))
+                image = ImageOps.fit(
+                    original, (width, height), Image.LANCZOS
+                )
+                for image_format in formats:
+                    variant_name = _variant_name(
+                        name, variant, width, image_format
+                    )
+                    _save(variant_name, _encode(image, image_format))
+                    manifest[variant][image_format].append(
+                        [width, variant_name]
+                    )
+    _save(_manifest_name(name), json.dumps(manifest).encode())
+    caches['thumbnails'].set(MANIFEST_CACHE_KEY.format(name), manifest)
+    return manifest
+
+
+def _manifest(name):
+    cache = caches['thumbnails']
+    key = MANIFEST_CACHE_KEY.format(name)
+    manifest = cache.get(key)
+    if manifest is None:
+        manifest = _read_manifest(name)
+        if manifest is None:
+            # Отсутствие манифеста помним недолго: его создаст фоновый
+            # поток, который заодно запишет манифест в кеш
+            cache.set(
+                key, MISSING, settings.IMAGE_VARIANT_MISSING_TIMEOUT
+            )
+            return None
+        cache.set(key, manifest)
+    if manifest == MISSING:
+        return None
+    return manifest
+
+
+def _read_manifest(name):
+    manifest_name = _manifest_name(name)
+    try:
+        if not default_storage.exists(manifest_name):
+            return None
+    except SuspiciousFileOperation:
+        # Картинка лежит вне хранилища: вариантов у нее нет
+        return None
+    with default_storage.open(manifest_name) as manifest_file:
+        return json.loads(manifest_file.read().decode())
+
+
+def exists(name):
+    '''
+    Созданы ли уже варианты картинки name. Закешированное отсутствие
+    манифеста не учитывается: хранилище проверяется заново.
+    '''
+    manifest = caches['thumbnails'].get(MANIFEST_CACHE_KEY.format(name))
+    if manifest is not None and manifest != MISSING:
+        return True
+    return _read_manifest(name) is not None
+
+
+def get(name, variant):
+    '''
+    Варианты картинки: {формат: [[ширина, имя файла], ...]} или None,
+    если они еще не созданы.
+    '''
+    manifest = _manifest(name)
+    if manifest is None:
+        return None
+    return manifest.get(variant)
@@ -0,0 +1,125 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import performance
+from . import queries
+from . import routers
+from .cache_backends import thread_cache_stats
+
+
+class PerformanceMiddleware:
+    '''
+    Замеряет время запроса, запросы к базе, вывод шаблонов, кеши
+    и размер ответа. Результат добавляется в заголовок Server-Timing
+    и в сводку процесса (core.performance).
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        hits, misses = thread_cache_stats()
+        metrics = performance.start()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(performance.query_wrapper)
+                    )
+                response = self.get_response(request)
+        finally:
+            performance.finish()
+        total = time.perf_counter() - started
+        hits, misses = [
+            after - before
+            for after, before in zip(thread_cache_stats(), (hits, misses))
+        ]
+        if settings.PERFORMANCE_SERVER_TIMING:
+            response['Server-Timing'] = metrics.server_timing(
+                total, hits, misses
+            )
+        match = request.resolver_match
+        performance.record(match.view_name if match else '<unresolved>', {
+            'total_ms': total * 1000,
+            'db_ms': metrics.db_time * 1000,
+            'queries': metrics.queries,
+            'template_ms': metrics.template_time * 1000,
+            'cache_hits': hits,
+            'cache_misses': misses,
+            # Размер потокового ответа заранее неизвестен
+            'bytes': 0 if response.streaming else len(response.content),
+        })
+        return response
+
+
+class QueryLogMiddleware:
+    '''
+    Ведет журнал запросов к базе (core.queries): сообщает о медленных
+    запросах и о повторах одного запроса сверх лимита представления.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        log = queries.start()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(queries.query_wrapper)
+                    )
+                response = self.get_response(request)
+        finally:
+            queries.finish()
+        match = request.resolver_match
+        queries.report(
+            log, match.view_name if match else '<unresolved>', request.path
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        log = queries.current()
+        if log is not None:
+            log.limit = queries.limit_for(request.resolver_match.view_name)
+
+
+class ReplicaRoutingMiddleware:
+    '''
+    Включает чтение с реплики для представлений с replica_reads,
+    если пользователь недавно ничего не записывал, и отмечает
+    пользователя cookie после успешной записи (pins_primary).
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.use_replica(False)
+        if (
+            getattr(request, 'pins_primary', False)
+            and request.user.is_authenticated
+            and response.status_code < 400
+        ):
+            response.set_cookie(
+                routers.PIN_COOKIE,
+                '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.pins_primary = getattr(view_func, 'pins_primary', False)
+        routers.use_replica(
+            getattr(view_func, 'replica_reads', False)
+            and routers.PIN_COOKIE not in request.COOKIES
+        )
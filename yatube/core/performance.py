@@ -0,0 +1,136 @@
+'''
+Метрики производительности запросов.
+
+Пока запрос обрабатывается, core.middleware.PerformanceMiddleware
+собирает его метрики в объекте текущего потока: время запросов
+к базе (через connection.execute_wrapper), время вывода шаблонов
+(см. core.template_backends), попадания и промахи кешей. Завершенный
+запрос попадает в скользящую сводку процесса по представлениям:
+для каждого хранятся последние PERFORMANCE_WINDOW замеров.
+'''
+import math
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+_thread = threading.local()
+_lock = threading.Lock()
+_endpoints = {}
+
+
+class Metrics:
+    '''Метрики одного запроса.'''
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+
+    def merge(self, other):
+        '''Добавляет метрики, собранные в другом потоке.'''
+        self.queries += other.queries
+        self.db_time += other.db_time
+        self.template_time += other.template_time
+
+    def server_timing(self, total, hits, misses):
+        '''Значение заголовка Server-Timing (время в мс).'''
+        return ', '.join((
+            'total;dur={:.1f}'.format(total * 1000),
+            'db;dur={:.1f};desc="{} queries"'.format(
+                self.db_time * 1000, self.queries
+            ),
+            'tpl;dur={:.1f}'.format(self.template_time * 1000),
+            'cache;desc="{} hits, {} misses"'.format(hits, misses),
+        ))
+
+
+def start():
+    '''Начинает сбор метрик запроса в текущем потоке.'''
+    _thread.metrics = Metrics()
+    return _thread.metrics
+
+
+def finish():
+    '''Заканчивает сбор метрик запроса в текущем потоке.'''
+    _thread.metrics = None
+
+
+def current():
+    return getattr(_thread, 'metrics', None)
+
+
+def query_wrapper(execute, sql, params, many, context):
+    '''Обертка connection.execute_wrapper: время и число запросов.'''
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics = current()
+        if metrics is not None:
+            metrics.queries += 1
+            metrics.db_time += time.perf_counter() - started
+
+
+def record_template(seconds):
+    '''Добавляет время вывода шаблона к метрикам запроса.'''
+    metrics = current()
+    if metrics is not None:
+        metrics.template_time += seconds
+
+
+def record(view_name, sample):
+    '''Добавляет замер запроса к сводке представления view_name.'''
+    with _lock:
+        samples = _endpoints.get(view_name)
+        if samples is None:
+            samples = _endpoints[view_name] = {
+                'count': 0,
+                'samples': deque(maxlen=settings.PERFORMANCE_WINDOW),
+            }
+        samples['count'] += 1
+        samples['samples'].append(sample)
+
+
+def reset():
+    with _lock:
+        _endpoints.clear()
+
+
+def percentile(values, percent):
+    '''Перцентиль по методу ближайшего ранга.'''
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _mean(samples, key):
+    return round(sum(sample[key] for sample in samples) / len(samples), 2)
+
+
+def slowest(limit=20):
+    '''Представления с наибольшим p95 времени ответа (время в мс).'''
+    with _lock:
+        endpoints = {
+            name: (data['count'], list(data['samples']))
+            for name, data in _endpoints.items()
+        }
+    summary = []
+    for name, (count, samples) in endpoints.items():
+        totals = [sample['total_ms'] for sample in samples]
+        summary.append({
+            'view': name,
+            'count': count,
+            'p50_ms': round(percentile(totals, 50), 2),
+            'p95_ms': round(percentile(totals, 95), 2),
+            'max_ms': round(max(totals), 2),
+            'db_ms': _mean(samples, 'db_ms'),
+            'queries': _mean(samples, 'queries'),
+            'template_ms': _mean(samples, 'template_ms'),
+            'cache_hits': _mean(samples, 'cache_hits'),
+            'cache_misses': _mean(samples, 'cache_misses'),
+            'bytes': _mean(samples, 'bytes'),
+        })
+    summary.sort(key=lambda item: item['p95_ms'], reverse=True)
+    return summary[:limit]
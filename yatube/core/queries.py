@@ -0,0 +1,186 @@
+'''
+Журнал запросов к базе: повторы (N+1) и медленные запросы.
+
+Пока запрос обрабатывается, core.middleware.QueryLogMiddleware
+пропускает запросы к базе через обертку connection.execute_wrapper.
+Текст каждого запроса сводится к отпечатку: литералы заменяются на ?,
+списки IN - на (...). Одинаковые отпечатки с разными параметрами -
+признак N+1, например обращения к post.author в цикле шаблона.
+
+Если отпечаток выполнился больше QUERY_REPEAT_LIMIT раз, в журнал
+core.queries пишется, откуда пришел лишний запрос: строка шаблона
+или первая строка кода проекта в стеке. Запросы дольше
+SLOW_QUERY_THRESHOLD_MS пишутся в журнал core.queries.slow
+одной строкой JSON. В строгом режиме (QUERY_STRICT, для тестов)
+превышение лимита повторов - ошибка QueryBudgetExceeded.
+'''
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger(__name__ + '.slow')
+
+_thread = threading.local()
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?(?![\w"])')
+_IN_RE = re.compile(r'\bIN \((?:\?|%s)(?:, (?:\?|%s))*\)', re.IGNORECASE)
+_SPACE_RE = re.compile(r'\s+')
+# Файлы, кадры которых не указывают на источник запроса
+_SKIPPED_FILES = {
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    for name in ('queries.py', 'middleware.py', 'performance.py')
+}
+
+
+class QueryBudgetExceeded(Exception):
+    '''Представление повторило запрос больше допустимого.'''
+
+
+def fingerprint(sql):
+    '''Текст запроса без литералов и с одинаковыми списками IN.'''
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _IN_RE.sub('IN (...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+def _project_file(filename):
+    filename = os.path.abspath(filename)
+    return (
+        filename.startswith(str(settings.BASE_DIR))
+        and 'site-packages' not in filename
+        and filename not in _SKIPPED_FILES
+    )
+
+
+def location():
+    '''
+    Откуда выполняется запрос: строка шаблона, если запрос пришел
+    из вывода шаблона, иначе первая строка кода проекта в стеке.
+    '''
+    code = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_code.co_name == 'render_annotated':
+            # Самый вложенный узел шаблона, который выводился
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                return '{}:{}'.format(
+                    origin.template_name or origin.name, token.lineno
+                )
+        if code is None and _project_file(frame.f_code.co_filename):
+            code = '{}:{} in {}'.format(
+                os.path.relpath(frame.f_code.co_filename, settings.BASE_DIR),
+                frame.f_lineno,
+                frame.f_code.co_name,
+            )
+        frame = frame.f_back
+    return code or '<unknown>'
+
+
+class QueryLog:
+    '''Отпечатки запросов к базе за время одного запроса.'''
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.counts = Counter()
+        self.locations = {}
+        self.slow = []
+
+    def add(self, sql, duration):
+        key = fingerprint(sql)
+        self.counts[key] += 1
+        # Стек разбирается только для первого лишнего повтора
+        if self.counts[key] == self.limit + 1:
+            self.locations[key] = location()
+        if duration * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+            self.slow.append({
+                'fingerprint': key,
+                'sql': sql,
+                'duration_ms': round(duration * 1000, 2),
+                'location': location(),
+            })
+
+    def merge(self, other):
+        '''Добавляет запросы, выполненные в другом потоке.'''
+        self.counts.update(other.counts)
+        for key, place in other.locations.items():
+            self.locations.setdefault(key, place)
+        self.slow.extend(other.slow)
+
+    def repeated(self):
+        '''(отпечаток, число выполнений, место) сверх лимита повторов.'''
+        return [
+            (key, count, self.locations.get(key, '<unknown>'))
+            for key, count in self.counts.most_common()
+            if count > self.limit
+        ]
+
+
+def start(limit=None):
+    '''Начинает журнал запросов в текущем потоке.'''
+    _thread.log = QueryLog(
+        settings.QUERY_REPEAT_LIMIT if limit is None else limit
+    )
+    return _thread.log
+
+
+def finish():
+    '''Заканчивает журнал запросов в текущем потоке.'''
+    _thread.log = None
+
+
+def current():
+    return getattr(_thread, 'log', None)
+
+
+def query_wrapper(execute, sql, params, many, context):
+    '''Обертка connection.execute_wrapper: отпечаток и время запроса.'''
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        log = current()
+        if log is not None:
+            log.add(sql, time.perf_counter() - started)
+
+
+def limit_for(view_name):
+    '''Лимит повторов одного отпечатка для представления.'''
+    return settings.QUERY_REPEAT_LIMITS.get(
+        view_name, settings.QUERY_REPEAT_LIMIT
+    )
+
+
+def report(log, view_name, path):
+    '''
+    Пишет медленные и повторяющиеся запросы в журналы. В строгом
+    режиме повторы сверх лимита - ошибка QueryBudgetExceeded.
+    '''
+    for query in log.slow:
+        slow_logger.warning(json.dumps(
+            dict(query, view=view_name, path=path),
+            ensure_ascii=False,
+        ))
+    repeated = log.repeated()
+    for key, count, place in repeated:
+        logger.warning(
+            'N+1 в %s: запрос выполнен %s раз: %s (%s)',
+            view_name, count, key, place,
+        )
+    if repeated and settings.QUERY_STRICT:
+        raise QueryBudgetExceeded('{}: {}'.format(view_name, '; '.join(
+            '{} раз {} ({})'.format(count, key, place)
+            for key, count, place in repeated
+        )))
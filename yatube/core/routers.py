@@ -0,0 +1,101 @@
+'''
+Чтение с реплик базы данных.
+
+Представления, помеченные декоратором replica_reads, читают данные
+с одной из реплик из настройки DATABASE_REPLICAS, остальные
+представления и любые записи работают с основной базой.
+
+Реплика отстает от основной базы, поэтому пользователь, который
+только что что-то записал (представления с декоратором pins_primary),
+REPLICA_PIN_SECONDS секунд читает с основной базы и видит свои
+изменения. Отметка хранится в cookie, ее ставит и читает
+core.middleware.ReplicaRoutingMiddleware.
+
+Страницы, прочитанные с реплики, кешируются под текущим поколением
+кеша (см. core.cache). Реплика, еще не получившая изменение, вернула
+бы прежние данные, и они закешировались бы под новым поколением.
+Поэтому запрос, прочитавший поколение моложе REPLICA_LAG_SECONDS
+(наибольшего отставания реплик), дальше читает с основной базы.
+Остальные запросы, в том числе к страницам с давними поколениями,
+по-прежнему читают с реплик.
+
+Запрос читает с одной реплики, выбранной при первом чтении: данные
+разных реплик могут расходиться.
+'''
+import random
+import threading
+import time
+
+from django.conf import settings
+
+PIN_COOKIE = 'pin_primary'
+
+_state = threading.local()
+
+
+def replica_reads(view):
+    '''Представление читает данные с реплики.'''
+    view.replica_reads = True
+    return view
+
+
+def pins_primary(view):
+    '''После записи пользователь какое-то время читает с основной базы.'''
+    view.pins_primary = True
+    return view
+
+
+def use_replica(enabled, alias=None):
+    '''
+    Включает или выключает чтение с реплики в текущем потоке;
+    alias - уже выбранная для запроса реплика.
+    '''
+    _state.use_replica = enabled
+    _state.replica = alias
+
+
+def using_replica():
+    '''Читает ли текущий поток с реплики.'''
+    return getattr(_state, 'use_replica', False)
+
+
+def replica_alias():
+    '''Псевдоним реплики для чтения или None, если читать с основной.'''
+    if not (settings.DATABASE_REPLICAS and using_replica()):
+        return None
+    alias = getattr(_state, 'replica', None)
+    if alias is None:
+        alias = _state.replica = random.choice(settings.DATABASE_REPLICAS)
+    return alias
+
+
+def check_lag(changed_at):
+    '''
+    Данные сменились в момент changed_at (Unix): если реплики могли
+    еще не получить изменение, запрос дальше читает с основной базы.
+    '''
+    if (
+        using_replica()
+        and time.time() - changed_at < settings.REPLICA_LAG_SECONDS
+    ):
+        use_replica(False)
+
+
+class ReplicaRouter:
+    '''Направляет чтения на реплику, а записи - в основную базу.'''
+
+    def db_for_read(self, model, **hints):
+        return replica_alias()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в основной базе
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схема реплик повторяет основную базу
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
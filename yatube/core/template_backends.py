@@ -0,0 +1,35 @@
+'''
+Бэкенд шаблонов Django, который замеряет время вывода шаблонов.
+
+Время вывода каждого шаблона, полученного через бэкенд (render,
+render_to_string, TemplateResponse), добавляется к метрикам текущего
+запроса (см. core.performance). Вложенные шаблоны ({% include %},
+{% extends %}) выводятся движком напрямую и входят во время
+внешнего шаблона.
+'''
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+from . import performance
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            performance.record_template(time.perf_counter() - started)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
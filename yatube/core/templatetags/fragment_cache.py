@@ -0,0 +1,50 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from core.cache import get_or_recompute
+
+register = template.Library()
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, timeout, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        timeout = int(self.timeout.resolve(context))
+        key = make_template_fragment_key(
+            self.fragment_name,
+            [var.resolve(context) for var in self.vary_on],
+        )
+        return get_or_recompute(
+            key, lambda: self.nodelist.render(context), timeout
+        )
+
+
+@register.tag
+def cache_fragment(parser, token):
+    '''
+    Кеширует фрагмент шаблона с защитой от лавины пересчетов.
+
+    {% cache_fragment timeout name [vary_on ...] %} ...
+    {% endcache_fragment %}
+
+    В отличие от {% cache %}, фрагмент пересчитывает только один
+    процесс, остальные в это время получают прежнюю версию.
+    '''
+    nodelist = parser.parse(('endcache_fragment',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            "'{}' tag requires at least 2 arguments.".format(tokens[0])
+        )
+    return FragmentCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]],
+    )
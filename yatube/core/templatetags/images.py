@@ -0,0 +1,80 @@
+from django import template
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from core import image_variants
+from core import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def pregenerated_thumbnail(image, geometry):
+    '''
+    Миниатюра картинки размера geometry из THUMBNAIL_SIZES.
+    Пока миниатюра не создана фоновым потоком, возвращает исходную
+    картинку и ставит создание миниатюр в очередь.
+
+    {% pregenerated_thumbnail post.image "960x339" as im %}
+    '''
+    if not image:
+        return None
+    thumbnail = thumbnails.cached_thumbnail(image, geometry)
+    if thumbnail is None:
+        thumbnails.schedule(image)
+        return image
+    return thumbnail
+
+
+def _srcset(variants):
+    return ', '.join(
+        '{} {}w'.format(default_storage.url(name), width)
+        for width, name in variants
+    )
+
+
+@register.inclusion_tag('includes/picture.html')
+def responsive_image(image, variant, css_class=''):
+    '''
+    Тег <picture> с вариантами картинки набора variant из IMAGE_VARIANTS:
+    современные форматы в <source>, последний формат - в <img>.
+    Пока варианты не созданы, выводит миниатюру или исходную картинку.
+
+    {% responsive_image post.image "feed" css_class="card-img" %}
+    '''
+    config = settings.IMAGE_VARIANTS[variant]
+    width, height = config['size']
+    context = {
+        'css_class': css_class,
+        'width': width,
+        'height': height,
+        'sizes': config['sizes'],
+    }
+    if not image:
+        return context
+    manifest = image_variants.get(image.name, variant)
+    if not manifest:
+        geometry = '{}x{}'.format(width, height)
+        context['src'] = pregenerated_thumbnail(image, geometry).url
+        return context
+    *modern, fallback_format = [
+        image_format for image_format in manifest if manifest[image_format]
+    ]
+    fallback_variants = manifest[fallback_format]
+    # В src - самый узкий вариант не уже кадра, для браузеров без srcset
+    src_width, src_name = next(
+        (item for item in fallback_variants if item[0] >= width),
+        fallback_variants[-1],
+    )
+    context.update({
+        'src': default_storage.url(src_name),
+        'srcset': _srcset(fallback_variants),
+        'sources': [
+            {
+                'type': image_variants.MIME_TYPES[image_format],
+                'srcset': _srcset(manifest[image_format]),
+            }
+            for image_format in modern
+        ],
+    })
+    return context
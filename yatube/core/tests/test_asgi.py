@@ -0,0 +1,217 @@
+import asyncio
+import io
+from unittest import mock
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import SimpleTestCase
+from django.test import override_settings
+from django.urls import reverse
+
+from core.asgi import ASGIHandler
+from core.asgi import environ
+from posts import live
+
+
+def scope(path, method='GET', query_string=b'', headers=()):
+    return {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query_string,
+        'headers': list(headers),
+        'http_version': '1.1',
+        'scheme': 'http',
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 5000),
+    }
+
+
+class ASGIHandlerTests(SimpleTestCase):
+    def setUp(self):
+        self.application = ASGIHandler(WSGIHandler(), 2, 2)
+        self.addCleanup(self.application.shutdown)
+
+    async def respond(self, scope, body=b''):
+        '''Сообщения ответа приложения на запрос.'''
+        messages = []
+
+        async def receive():
+            if not messages:
+                return {'type': 'http.request', 'body': body}
+            # Клиент не отключается, пока ответ не передан
+            await asyncio.sleep(60)
+
+        async def send(message):
+            messages.append(message)
+
+        await self.application(scope, receive, send)
+        return messages
+
+    def request(self, scope, body=b''):
+        return asyncio.run(self.respond(scope, body))
+
+    def test_page(self):
+        """Страница Django отдается ответом ASGI."""
+        start, body = self.request(scope(reverse('about:author')))
+        self.assertEqual(start['type'], 'http.response.start')
+        self.assertEqual(start['status'], 200)
+        self.assertIn(
+            (b'content-type', b'text/html; charset=utf-8'), start['headers']
+        )
+        self.assertEqual(body['type'], 'http.response.body')
+        self.assertIn('Об авторе'.encode(), body['body'])
+
+    def test_not_found(self):
+        start, _ = self.request(scope('/несуществующий/'))
+        self.assertEqual(start['status'], 404)
+
+    @override_settings(LIVE_HEARTBEAT=0.01, LIVE_STREAM_SECONDS=0.05)
+    def test_streaming_response(self):
+        """Потоковый ответ передается частями, последняя - пустая."""
+        start, *chunks = self.request(scope(reverse('api:live_posts')))
+        self.assertIn(
+            (b'content-type', b'text/event-stream'), start['headers']
+        )
+        self.assertTrue(chunks[0]['body'].startswith(b'retry: '))
+        self.assertTrue(all(chunk['more_body'] for chunk in chunks[:-1]))
+        self.assertEqual(
+            chunks[-1], {'type': 'http.response.body', 'body': b''}
+        )
+
+    async def open_stream(self, streaming, closed, chunks):
+        '''Поток событий, открытый до события closed.'''
+        requested = False
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {'type': 'http.request', 'body': b''}
+            await closed.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.body':
+                chunks.append(message['body'])
+                streaming.set()
+
+        await self.application(
+            scope(reverse('api:live_posts')), receive, send
+        )
+
+    def page_during_streams(self, count):
+        '''
+        Ответ страницы, запрошенной при count открытых потоках
+        событий, и части каждого потока.
+        '''
+        async def scenario():
+            closed = asyncio.Event()
+            streams = []
+            bodies = []
+            for _ in range(count):
+                streaming = asyncio.Event()
+                bodies.append([])
+                streams.append(asyncio.ensure_future(
+                    self.open_stream(streaming, closed, bodies[-1])
+                ))
+                await streaming.wait()
+            try:
+                return await asyncio.wait_for(
+                    self.respond(scope(reverse('about:author'))), 1
+                ), bodies
+            finally:
+                # Событие будит потоки, ждущие очередную часть
+                live.broker.publish(
+                    live.POSTS, live.POSTS_EVENT, {'count': 1, 'ids': [1]}
+                )
+                await asyncio.sleep(0.1)
+                closed.set()
+                live.broker.publish(
+                    live.POSTS, live.POSTS_EVENT, {'count': 1, 'ids': [2]}
+                )
+                await asyncio.gather(*streams)
+
+        (start, _), bodies = asyncio.run(scenario())
+        return start, bodies
+
+    @override_settings(LIVE_HEARTBEAT=30, LIVE_STREAM_SECONDS=60)
+    def test_stream_does_not_take_request_threads(self):
+        """Части потоковых ответов читаются не в потоках запросов."""
+        self.application = ASGIHandler(WSGIHandler(), 1, 2)
+        self.addCleanup(self.application.shutdown)
+        # Ответ без асинхронного итератора читается в потоках
+        with mock.patch.object(live, 'astream', return_value=None):
+            start, _ = self.page_during_streams(2)
+        self.assertEqual(start['status'], 200)
+
+    @override_settings(LIVE_HEARTBEAT=30, LIVE_STREAM_SECONDS=60)
+    def test_live_streams_take_no_threads(self):
+        """Потоки событий ждут в цикле событий и не занимают потоков."""
+        self.application = ASGIHandler(WSGIHandler(), 2, 1)
+        self.addCleanup(self.application.shutdown)
+        start, bodies = self.page_during_streams(3)
+        self.assertEqual(start['status'], 200)
+        for body in bodies:
+            self.assertIn(b'"ids":[1]', b''.join(body))
+
+    def test_client_disconnect_before_body(self):
+        """Запрос отключившегося клиента не выполняется."""
+        messages = []
+
+        async def receive():
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(self.application(
+            scope(reverse('about:author')), receive, send
+        ))
+        self.assertEqual(messages, [])
+
+    def test_lifespan(self):
+        events = iter([
+            {'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'},
+        ])
+        messages = []
+
+        async def receive():
+            return next(events)
+
+        async def send(message):
+            messages.append(message['type'])
+
+        asyncio.run(self.application({'type': 'lifespan'}, receive, send))
+        self.assertEqual(messages, [
+            'lifespan.startup.complete', 'lifespan.shutdown.complete',
+        ])
+
+
+class EnvironTests(SimpleTestCase):
+    def test_environ(self):
+        """Окружение WSGI строится из запроса ASGI по PEP 3333."""
+        body = io.BytesIO(b'text=1')
+        result = environ(scope(
+            '/группа/',
+            method='POST',
+            query_string=b'page=2',
+            headers=[
+                (b'content-type', b'application/x-www-form-urlencoded'),
+                (b'content-length', b'6'),
+                (b'accept', b'text/html'),
+                (b'accept', b'*/*'),
+            ],
+        ), body)
+        self.assertEqual(result['REQUEST_METHOD'], 'POST')
+        self.assertEqual(
+            result['PATH_INFO'], '/группа/'.encode().decode('latin-1')
+        )
+        self.assertEqual(result['QUERY_STRING'], 'page=2')
+        self.assertEqual(
+            result['CONTENT_TYPE'], 'application/x-www-form-urlencoded'
+        )
+        self.assertEqual(result['CONTENT_LENGTH'], '6')
+        self.assertEqual(result['HTTP_ACCEPT'], 'text/html,*/*')
+        self.assertEqual(result['SERVER_NAME'], 'testserver')
+        self.assertEqual(result['REMOTE_ADDR'], '127.0.0.1')
+        self.assertIs(result['wsgi.input'], body)
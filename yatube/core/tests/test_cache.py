@@ -0,0 +1,143 @@
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache import caches
+from django.db import transaction
+from django.test import TestCase
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from core.cache import bump_generations
+from core.cache import bump_generations_on_commit
+from core.cache import generations
+from core.cache import get_or_recompute
+from core.cache_backends import StatsCache
+from core.cache_backends import cache_stats
+from core.cache_backends import reset_cache_stats
+
+User = get_user_model()
+
+
+class GenerationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_generation_is_stable_until_bumped(self):
+        """Поколение не меняется, пока его явно не сменили."""
+        first = generations('feed')
+        self.assertEqual(first, generations('feed'))
+        bump_generations('feed')
+        self.assertNotEqual(first, generations('feed'))
+
+    def test_evicted_generation_is_not_reused(self):
+        """После вытеснения поколение начинается заново."""
+        first = generations('feed')
+        cache.clear()
+        self.assertNotEqual(first, generations('feed'))
+
+
+class BumpOnCommitTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bumped_again_after_commit(self):
+        """Поколение, прочитанное до фиксации, устаревает после нее."""
+        first = generations('feed')
+        with transaction.atomic():
+            bump_generations_on_commit('feed')
+            # Другой запрос читает прежние данные уже под новым поколением
+            during = generations('feed')
+            self.assertNotEqual(first, during)
+        self.assertNotEqual(during, generations('feed'))
+
+    def test_rollback_keeps_immediate_bump(self):
+        first = generations('feed')
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                bump_generations_on_commit('feed')
+                during = generations('feed')
+                raise ValueError
+        self.assertNotEqual(first, during)
+        self.assertEqual(during, generations('feed'))
+
+
+class GetOrRecomputeTests(TestCase):
+    def setUp(self):
+        self.cache = caches['fragments']
+        self.cache.clear()
+
+    def test_value_is_cached(self):
+        """Повторный вызов не пересчитывает значение."""
+        compute = mock.Mock(return_value='фрагмент')
+        self.assertEqual(get_or_recompute('key', compute, 60), 'фрагмент')
+        self.assertEqual(get_or_recompute('key', compute, 60), 'фрагмент')
+        compute.assert_called_once()
+
+    def test_only_lock_holder_recomputes(self):
+        """Пока другой процесс пересчитывает, отдается прежнее значение."""
+        get_or_recompute('key', lambda: 'старое', 60)
+        # Запись устарела, а блокировку держит другой процесс
+        value, delta, expires = self.cache.get('key')
+        self.cache.set('key', (value, delta, expires - 120))
+        self.cache.add('key:lock', 1)
+        compute = mock.Mock(return_value='новое')
+        self.assertEqual(get_or_recompute('key', compute, 60), 'старое')
+        compute.assert_not_called()
+
+    def test_expensive_value_is_recomputed_early(self):
+        """Дорогое значение пересчитывается до истечения срока."""
+        get_or_recompute('key', lambda: 'старое', 60)
+        value, delta, expires = self.cache.get('key')
+        # Пересчет занимает столько же, сколько осталось жить записи
+        self.cache.set('key', (value, 60.0, expires))
+        with mock.patch('core.cache.random.random', return_value=0.99):
+            self.assertEqual(
+                get_or_recompute('key', lambda: 'новое', 60), 'новое'
+            )
+
+
+class StatsCacheTests(TestCase):
+    def setUp(self):
+        reset_cache_stats()
+
+    def test_hits_and_misses_are_counted_per_alias(self):
+        """Попадания и промахи считаются для каждого псевдонима."""
+        fragments = caches['fragments']
+        fragments.set('key', 'value')
+        fragments.get('key')
+        fragments.get('missing')
+        fragments.get_many(['key', 'missing'])
+        stats = cache_stats()['fragments']
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['hit_rate'], 0.5)
+        self.assertNotIn('thumbnails', cache_stats())
+
+    def test_file_backend_is_shared_between_instances(self):
+        """Файловый кеш виден разным экземплярам, как разным процессам."""
+        with tempfile.TemporaryDirectory() as location:
+            params = {
+                'OPTIONS': {
+                    'BACKEND': (
+                        'django.core.cache.backends.filebased.FileBasedCache'
+                    ),
+                    'ALIAS': 'shared',
+                },
+            }
+            StatsCache(location, params).set('key', 'value', None)
+            self.assertEqual(StatsCache(location, params).get('key'), 'value')
+        self.assertEqual(cache_stats()['shared']['hits'], 1)
+
+    def test_stats_view_is_staff_only(self):
+        """Статистику кешей видит только персонал."""
+        url = reverse('core:cache_stats')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        caches['fragments'].get('missing')
+        response = self.client.get(url)
+        self.assertEqual(
+            response.json()['caches']['fragments']['misses'], 1
+        )
@@ -0,0 +1,99 @@
+import threading
+
+from django.test import SimpleTestCase
+from django.test import TestCase
+from django.test import override_settings
+
+from core import performance
+from core import queries
+from core import routers
+from core.concurrency import run_concurrently
+
+
+def thread_id():
+    return threading.get_ident()
+
+
+class ConcurrentTests(SimpleTestCase):
+    def tearDown(self):
+        routers.use_replica(False)
+        performance.finish()
+        queries.finish()
+
+    def test_results_in_order(self):
+        """Результаты возвращаются в порядке функций."""
+        self.assertEqual(
+            run_concurrently(lambda: 1, lambda: 2, lambda: 3), [1, 2, 3]
+        )
+
+    def test_calls_run_in_other_threads(self):
+        """Первая функция выполняется в текущем потоке, остальные - в пуле."""
+        first, second = run_concurrently(thread_id, thread_id)
+        self.assertEqual(first, threading.get_ident())
+        self.assertNotEqual(second, threading.get_ident())
+
+    def test_calls_run_at_the_same_time(self):
+        """Функции ждут друг друга, то есть выполняются одновременно."""
+        barrier = threading.Barrier(3, timeout=5)
+        results = run_concurrently(*[barrier.wait] * 3)
+        self.assertEqual(sorted(results), [0, 1, 2])
+
+    def test_replica_flag_passed_to_pool(self):
+        """Поток пула читает с реплики, если с нее читает запрос."""
+        routers.use_replica(True)
+        _, using = run_concurrently(lambda: None, routers.using_replica)
+        self.assertTrue(using)
+
+    @override_settings(DATABASE_REPLICAS=['first', 'second', 'third'])
+    def test_pool_reads_from_same_replica(self):
+        """Потоки пула читают с той же реплики, что и запрос."""
+        routers.use_replica(True)
+        aliases = run_concurrently(*[routers.replica_alias] * 4)
+        self.assertEqual(len(set(aliases)), 1)
+
+    def test_pool_metrics_merged(self):
+        """Запросы потоков пула учитываются в метриках и журнале запроса."""
+        def work():
+            performance.current().queries += 2
+            queries.current().add('SELECT 1', 0)
+            queries.current().add('SELECT 2', 0)
+
+        metrics = performance.start()
+        log = queries.start(limit=2)
+        queries.current().add('SELECT 3', 0)
+        run_concurrently(lambda: None, work)
+        self.assertEqual(metrics.queries, 2)
+        self.assertEqual(log.counts['SELECT ?'], 3)
+        self.assertEqual(log.repeated(), [('SELECT ?', 3, '<unknown>')])
+
+    def test_errors_raised(self):
+        """Исключение из потока пула передается вызывающему."""
+        def fail():
+            raise ValueError('ошибка')
+
+        with self.assertRaisesMessage(ValueError, 'ошибка'):
+            run_concurrently(lambda: None, fail)
+
+    def test_nested_calls_run_sequentially(self):
+        """Поток пула не занимает другие потоки пула."""
+        _, (outer, inner) = run_concurrently(
+            lambda: None,
+            lambda: (thread_id(), run_concurrently(thread_id, thread_id)[1]),
+        )
+        self.assertEqual(outer, inner)
+
+    @override_settings(VIEW_THREADS=0)
+    def test_disabled(self):
+        self.assertEqual(
+            run_concurrently(thread_id, thread_id),
+            [threading.get_ident()] * 2,
+        )
+
+
+class TransactionTests(TestCase):
+    def test_sequential_in_transaction(self):
+        """В транзакции функции выполняются по очереди в текущем потоке."""
+        self.assertEqual(
+            run_concurrently(thread_id, thread_id),
+            [threading.get_ident()] * 2,
+        )
@@ -0,0 +1,115 @@
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase
+
+from core import db
+
+
+class SqliteConnectionTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.settings_dict = dict(
+            connection.settings_dict,
+            NAME=os.path.join(directory.name, 'db.sqlite3'),
+        )
+        with self.connect() as cursor:
+            cursor.execute('CREATE TABLE item (value INTEGER)')
+
+    @contextmanager
+    def connect(self):
+        wrapper = DatabaseWrapper(self.settings_dict, alias='file')
+        try:
+            with wrapper.cursor() as cursor:
+                yield cursor
+        finally:
+            wrapper.close()
+
+    def test_pragmas_applied_on_connect(self):
+        """На новом соединении с файлом SQLite включается WAL и др."""
+        with self.connect() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            # NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(
+                cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout']
+            )
+
+    def test_concurrent_writers_wait_for_lock(self):
+        """Второй писатель ждет блокировку, а не падает с ошибкой."""
+        started = threading.Event()
+        errors = []
+
+        def hold_lock():
+            with self.connect() as cursor:
+                cursor.execute('BEGIN IMMEDIATE')
+                cursor.execute('INSERT INTO item VALUES (1)')
+                started.set()
+                time.sleep(0.3)
+                cursor.execute('COMMIT')
+
+        def write():
+            started.wait()
+            try:
+                with self.connect() as cursor:
+                    cursor.execute('INSERT INTO item VALUES (2)')
+            except Exception as error:
+                errors.append(error)
+
+        threads = [
+            threading.Thread(target=hold_lock), threading.Thread(target=write)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        with self.connect() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM item')
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+    def test_readers_not_blocked_by_writer(self):
+        """В режиме WAL чтение не ждет незафиксированную запись."""
+        with self.connect() as writer, self.connect() as reader:
+            writer.execute('BEGIN IMMEDIATE')
+            writer.execute('INSERT INTO item VALUES (1)')
+            started = time.monotonic()
+            reader.execute('SELECT COUNT(*) FROM item')
+            self.assertEqual(reader.fetchone()[0], 0)
+            self.assertLess(time.monotonic() - started, 1)
+            writer.execute('COMMIT')
+
+
+class HealthCheckTests(SimpleTestCase):
+    def make_wrapper(self, health_checks):
+        wrapper = mock.Mock(settings_dict={
+            'CONN_HEALTH_CHECKS': health_checks,
+        })
+        wrapper.is_usable.return_value = False
+        return wrapper
+
+    def test_broken_connection_closed(self):
+        """Оборванное соединение закрывается перед запросом."""
+        wrapper = self.make_wrapper(True)
+        with mock.patch.object(db.connections, 'all', return_value=[wrapper]):
+            db.check_connections()
+        wrapper.close.assert_called_once_with()
+
+    def test_not_checked_without_setting(self):
+        """Без CONN_HEALTH_CHECKS соединение не проверяется."""
+        wrapper = self.make_wrapper(False)
+        with mock.patch.object(db.connections, 'all', return_value=[wrapper]):
+            db.check_connections()
+        wrapper.is_usable.assert_not_called()
+        wrapper.close.assert_not_called()
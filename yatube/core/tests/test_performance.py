@@ -0,0 +1,93 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase
+from django.test import override_settings
+from django.urls import reverse
+
+from core import performance
+from posts.models import Post
+
+User = get_user_model()
+
+SERVER_TIMING_RE = re.compile(
+    r'total;dur=[\d.]+, db;dur=[\d.]+;desc="(\d+) queries", '
+    r'tpl;dur=([\d.]+), cache;desc="(\d+) hits, (\d+) misses"'
+)
+
+
+class PerformanceMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        performance.reset()
+        for cache in caches.all():
+            cache.clear()
+
+    def server_timing(self, response):
+        match = SERVER_TIMING_RE.fullmatch(response['Server-Timing'])
+        self.assertIsNotNone(match, response['Server-Timing'])
+        queries, template, hits, misses = match.groups()
+        return int(queries), float(template), int(hits), int(misses)
+
+    def test_server_timing_header(self):
+        """Ответ сообщает время, запросы, шаблоны и кеши."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.client.get(url)
+        queries, template, hits, misses = self.server_timing(response)
+        self.assertGreater(queries, 0)
+        self.assertGreater(template, 0)
+
+    def test_cache_hits_counted_per_request(self):
+        """Повторный запрос закешированной страницы - попадания в кеш."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertGreater(self.server_timing(response)[3], 0)
+        response = self.client.get(reverse('posts:index'))
+        queries, template, hits, misses = self.server_timing(response)
+        self.assertGreater(hits, 0)
+        self.assertEqual(misses, 0)
+
+    @override_settings(PERFORMANCE_SERVER_TIMING=False)
+    def test_header_can_be_disabled(self):
+        """Заголовок Server-Timing можно отключить."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_aggregate_per_view(self):
+        """Сводка собирается по именам представлений."""
+        for _ in range(3):
+            self.client.get(reverse('posts:index'))
+        self.client.get('/missing-page/')
+        summary = {item['view']: item for item in performance.slowest()}
+        self.assertEqual(summary['posts:index']['count'], 3)
+        self.assertGreater(summary['posts:index']['bytes'], 0)
+        self.assertIn('<unresolved>', summary)
+        p95 = [item['p95_ms'] for item in summary.values()]
+        self.assertEqual(p95, sorted(p95, reverse=True))
+
+    @override_settings(PERFORMANCE_WINDOW=2)
+    def test_window_is_bounded(self):
+        """В сводке хранятся только последние замеры."""
+        performance.reset()
+        for _ in range(5):
+            self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            len(performance._endpoints['posts:index']['samples']), 2
+        )
+        self.assertEqual(performance.slowest()[0]['count'], 5)
+
+    def test_view_is_staff_only(self):
+        """Самые медленные представления видит только персонал."""
+        url = reverse('core:performance')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.get(reverse('posts:index'))
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        views = [item['view'] for item in self.client.get(url).json()[
+            'slowest'
+        ]]
+        self.assertIn('posts:index', views)
@@ -0,0 +1,129 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.template import engines
+from django.test import TestCase
+from django.test import override_settings
+from django.urls import path
+
+from core import queries
+from posts.models import Post
+
+User = get_user_model()
+
+TEMPLATE = '''{% for post in posts %}
+{{ post.author.username }}
+{% endfor %}'''
+
+
+def template_view(request):
+    posts = Post.objects.order_by('pk')
+    return HttpResponse(
+        engines.all()[0].from_string(TEMPLATE).render({'posts': posts})
+    )
+
+
+def code_view(request):
+    names = [post.author.username for post in Post.objects.order_by('pk')]
+    return HttpResponse(' '.join(names))
+
+
+def joined_view(request):
+    posts = Post.objects.select_related('author').order_by('pk')
+    return HttpResponse(' '.join(post.author.username for post in posts))
+
+
+urlpatterns = [
+    path('template/', template_view, name='template'),
+    path('code/', code_view, name='code'),
+    path('joined/', joined_view, name='joined'),
+]
+
+
+class FingerprintTests(TestCase):
+    def test_literals_replaced(self):
+        """Литералы в тексте запроса заменяются на ?."""
+        self.assertEqual(
+            queries.fingerprint(
+                "SELECT \"t1\".\"id\" FROM t1 WHERE a = 'it''s'\n"
+                "  AND b = 42 AND c > -1.5 LIMIT 21"
+            ),
+            'SELECT "t1"."id" FROM t1 WHERE a = ? AND b = ? AND c > ? '
+            'LIMIT ?',
+        )
+
+    def test_in_lists_collapsed(self):
+        """Списки IN любой длины дают один отпечаток."""
+        self.assertEqual(
+            queries.fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            queries.fingerprint('SELECT * FROM t WHERE id IN (%s)'),
+        )
+
+
+@override_settings(
+    ROOT_URLCONF='core.tests.test_queries', QUERY_REPEAT_LIMIT=3
+)
+class QueryLogMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(5):
+            author = User.objects.create_user(username=f'author{i}')
+            Post.objects.create(author=author, text='Пост')
+
+    def test_repeated_query_in_template(self):
+        """N+1 в шаблоне указывает на строку шаблона."""
+        with self.assertLogs('core.queries', 'WARNING') as logs:
+            self.client.get('/template/')
+        self.assertEqual(len(logs.records), 1)
+        message = logs.records[0].getMessage()
+        self.assertIn('N+1 в template: запрос выполнен 5 раз', message)
+        self.assertIn('auth_user', message)
+        self.assertTrue(message.endswith(':2)'), message)
+
+    def test_repeated_query_in_code(self):
+        """N+1 в коде указывает на строку кода проекта."""
+        with self.assertLogs('core.queries', 'WARNING') as logs:
+            self.client.get('/code/')
+        self.assertIn(
+            'core/tests/test_queries.py:28 in ',
+            logs.records[0].getMessage(),
+        )
+
+    def test_no_report_without_repeats(self):
+        """Без повторов журнал молчит, и строгий режим не мешает."""
+        with self.settings(QUERY_STRICT=True):
+            with self.assertRaises(AssertionError):
+                with self.assertLogs('core.queries', 'WARNING'):
+                    self.client.get('/joined/')
+
+    @override_settings(QUERY_REPEAT_LIMITS={'code': 5})
+    def test_view_limit(self):
+        """Лимит повторов можно задать для представления."""
+        with self.settings(QUERY_STRICT=True):
+            self.client.get('/code/')
+            with self.settings(QUERY_REPEAT_LIMITS={'code': 4}):
+                with self.assertRaises(queries.QueryBudgetExceeded):
+                    with self.assertLogs('core.queries', 'WARNING'):
+                        self.client.get('/code/')
+
+    @override_settings(QUERY_STRICT=True)
+    def test_strict_mode(self):
+        """В строгом режиме повторы сверх лимита - ошибка."""
+        with self.assertRaisesMessage(
+            queries.QueryBudgetExceeded, 'template: 5 раз'
+        ):
+            with self.assertLogs('core.queries', 'WARNING'):
+                self.client.get('/template/')
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_slow_queries_logged_as_json(self):
+        """Медленные запросы пишутся в журнал строками JSON."""
+        with self.assertLogs('core.queries.slow', 'WARNING') as logs:
+            self.client.get('/joined/')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'joined')
+        self.assertEqual(record['path'], '/joined/')
+        self.assertIn('posts_post', record['fingerprint'])
+        self.assertIn('duration_ms', record)
+        self.assertIn('core/tests/test_queries.py', record['location'])
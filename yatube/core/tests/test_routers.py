@@ -0,0 +1,137 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connections
+from django.test import TestCase
+from django.test import override_settings
+from django.urls import reverse
+
+from core import routers
+from core.cache import bump_generations
+from core.cache import generations
+from posts.models import Post
+
+User = get_user_model()
+
+
+# Изменения setUp считаются давними: реплики их уже получили
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_LAG_SECONDS=0)
+class ReplicaRoutingTests(TestCase):
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        # Реплика - файл SQLite, скопированный из основной базы
+        # до создания тестовых данных: она отстает на все записи тестов
+        cls.directory = tempfile.mkdtemp()
+        name = os.path.join(cls.directory, 'replica.sqlite3')
+        primary = connections['default']
+        primary.ensure_connection()
+        replica = sqlite3.connect(name)
+        primary.connection.backup(replica)
+        replica.close()
+        connections.databases['replica'] = dict(
+            primary.settings_dict, NAME=name
+        )
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.databases['replica']
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.author, text='Новый')
+        self.post_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+
+    def test_read_views_use_replica(self):
+        """Ленты и страница поста читают с реплики."""
+        self.assertEqual(self.client.get(self.post_url).status_code, 404)
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn(self.post, response.context['page_obj'])
+
+    def test_writer_reads_own_writes(self):
+        """После записи пользователь читает с основной базы."""
+        self.client.force_login(self.author)
+        response = self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Комментарий'},
+        )
+        self.assertEqual(
+            response.cookies[routers.PIN_COOKIE]['max-age'],
+            settings.REPLICA_PIN_SECONDS,
+        )
+        response = self.client.get(self.post_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['post'].comment_count, 1)
+
+    def test_pin_expires(self):
+        """Без отметки о записи страница снова читается с реплики."""
+        self.client.force_login(self.author)
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Комментарий'},
+        )
+        del self.client.cookies[routers.PIN_COOKIE]
+        self.assertEqual(self.client.get(self.post_url).status_code, 404)
+
+    @override_settings(REPLICA_LAG_SECONDS=60)
+    def test_recent_change_reads_from_primary(self):
+        """Страница с молодым поколением кеша читается с основной базы."""
+        Post.objects.create(author=self.author, text='Свежий')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Свежий')
+        # Главная закеширована с основной базы под новым поколением
+        self.assertContains(self.client.get(reverse('posts:index')), 'Свежий')
+
+    @override_settings(REPLICA_LAG_SECONDS=60)
+    def test_old_generation_keeps_replica(self):
+        """Давнее поколение не переводит запрос на основную базу."""
+        with mock.patch('time.time', return_value=time.time() - 120):
+            bump_generations('old')
+        bump_generations('young')
+        routers.use_replica(True)
+        try:
+            generations('old')
+            self.assertTrue(routers.using_replica())
+            generations('young')
+            self.assertFalse(routers.using_replica())
+        finally:
+            routers.use_replica(False)
+
+    @override_settings(DATABASE_REPLICAS=['replica', 'other'])
+    def test_replica_is_chosen_once_per_request(self):
+        """Все чтения запроса идут на одну реплику."""
+        router = routers.ReplicaRouter()
+        routers.use_replica(True)
+        try:
+            aliases = {router.db_for_read(Post) for _ in range(50)}
+        finally:
+            routers.use_replica(False)
+        self.assertEqual(len(aliases), 1)
+
+    def test_writes_go_to_primary(self):
+        """Записи в представлениях чтения уходят в основную базу."""
+        router = routers.ReplicaRouter()
+        routers.use_replica(True)
+        try:
+            self.assertEqual(router.db_for_read(Post), 'replica')
+            self.assertEqual(router.db_for_write(Post), 'default')
+        finally:
+            routers.use_replica(False)
+        self.assertIsNone(router.db_for_read(Post))
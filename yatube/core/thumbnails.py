@@ -0,0 +1,136 @@
+'''
+Миниатюры картинок, подготовленные заранее.
+
+Миниатюры всех размеров из настройки THUMBNAIL_SIZES и адаптивные
+варианты картинки (см. core.image_variants) создаются пулом фоновых
+потоков после фиксации транзакции, в которой сохранена картинка,
+а не при первом выводе страницы. Пока миниатюры нет, шаблон выводит
+исходную картинку (см. core.templatetags.images).
+'''
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.db import connections
+from django.db import transaction
+from sorl.thumbnail import default
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from core import image_variants
+
+logger = logging.getLogger(__name__)
+
+# Картинки, миниатюры которых недавно не удалось создать
+FAILED_KEY = 'thumbnails_failed:{}'
+
+_executor = None
+_executor_lock = threading.Lock()
+# Картинки, миниатюры которых уже в очереди
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def generate(name):
+    '''
+    Создает миниатюры и адаптивные варианты картинки name. Готовые
+    миниатюры sorl-thumbnail находит в своем хранилище ключей, а
+    варианты с манифестом не создаются заново, поэтому правка поста
+    и повторный запуск backfill_thumbnails не пережимают картинку.
+    '''
+    for geometry, options in settings.THUMBNAIL_SIZES.items():
+        get_thumbnail(name, geometry, **options)
+    if not image_variants.exists(name):
+        image_variants.generate(name)
+
+
+def _generate_logged(name):
+    try:
+        generate(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры %s', name)
+        # Битую картинку не ставим в очередь при каждом выводе страницы
+        caches[settings.THUMBNAIL_CACHE].set(
+            FAILED_KEY.format(name), True,
+            settings.THUMBNAIL_FAILURE_TIMEOUT,
+        )
+
+
+def _generate_in_background(name):
+    try:
+        _generate_logged(name)
+    finally:
+        with _pending_lock:
+            _pending.discard(name)
+        # Соединения с базой у потоков пула свои
+        connections.close_all()
+
+
+def _run_in_background():
+    # С базой SQLite в памяти (например, в тестах) потоки со своими
+    # соединениями блокируют друг друга, поэтому работаем без пула
+    return settings.THUMBNAIL_ASYNC and not (
+        connection.vendor == 'sqlite' and connection.is_in_memory_db()
+    )
+
+
+def _submit(name):
+    if caches[settings.THUMBNAIL_CACHE].get(FAILED_KEY.format(name)):
+        return
+    if not _run_in_background():
+        _generate_logged(name)
+        return
+    with _pending_lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    _get_executor().submit(_generate_in_background, name)
+
+
+def schedule(image):
+    '''
+    Ставит в очередь создание миниатюр картинки: после фиксации
+    текущей транзакции, когда файл и запись уже видны потокам пула.
+    '''
+    if image:
+        name = image.name
+        transaction.on_commit(lambda: _submit(name))
+
+
+def cached_thumbnail(image, geometry):
+    '''
+    Готовая миниатюра картинки или None, если она еще не создана.
+    Миниатюра ищется в хранилище ключей sorl-thumbnail, сама картинка
+    при этом не открывается.
+    '''
+    options = dict(settings.THUMBNAIL_SIZES[geometry])
+    # Опции дополняются так же, как в ThumbnailBackend.get_thumbnail,
+    # иначе имя файла миниатюры не совпадет
+    backend = default.backend
+    source = ImageFile(image)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return default.kvstore.get(ImageFile(name, default.storage))
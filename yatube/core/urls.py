@@ -0,0 +1,12 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'core'
+
+urlpatterns = [
+    # Статистика кешей процесса, доступна только персоналу
+    path('cache-stats/', views.cache_stats_view, name='cache_stats'),
+    # Самые медленные представления процесса, доступны только персоналу
+    path('performance/', views.performance_view, name='performance'),
+]
@@ -1,5 +1,13 @@
+import os
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from . import performance
+from .cache_backends import cache_stats
+
 
 def page_not_found(request, exception):
     # Переменная exception содержит отладочную информацию,
@@ -17,3 +25,19 @@ def permission_denied(request, exception):
 
 def server_error(request):
     return render(request, 'core/500.html', status=500)
+
+
+@staff_member_required
+def cache_stats_view(request):
+    '''Попадания и промахи кешей текущего процесса (для персонала)'''
+    return JsonResponse({'pid': os.getpid(), 'caches': cache_stats()})
+
+
+@staff_member_required
+def performance_view(request):
+    '''Самые медленные представления текущего процесса (для персонала)'''
+    return JsonResponse({
+        'pid': os.getpid(),
+        'window': settings.PERFORMANCE_WINDOW,
+        'slowest': performance.slowest(settings.PERFORMANCE_SLOWEST_LIMIT),
+    })
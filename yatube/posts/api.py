@@ -0,0 +1,300 @@
+'''
+JSON API для чтения: ленты, группа, профайл, пост и комментарии.
+
+Представления берут те же querysets, что и HTML-страницы
+(Post.objects.for_feed, комментарии поста по (created, id)), и те же
+курсоры CursorPaginator, но выбирают строки через values(): страница
+из API_PAGE_SIZE записей собирается из словарей без создания объектов
+моделей. Параметр ?fields=id,text оставляет в ответе только нужные
+поля (sparse fieldsets), вывод компактный: без пробелов, без
+экранирования кириллицы и сжат gzip, если клиент это поддерживает.
+
+Пользователь сайта может создать до API_BATCH_LIMIT постов или
+комментариев одним POST-запросом с телом {"items": [...]}
+(см. posts.batch).
+
+Новые посты и комментарии поста приходят потоком server-sent events
+(см. posts.live), а с параметром ?poll=1 - ответом long-poll.
+'''
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from django.http import StreamingHttpResponse
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_GET
+from django.views.decorators.http import require_POST
+
+from core.routers import pins_primary
+from core.routers import replica_reads
+
+from . import batch
+from . import counters
+from . import live
+from .conditional import conditional
+from .conditional import feed_validators
+from .conditional import post_validators
+from .models import Comment
+from .models import Group
+from .models import Post
+from .models import User
+from .pagination import CursorPaginator
+
+# Поле ответа: выражение для values()
+POST_FIELDS = {
+    'id': 'pk',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comment_count': 'comment_count',
+}
+COMMENT_FIELDS = {
+    'id': 'pk',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+GROUP_FIELDS = ('title', 'slug', 'description')
+AUTHOR_FIELDS = ('username', 'first_name', 'last_name')
+JSON_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def _json(data, status=200):
+    return JsonResponse(
+        data, status=status, encoder=DjangoJSONEncoder,
+        json_dumps_params=JSON_PARAMS,
+    )
+
+
+def _not_found():
+    return _json({'error': 'Не найдено'}, status=404)
+
+
+def api_view(view):
+    '''Декоратор представлений API: GET, реплика, gzip и ошибки полей.'''
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except FieldsError as error:
+            return _json({'error': str(error)}, status=400)
+    return replica_reads(require_GET(gzip_page(wrapper)))
+
+
+def _fields(request, available):
+    '''Поля из ?fields= (по умолчанию все) в порядке available.'''
+    value = request.GET.get('fields')
+    if not value:
+        return list(available)
+    requested = set(filter(None, value.split(',')))
+    unknown = requested.difference(available)
+    if unknown:
+        raise FieldsError('Неизвестные поля: {}'.format(
+            ', '.join(sorted(unknown))
+        ))
+    return [name for name in available if name in requested]
+
+
+def _rows(rows, fields, available):
+    '''Словари ответа из строк values() с полями fields.'''
+    columns = [(name, available[name]) for name in fields]
+    image = 'image' in fields
+    result = []
+    for row in rows:
+        item = {name: row[column] for name, column in columns}
+        if image:
+            item['image'] = (
+                settings.MEDIA_URL + item['image'] if item['image'] else None
+            )
+        result.append(item)
+    return result
+
+
+def _link(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return '{}?{}'.format(request.path, params.urlencode())
+
+
+def _page(request, queryset, available, keys):
+    '''Страница queryset по курсору в виде ответа API.'''
+    fields = _fields(request, available)
+    # Ключи курсора выбираются всегда, даже если их нет в fields
+    columns = set(available[name] for name in fields).union(keys)
+    paginator = CursorPaginator(
+        queryset.values(*columns), settings.API_PAGE_SIZE, keys=keys
+    )
+    page = paginator.get_page(request.GET.get('cursor'))
+    return {
+        'results': _rows(page.object_list, fields, available),
+        'next': _link(request, paginator.next_cursor),
+        'previous': _link(request, paginator.previous_cursor),
+    }
+
+
+@api_view
+@conditional(feed_validators)
+def feed(request):
+    '''Лента всех постов'''
+    return _json(_page(
+        request, Post.objects.for_feed(), POST_FIELDS, ('pub_date', 'pk')
+    ))
+
+
+@api_view
+@conditional(feed_validators)
+def group(request, slug):
+    '''Группа и ее посты'''
+    values = Group.objects.filter(slug=slug).values('pk', *GROUP_FIELDS)
+    group = values.first()
+    if group is None:
+        return _not_found()
+    data = _page(
+        request,
+        Post.objects.for_feed().filter(group=group.pop('pk')),
+        POST_FIELDS,
+        ('pub_date', 'pk'),
+    )
+    data['group'] = group
+    return _json(data)
+
+
+@api_view
+@conditional(feed_validators)
+def profile(request, username):
+    '''Автор, число его постов и его посты'''
+    user = User.objects.filter(username=username).only(
+        *AUTHOR_FIELDS
+    ).first()
+    if user is None:
+        return _not_found()
+    data = _page(
+        request,
+        Post.objects.for_feed().filter(author=user),
+        POST_FIELDS,
+        ('pub_date', 'pk'),
+    )
+    data['author'] = {name: getattr(user, name) for name in AUTHOR_FIELDS}
+    data['author']['post_count'] = counters.post_count(user)
+    return _json(data)
+
+
+@api_view
+@conditional(post_validators)
+def post(request, post_id):
+    '''Пост'''
+    fields = _fields(request, POST_FIELDS)
+    row = Post.objects.for_feed().filter(pk=post_id).values(
+        *(POST_FIELDS[name] for name in fields)
+    ).first()
+    if row is None:
+        return _not_found()
+    return _json(_rows([row], fields, POST_FIELDS)[0])
+
+
+@api_view
+@conditional(post_validators)
+def comments(request, post_id):
+    '''Комментарии поста, новые первыми'''
+    if not Post.objects.filter(pk=post_id).exists():
+        return _not_found()
+    return _json(_page(
+        request,
+        Comment.objects.filter(post=post_id),
+        COMMENT_FIELDS,
+        ('created', 'pk'),
+    ))
+
+
+def _items(request):
+    '''Записи из тела запроса {"items": [...]} или текст ошибки.'''
+    try:
+        items = json.loads(request.body.decode())['items']
+    except (UnicodeError, ValueError, TypeError, KeyError):
+        return None, 'Ожидается JSON вида {"items": [...]}'
+    if not isinstance(items, list) or not items:
+        return None, 'Поле items должно быть непустым списком'
+    if len(items) > settings.API_BATCH_LIMIT:
+        return None, 'Не больше {} записей за запрос'.format(
+            settings.API_BATCH_LIMIT
+        )
+    return items, None
+
+
+def batch_view(create):
+    '''Представление пакетного создания записей функцией create.'''
+    @pins_primary
+    @require_POST
+    def view(request):
+        if not request.user.is_authenticated:
+            return _json({'error': 'Нужна авторизация'}, status=401)
+        items, error = _items(request)
+        if error is not None:
+            return _json({'error': error}, status=400)
+        results = create(request.user, items)
+        return _json({
+            'created': sum('id' in result for result in results),
+            'results': results,
+        })
+    return view
+
+
+batch_posts = batch_view(batch.create_posts)
+batch_comments = batch_view(batch.create_comments)
+
+
+def _last_event_id(request):
+    '''
+    Номер последнего полученного события: заголовок Last-Event-ID
+    переподключившегося EventSource или параметр ?last_event_id=.
+    Новый подписчик получает только события после подключения.
+    '''
+    value = request.META.get(
+        'HTTP_LAST_EVENT_ID', request.GET.get('last_event_id')
+    )
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return live.broker.current()
+
+
+def _live(request, channel):
+    '''Поток событий канала channel или ответ long-poll.'''
+    last_id = _last_event_id(request)
+    if request.GET.get('poll'):
+        return _json(live.poll(last_id, {channel}))
+    response = StreamingHttpResponse(
+        live.stream(last_id, {channel}), content_type='text/event-stream'
+    )
+    # Сервер ASGI (core.asgi) читает поток без потока сервера
+    response.async_streaming_content = live.astream(last_id, {channel})
+    response['Cache-Control'] = 'no-cache'
+    # nginx не должен копить поток в буфере
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@require_GET
+def live_posts(request):
+    '''Новые посты: событие posts с их числом и ключами'''
+    return _live(request, live.POSTS)
+
+
+@replica_reads
+@require_GET
+def live_comments(request, post_id):
+    '''Новые комментарии поста: событие post на каждый'''
+    if not Post.objects.filter(pk=post_id).exists():
+        return _not_found()
+    return _live(request, live.COMMENTS.format(post_id))
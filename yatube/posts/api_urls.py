@@ -0,0 +1,33 @@
+from django.urls import path
+
+from . import api
+
+app_name = 'api'
+
+urlpatterns = [
+    # Лента всех постов
+    path('posts/', api.feed, name='feed'),
+    # Пост
+    path('posts/<int:post_id>/', api.post, name='post'),
+    # Комментарии к посту
+    path(
+        'posts/<int:post_id>/comments/',
+        api.comments,
+        name='comments'
+    ),
+    # Новые комментарии к посту (server-sent events)
+    path(
+        'posts/<int:post_id>/live/',
+        api.live_comments,
+        name='live_comments'
+    ),
+    # Новые посты (server-sent events)
+    path('live/posts/', api.live_posts, name='live_posts'),
+    # Пакетное создание постов и комментариев
+    path('posts/batch/', api.batch_posts, name='batch_posts'),
+    path('comments/batch/', api.batch_comments, name='batch_comments'),
+    # Группа и ее посты
+    path('groups/<slug:slug>/', api.group, name='group'),
+    # Автор и его посты
+    path('profiles/<str:username>/', api.profile, name='profile'),
+]
@@ -0,0 +1,127 @@
+'''
+Пакетное создание постов и комментариев (JSON API).
+
+Каждая запись проверяется теми же формами, что и на сайте (PostForm,
+CommentForm); прошедшие проверку записи создаются одним bulk_create
+в одной транзакции. bulk_create не шлет сигналы, поэтому то, что
+обычно делают обработчики posts.signals, выполняется здесь один раз
+на всю пачку: счетчики, ленты подписчиков, индекс поиска, поколения
+кеша, метки кеша страниц и события живых обновлений.
+
+Результат - список по записям запроса: {'id': ключ} для созданной
+записи или {'errors': ошибки формы} для отклоненной.
+'''
+from collections import defaultdict
+
+from django.db import transaction
+
+from . import counters
+from . import live
+from . import pagecache
+from . import search
+from . import timeline
+from .caching import invalidate_comments
+from .caching import invalidate_posts
+from .forms import CommentForm
+from .forms import PostForm
+from .models import Comment
+from .models import Post
+
+NOT_AN_OBJECT = {'__all__': ['Запись должна быть объектом JSON']}
+NO_POST = {'post': ['Пост не найден']}
+
+
+def _validate(form_class, items):
+    '''(индекс, несохраненный объект) и {индекс: ошибки} по записям.'''
+    valid = []
+    errors = {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors[index] = NOT_AN_OBJECT
+            continue
+        form = form_class(data=item)
+        if form.is_valid():
+            valid.append((index, form.save(commit=False)))
+        else:
+            errors[index] = form.errors.get_json_data()
+    return valid, errors
+
+
+def _insert(model, objs, author):
+    '''
+    bulk_create с ключами у объектов. SQLite не возвращает ключи
+    вставленных строк: это последние строки автора, потому что
+    до фиксации транзакции другие записи в базу не попадут.
+    '''
+    model.objects.bulk_create(objs)
+    if objs and objs[0].pk is None:
+        keys = model.objects.filter(author=author).order_by(
+            '-pk'
+        ).values_list('pk', flat=True)[:len(objs)]
+        for obj, pk in zip(objs, reversed(keys)):
+            obj.pk = pk
+
+
+def _results(count, valid, errors):
+    results = [None] * count
+    for index, obj in valid:
+        results[index] = {'id': obj.pk}
+    for index, error in errors.items():
+        results[index] = {'errors': error}
+    return results
+
+
+def create_posts(author, items):
+    '''Создает посты автора из записей items.'''
+    valid, errors = _validate(PostForm, items)
+    posts = [post for _, post in valid]
+    for post in posts:
+        post.author = author
+    if posts:
+        with transaction.atomic():
+            _insert(Post, posts, author)
+            counters.change_post_count(author.pk, len(posts))
+            timeline.fan_out(posts)
+            search.index_created(posts=posts)
+            live.posts_created(posts)
+        invalidate_posts()
+        tags = {'index', 'author:{}'.format(author.pk)}
+        tags.update(
+            'group:{}'.format(post.group.slug)
+            for post in posts if post.group_id is not None
+        )
+        pagecache.purge(*tags)
+    return _results(len(items), valid, errors)
+
+
+def create_comments(author, items):
+    '''Создает комментарии автора к постам из поля post записей.'''
+    valid, errors = _validate(CommentForm, items)
+    requested = {items[index].get('post') for index, _ in valid}
+    post_ids = set(Post.objects.filter(
+        pk__in=[pk for pk in requested if type(pk) is int]
+    ).values_list('pk', flat=True))
+    comments = []
+    for index, comment in valid:
+        post_id = items[index].get('post')
+        if post_id in post_ids:
+            comment.post_id = post_id
+            comment.author = author
+            comments.append((index, comment))
+        else:
+            errors[index] = NO_POST
+    if comments:
+        objs = [comment for _, comment in comments]
+        with transaction.atomic():
+            _insert(Comment, objs, author)
+            # Счетчики каждого поста меняются одним UPDATE
+            added = defaultdict(list)
+            for comment in objs:
+                added[comment.post_id].append(comment.created)
+            for post_id, created in added.items():
+                counters.comment_added(post_id, max(created), len(created))
+            search.index_created(comments=objs)
+            live.comments_created(objs)
+        invalidate_comments()
+        pagecache.purge(*('post:{}'.format(post_id) for post_id in added))
+    return _results(len(items), comments, errors)
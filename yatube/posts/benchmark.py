@@ -0,0 +1,225 @@
+'''
+Замеры производительности страниц приложения posts.
+
+Каждый адрес чтения из posts.urls запрашивается тестовым клиентом
+Django заданное число раз от имени автора самого обсуждаемого поста.
+Для каждого адреса считаются перцентили p50/p95/p99 времени ответа,
+число запросов к базе и размер ответа. Результаты сохраняются
+в JSON-файл (базовую линию), с которым сравниваются следующие замеры.
+
+Второй замер - пропускная способность запущенных серверов WSGI
+и ASGI (yatube/wsgi.py и yatube/asgi.py) при медленных клиентах:
+часть клиентов передает запрос по частям в течение нескольких секунд,
+остальные запрашивают ленты и страницу поста так быстро, как могут.
+'''
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.performance import percentile
+
+from . import urls
+from .models import Follow
+from .models import Group
+from .models import Post
+
+PERCENTILES = (50, 95, 99)
+# Параметры GET для адресов, которым они нужны
+QUERY_PARAMS = {
+    'posts:search': {'q': 'кот'},
+}
+# Адреса, GET к которым что-то записывает: подписка, отписка
+# и комментарий (без POST - перенаправление на страницу поста)
+WRITE_ENDPOINTS = frozenset((
+    'posts:profile_follow', 'posts:profile_unfollow', 'posts:add_comment',
+))
+# Адреса для замера серверов: ленты и страница поста
+SERVER_ENDPOINTS = (
+    'posts:index', 'posts:group_list', 'posts:profile', 'posts:post_detail',
+)
+# На сколько частей медленный клиент делит запрос
+SLOW_PARTS = 10
+
+
+def sample_objects():
+    '''
+    Пользователь для замеров и значения параметров адресов: самый
+    обсуждаемый пост, его автор, группа и другой популярный автор.
+    '''
+    post = Post.objects.select_related('author').order_by(
+        '-comment_count', '-pk'
+    ).first()
+    if post is None:
+        raise ValueError('В базе нет постов')
+    other = Follow.objects.exclude(author=post.author_id).select_related(
+        'author'
+    ).order_by('pk').first()
+    group = Group.objects.filter(posts__isnull=False).order_by('pk').first()
+    return post.author, {
+        'post_id': post.pk,
+        'username': (other.author if other else post.author).username,
+        'slug': group.slug if group else 'missing',
+    }
+
+
+def endpoints(values):
+    '''(имя, адрес, параметры GET) каждого адреса чтения из posts.urls.'''
+    for pattern in urls.urlpatterns:
+        name = '{}:{}'.format(urls.app_name, pattern.name)
+        if name in WRITE_ENDPOINTS:
+            continue
+        kwargs = {
+            key: values[key] for key in pattern.pattern.converters
+        }
+        yield name, reverse(name, kwargs=kwargs), QUERY_PARAMS.get(name, {})
+
+
+def measure(client, url, params, requests, warmup):
+    '''Замеры requests запросов к адресу после warmup прогревочных.'''
+    for _ in range(warmup):
+        client.get(url, params)
+    timings = []
+    queries = []
+    sizes = []
+    for _ in range(requests):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(url, params)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured))
+        sizes.append(len(response.content))
+    result = {
+        'url': url,
+        'status': response.status_code,
+        'queries': max(queries),
+        'bytes': round(sum(sizes) / len(sizes)),
+    }
+    for percent in PERCENTILES:
+        result['p{}_ms'.format(percent)] = round(
+            percentile(timings, percent), 3
+        )
+    return result
+
+
+def run(requests=30, warmup=3):
+    '''Замеры всех адресов: {имя адреса: результаты}.'''
+    user, values = sample_objects()
+    client = Client()
+    client.force_login(user)
+    return {
+        name: measure(client, url, params, requests, warmup)
+        for name, url, params in endpoints(values)
+    }
+
+
+def compare(baseline, results, tolerance=0.2):
+    '''
+    Регрессии относительно базовой линии: p95 выросло больше чем
+    на tolerance или запросов к базе стало больше.
+    '''
+    regressions = []
+    for name, before in baseline.items():
+        after = results.get(name)
+        if after is None:
+            continue
+        if after['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append('{}: p95 {} -> {} мс'.format(
+                name, before['p95_ms'], after['p95_ms']
+            ))
+        if after['queries'] > before['queries']:
+            regressions.append('{}: запросов к базе {} -> {}'.format(
+                name, before['queries'], after['queries']
+            ))
+    return regressions
+
+
+def server_paths():
+    '''Пути адресов SERVER_ENDPOINTS для замера серверов.'''
+    _, values = sample_objects()
+    return [
+        url for name, url, _ in endpoints(values) if name in SERVER_ENDPOINTS
+    ]
+
+
+async def _get(host, port, path, delay, timeout):
+    '''
+    Запрос GET по отдельному соединению, возвращает код ответа.
+    Медленный клиент (delay > 0) передает запрос за delay секунд.
+    '''
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(host, port), timeout
+    )
+    try:
+        request = (
+            'GET {} HTTP/1.1\r\nHost: {}:{}\r\nConnection: close\r\n\r\n'
+        ).format(path, host, port).encode()
+        size = -(-len(request) // SLOW_PARTS) if delay else len(request)
+        for start in range(0, len(request), size):
+            if start:
+                await asyncio.sleep(delay / SLOW_PARTS)
+            writer.write(request[start:start + size])
+            await writer.drain()
+        status = await asyncio.wait_for(reader.readline(), timeout)
+        await asyncio.wait_for(reader.read(), timeout)
+        return int(status.split()[1])
+    finally:
+        writer.close()
+
+
+async def _client(address, paths, delay, deadline, timeout, result):
+    '''Клиент: запрашивает paths по кругу до deadline.'''
+    number = 0
+    while time.monotonic() < deadline:
+        path = paths[number % len(paths)]
+        number += 1
+        started = time.perf_counter()
+        try:
+            status = await _get(*address, path, delay, timeout)
+        except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+            status = None
+        if status is None or status >= 400:
+            result['errors'] += 1
+        elif not delay:
+            result['timings'].append((time.perf_counter() - started) * 1000)
+
+
+async def _load(url, paths, clients, slow_clients, delay, duration, timeout):
+    parts = urlsplit(url)
+    address = (parts.hostname, parts.port or 80)
+    paths = [parts.path.rstrip('/') + path for path in paths]
+    deadline = time.monotonic() + duration
+    result = {'timings': [], 'errors': 0}
+    await asyncio.gather(*(
+        _client(address, paths, delay, deadline, timeout, result)
+        for delay in [delay] * slow_clients + [0] * clients
+    ))
+    return result
+
+
+def throughput(url, paths, clients=10, slow_clients=50, delay=2.0,
+               duration=10.0, timeout=30.0):
+    '''
+    Пропускная способность сервера url: сколько запросов в секунду
+    выполнили clients быстрых клиентов, пока slow_clients медленных
+    передавали свои запросы за delay секунд каждый.
+    '''
+    load = asyncio.run(_load(
+        url, paths, clients, slow_clients, delay, duration, timeout
+    ))
+    timings = load['timings']
+    result = {
+        'url': url,
+        'requests': len(timings),
+        'rps': round(len(timings) / duration, 2),
+        'errors': load['errors'],
+    }
+    for percent in PERCENTILES:
+        result['p{}_ms'.format(percent)] = round(
+            percentile(timings, percent), 3
+        ) if timings else None
+    return result
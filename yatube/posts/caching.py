@@ -0,0 +1,69 @@
+'''
+Поколения кеша лент постов.
+
+Поколение входит в ключи закешированных страниц и фрагментов лент и
+меняется при любом изменении того, что в них выводится: постов, групп
+и имен авторов. Новый пост становится виден сразу, без ожидания TTL.
+Отдельное поколение комментариев меняется при добавлении и удалении
+комментариев (их число выводится в лентах).
+
+Вместе с поколением запоминается время его смены: по нему
+posts.conditional отдает заголовок Last-Modified. Изменение внутри
+транзакции сбрасывает поколение еще раз после ее фиксации: страница,
+прочитанная до фиксации, не переживет изменения.
+'''
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from core.cache import bump_generations_on_commit
+from core.cache import generations
+
+POSTS_GENERATION = 'posts'
+COMMENTS_GENERATION = 'comments'
+CHANGED_KEY = 'changed:{}'
+# Поля пользователя, которые выводятся в лентах
+USER_NAME_FIELDS = frozenset(('username', 'first_name', 'last_name'))
+
+
+def feed_generation():
+    '''
+    Текущее поколение кеша лент: посты, группы и имена авторов,
+    а также комментарии, число которых выводится под каждым постом.
+    '''
+    return generations(POSTS_GENERATION, COMMENTS_GENERATION)
+
+
+def _touch(name):
+    cache.set(CHANGED_KEY.format(name), time.time(), None)
+
+
+def _invalidate(name):
+    bump_generations_on_commit(name)
+    _touch(name)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _touch(name))
+
+
+def invalidate_posts():
+    '''Делает устаревшими все закешированные страницы лент.'''
+    _invalidate(POSTS_GENERATION)
+
+
+def invalidate_comments():
+    '''Отмечает изменение комментариев.'''
+    _invalidate(COMMENTS_GENERATION)
+
+
+def changed_at(*names):
+    '''Время (Unix) последней смены поколений names.'''
+    keys = [CHANGED_KEY.format(name) for name in names]
+    values = cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        # Время вытеснено из кеша: считаем, что изменения были только что
+        now = time.time()
+        cache.set_many(dict.fromkeys(missing, now), None)
+        values.update(dict.fromkeys(missing, now))
+    return max(values.values())
@@ -0,0 +1,112 @@
+'''
+Условные GET-запросы для лент и страницы поста.
+
+ETag и Last-Modified вычисляются до вызова представления по
+поколениям кеша (posts.caching), поэтому посты страницы не читаются
+из базы: если страница у клиента не устарела, он получает ответ
+304 Not Modified без вывода шаблона. Страница поста дополнительно
+читает из базы одну строку поста по ключу.
+
+Страницы зависят и от посетителя (меню, форма комментария, кнопка
+подписки), поэтому в ETag входят пользователь и его CSRF-токен,
+а также год из подвала страниц и версия выпуска ETAG_VERSION.
+'''
+import hashlib
+import math
+from datetime import date
+from datetime import datetime
+from datetime import timezone
+
+from django.conf import settings
+from django.views.decorators.http import condition
+
+from core.cache import generations
+
+from . import timeline
+from .caching import COMMENTS_GENERATION
+from .caching import POSTS_GENERATION
+from .caching import changed_at
+from .models import Post
+
+
+def _visitor(request):
+    user = request.user
+    return (
+        user.pk if user.is_authenticated else 'anonymous',
+        # Токен меняется при входе: старая страница с формой
+        # не должна отдаваться из кеша браузера
+        request.META.get('CSRF_COOKIE', ''),
+    )
+
+
+def _timestamp(value):
+    # Last-Modified точен до секунды: округляем вверх, чтобы
+    # изменение не оказалось раньше отданного ранее заголовка
+    return datetime.fromtimestamp(math.ceil(value), tz=timezone.utc)
+
+
+def feed_validators(request, **kwargs):
+    '''Лента меняется с постами, группами, авторами и комментариями.'''
+    names = (POSTS_GENERATION, COMMENTS_GENERATION)
+    return [generations(*names)], changed_at(*names)
+
+
+def profile_validators(request, **kwargs):
+    '''Профайл еще и показывает, подписан ли посетитель на автора.'''
+    parts, modified = feed_validators(request)
+    if request.user.is_authenticated:
+        # Версия ленты подписок меняется при подписке и отписке
+        parts.append(timeline.feed_version(request.user.pk))
+    return parts, modified
+
+
+def post_validators(request, post_id):
+    '''
+    Пост меняется с постами, группами и авторами; комментарии
+    к нему видны по счетчику и дате последнего комментария.
+    '''
+    row = Post.objects.filter(pk=post_id).values_list(
+        'comment_count', 'last_comment_at'
+    ).first()
+    if row is None:
+        return None
+    comment_count, last_comment_at = row
+    modified = changed_at(POSTS_GENERATION)
+    if last_comment_at is not None:
+        modified = max(modified, last_comment_at.timestamp())
+    return [
+        generations(POSTS_GENERATION), comment_count, last_comment_at
+    ], modified
+
+
+def conditional(validators):
+    '''
+    Декоратор представления: ETag и Last-Modified по функции
+    validators(request, **kwargs), которая возвращает части ETag
+    и время изменения или None, если проверять нечего.
+    '''
+    def compute(request, **kwargs):
+        # condition вызывает обе функции: считаем один раз
+        if not hasattr(request, 'conditional_validators'):
+            request.conditional_validators = validators(request, **kwargs)
+        return request.conditional_validators
+
+    def etag(request, **kwargs):
+        result = compute(request, **kwargs)
+        if result is None:
+            return None
+        parts = (
+            settings.ETAG_VERSION,
+            date.today().year,
+            *_visitor(request),
+            *result[0],
+        )
+        return hashlib.md5(
+            '|'.join(map(str, parts)).encode()
+        ).hexdigest()
+
+    def last_modified(request, **kwargs):
+        result = compute(request, **kwargs)
+        return None if result is None else _timestamp(result[1])
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
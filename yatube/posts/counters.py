@@ -0,0 +1,104 @@
+'''
+Денормализованные счетчики.
+
+Счетчик постов автора (AuthorStats.post_count) меняется в той же
+транзакции, что и запись поста, поэтому страницам профайла и поста
+не нужен COUNT по всем постам автора. Число комментариев поста и дата
+последнего (Post.comment_count, Post.last_comment_at) меняются одним
+UPDATE при добавлении и удалении комментария, поэтому ленты выводят
+их без подсчета. Расхождения (например, после bulk_create) исправляют
+команды ``manage.py reconcile_post_counts`` и
+``manage.py reconcile_comment_counts``.
+'''
+from django.db import transaction
+from django.db.models import Case
+from django.db.models import Count
+from django.db.models import F
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from django.db.models import Value
+from django.db.models import When
+from django.db.models.functions import Coalesce
+
+from .models import AuthorStats
+from .models import Comment
+from .models import Post
+
+
+def post_count(author):
+    '''Количество постов автора; при отсутствии счетчика создает его.'''
+    try:
+        return author.stats.post_count
+    except AuthorStats.DoesNotExist:
+        stats, _ = AuthorStats.objects.get_or_create(
+            author=author,
+            defaults={'post_count': author.posts.count()},
+        )
+        return stats.post_count
+
+
+def change_post_count(author_id, delta):
+    '''Изменяет счетчик автора на delta постов.'''
+    with transaction.atomic():
+        stats = AuthorStats.objects.filter(author_id=author_id)
+        if delta < 0:
+            stats = stats.filter(post_count__gte=-delta)
+        updated = stats.update(post_count=F('post_count') + delta)
+        if not updated and delta > 0:
+            # Счетчика еще нет: считаем посты один раз
+            AuthorStats.objects.get_or_create(
+                author_id=author_id,
+                defaults={
+                    'post_count': Post.objects.filter(
+                        author_id=author_id
+                    ).count()
+                },
+            )
+
+
+def _last_comment_at():
+    return Subquery(
+        Comment.objects.filter(
+            post=OuterRef('pk')
+        ).order_by('-created').values('created')[:1]
+    )
+
+
+def comment_added(post_id, created, count=1):
+    '''
+    Учитывает count новых комментариев в счетчиках поста; created -
+    время самого позднего из них.
+    '''
+    Post.objects.filter(pk=post_id).update(
+        comment_count=F('comment_count') + count,
+        # Комментарий мог сохраниться позже более нового
+        last_comment_at=Case(
+            When(last_comment_at__gt=created, then=F('last_comment_at')),
+            default=Value(created),
+        ),
+    )
+
+
+def comment_removed(post_id):
+    '''Учитывает удаление комментария в счетчиках поста.'''
+    Post.objects.filter(pk=post_id, comment_count__gt=0).update(
+        comment_count=F('comment_count') - 1,
+        last_comment_at=_last_comment_at(),
+    )
+
+
+def recount_comments(post_id):
+    '''Пересчитывает счетчики комментариев поста по таблице.'''
+    Post.objects.filter(pk=post_id).update(
+        comment_count=Coalesce(
+            Subquery(
+                Comment.objects.filter(
+                    post=OuterRef('pk')
+                ).order_by().values('post').annotate(
+                    count=Count('pk')
+                ).values('count')
+            ),
+            0,
+        ),
+        last_comment_at=_last_comment_at(),
+    )
@@ -0,0 +1,254 @@
+'''
+Живые обновления лент и комментариев (server-sent events).
+
+Обработчики posts.signals и posts.batch после фиксации транзакции
+публикуют события в брокер процесса: новые посты - событием posts
+в канал posts, новые комментарии - событием comment в канал post:<id>.
+Посетитель сам включает обновления кнопкой на странице, и тогда она
+держит одно соединение с потоком событий вместо периодических
+перезагрузок: главная показывает «N новых постов», страница поста
+дописывает новые комментарии.
+
+Брокер хранит последние LIVE_BUFFER событий с возрастающими
+номерами. Поток отдает их в формате text/event-stream с полем id,
+поэтому браузер после переподключения присылает Last-Event-ID
+и получает пропущенное. Для клиентов без EventSource есть long-poll:
+запрос ждет событий до LIVE_POLL_TIMEOUT секунд и возвращает их JSON.
+
+Под WSGI поток событий и long-poll занимают поток сервера, пока ждут,
+поэтому одновременно ждать могут не больше LIVE_MAX_STREAMS из них:
+лишний поток сразу завершается с долгой паузой переподключения
+(LIVE_BUSY_RETRY_MS), а лишний long-poll отвечает без ожидания.
+Сервер ASGI (core.asgi) читает асинхронный поток astream: он ждет
+событий в цикле событий, не занимая потоков, и таких потоков может
+быть до LIVE_MAX_ASYNC_STREAMS.
+
+Брокер живет в памяти процесса: подписчик видит события, которые
+опубликовал тот же процесс, поэтому сервер запускается одним
+процессом с потоками (например, gunicorn --workers 1 --threads 32)
+или одним процессом ASGI.
+'''
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+POSTS = 'posts'
+COMMENTS = 'post:{}'
+# Типы событий: по ним подписывается EventSource на странице
+POSTS_EVENT = 'posts'
+COMMENT_EVENT = 'comment'
+
+
+class Broker:
+    '''Публикация событий по каналам и ожидание новых событий.'''
+
+    def __init__(self, size):
+        self.condition = threading.Condition()
+        self.events = deque(maxlen=size)
+        self.last_id = 0
+        # Асинхронные подписчики: (цикл событий, future для пробуждения)
+        self.waiters = set()
+
+    def publish(self, channel, event, data):
+        with self.condition:
+            self.last_id += 1
+            self.events.append((self.last_id, channel, event, data))
+            self.condition.notify_all()
+            for loop, future in self.waiters:
+                try:
+                    loop.call_soon_threadsafe(_wake, future)
+                except RuntimeError:
+                    # Цикл событий подписчика уже закрыт
+                    pass
+            self.waiters.clear()
+
+    def _after(self, last_id, channels):
+        return [
+            event for event in self.events
+            if event[0] > last_id and event[1] in channels
+        ]
+
+    def wait(self, last_id, channels, timeout):
+        '''
+        События каналов channels с номером больше last_id; если их
+        нет, ждет новых не дольше timeout секунд.
+        '''
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            events = self._after(last_id, channels)
+            while not events:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+                events = self._after(last_id, channels)
+            return events
+
+    async def wait_async(self, last_id, channels, timeout):
+        '''То же, что wait, но ожидание не занимает поток.'''
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            with self.condition:
+                events = self._after(last_id, channels)
+                remaining = deadline - loop.time()
+                if events or remaining <= 0:
+                    return events
+                waiter = (loop, loop.create_future())
+                self.waiters.add(waiter)
+            try:
+                await asyncio.wait([waiter[1]], timeout=remaining)
+            finally:
+                with self.condition:
+                    self.waiters.discard(waiter)
+
+    def current(self):
+        '''Номер последнего события: с него начинают новые подписчики.'''
+        with self.condition:
+            return self.last_id
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class Slots:
+    '''Счетчик одновременно открытых потоков с пределом.'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.used = 0
+
+    def acquire(self, limit):
+        '''Занимает место, если занято меньше limit.'''
+        with self.lock:
+            if self.used >= limit:
+                return False
+            self.used += 1
+            return True
+
+    def release(self):
+        with self.lock:
+            self.used -= 1
+
+
+broker = Broker(settings.LIVE_BUFFER)
+# Потоки и long-poll, которые ждут событий в потоке сервера
+sync_slots = Slots()
+# Потоки ASGI, которые ждут событий в цикле событий
+async_slots = Slots()
+
+
+def publish(channel, event, data):
+    '''Публикует событие после фиксации текущей транзакции.'''
+    transaction.on_commit(lambda: broker.publish(channel, event, data))
+
+
+def posts_created(posts):
+    publish(POSTS, POSTS_EVENT, {
+        'count': len(posts),
+        'ids': [post.pk for post in posts],
+    })
+
+
+def comments_created(comments):
+    for comment in comments:
+        publish(COMMENTS.format(comment.post_id), COMMENT_EVENT, {
+            'id': comment.pk,
+            'author': comment.author.username,
+            'text': comment.text,
+            'created': comment.created,
+        })
+
+
+def _dump(data):
+    return json.dumps(
+        data, cls=DjangoJSONEncoder, ensure_ascii=False,
+        separators=(',', ':'),
+    )
+
+
+def _retry(milliseconds):
+    return 'retry: {}\n\n'.format(milliseconds)
+
+
+def _messages(events):
+    '''Части потока: события или пустой комментарий, если их нет.'''
+    if not events:
+        return [': ping\n\n']
+    return [
+        'id: {}\nevent: {}\ndata: {}\n\n'.format(event_id, event, _dump(data))
+        for event_id, _, event, data in events
+    ]
+
+
+def stream(last_id, channels):
+    '''
+    Поток событий text/event-stream. Пока событий нет, раз
+    в LIVE_HEARTBEAT секунд отправляется комментарий, чтобы прокси
+    не закрыли соединение. Через LIVE_STREAM_SECONDS поток
+    завершается: браузер переподключится сам, а поток сервера
+    освободится.
+    '''
+    if not sync_slots.acquire(settings.LIVE_MAX_STREAMS):
+        yield _retry(settings.LIVE_BUSY_RETRY_MS)
+        return
+    try:
+        yield _retry(settings.LIVE_RETRY_MS)
+        deadline = time.monotonic() + settings.LIVE_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            events = broker.wait(last_id, channels, settings.LIVE_HEARTBEAT)
+            yield from _messages(events)
+            if events:
+                last_id = events[-1][0]
+    finally:
+        sync_slots.release()
+
+
+async def astream(last_id, channels):
+    '''Поток событий stream для сервера ASGI: ожидание без потока.'''
+    if not async_slots.acquire(settings.LIVE_MAX_ASYNC_STREAMS):
+        yield _retry(settings.LIVE_BUSY_RETRY_MS)
+        return
+    try:
+        yield _retry(settings.LIVE_RETRY_MS)
+        deadline = time.monotonic() + settings.LIVE_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            events = await broker.wait_async(
+                last_id, channels, settings.LIVE_HEARTBEAT
+            )
+            for message in _messages(events):
+                yield message
+            if events:
+                last_id = events[-1][0]
+    finally:
+        async_slots.release()
+
+
+def poll(last_id, channels):
+    '''
+    Ответ long-poll: события после last_id и номер последнего.
+    Если ждущих потоков уже LIVE_MAX_STREAMS, ответ отдается сразу.
+    '''
+    waits = sync_slots.acquire(settings.LIVE_MAX_STREAMS)
+    try:
+        events = broker.wait(
+            last_id, channels, settings.LIVE_POLL_TIMEOUT if waits else 0
+        )
+    finally:
+        if waits:
+            sync_slots.release()
+    return {
+        'last_event_id': events[-1][0] if events else last_id,
+        'events': [
+            {'id': event_id, 'event': event, 'data': data}
+            for event_id, _, event, data in events
+        ],
+    }
@@ -0,0 +1,219 @@
+'''
+Синтетические данные для нагрузочного тестирования.
+
+Генератор создает пользователей, группы, посты, комментарии
+и подписки заданного объема (до десятков миллионов строк). Авторство
+постов, число подписчиков авторов и число комментариев к постам
+распределены по степенному закону (закону Ципфа): элемент с рангом r
+выбирается с вероятностью, пропорциональной 1 / r ** alpha. Так
+получаются несколько «знаменитостей» и длинный хвост, как на живом
+сайте.
+
+Записи создаются пачками через bulk_create, в памяти держатся только
+ключи созданных строк (в массивах array), поэтому объем памяти
+растет медленно.
+'''
+import random
+from array import array
+from bisect import bisect
+from datetime import datetime
+from datetime import timedelta
+from itertools import accumulate
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Comment
+from .models import Follow
+from .models import Group
+from .models import Post
+from .transfer import keep_dates
+
+User = get_user_model()
+
+WORDS = (
+    'кот', 'собака', 'город', 'река', 'лес', 'море', 'книга', 'музыка',
+    'программа', 'сервер', 'база', 'данные', 'запрос', 'кеш', 'страница',
+    'лента', 'погода', 'утро', 'вечер', 'друг', 'работа', 'отпуск',
+    'поезд', 'дорога', 'горы', 'кофе', 'чай', 'фильм', 'игра', 'новости',
+    'думаю', 'читаю', 'пишу', 'смотрю', 'люблю', 'вижу', 'знаю',
+    'новый', 'старый', 'быстрый', 'медленный', 'красивый', 'интересный',
+    'python', 'django', 'sqlite', 'postgres',
+)
+# За сколько дней до запуска начинаются посты
+HISTORY_DAYS = 365
+# Какая доля постов публикуется в группах
+GROUP_SHARE = 0.5
+
+
+def zipf_sampler(size, alpha, rng):
+    '''
+    Функция, которая возвращает индекс от 0 до size - 1: индекс i
+    выпадает с вероятностью, пропорциональной 1 / (i + 1) ** alpha.
+    '''
+    cumulative = array('d', accumulate(
+        1 / (rank + 1) ** alpha for rank in range(size)
+    ))
+    total = cumulative[-1]
+
+    def sample():
+        return min(bisect(cumulative, rng.random() * total), size - 1)
+    return sample
+
+
+def _text(rng, low, high):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize()
+
+
+def _bulk_create(model, objs, batch_size):
+    objs = iter(objs)
+    batch = list(islice(objs, batch_size))
+    while batch:
+        with keep_dates(model):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+        batch = list(islice(objs, batch_size))
+
+
+def _new_keys(model, previous, *fields):
+    '''Ключи (и поля fields) строк, созданных после ключа previous.'''
+    rows = model.objects.filter(pk__gt=previous).order_by('pk')
+    if not fields:
+        return array('q', rows.values_list('pk', flat=True).iterator())
+    return rows.values_list('pk', *fields).iterator()
+
+
+def _last_key(model):
+    return model.objects.aggregate(last=Max('pk'))['last'] or 0
+
+
+def _users(count, prefix, start, batch_size):
+    # Пароль у всех один и непригодный для входа: хеширование
+    # миллиона паролей заняло бы часы
+    password = make_password(None)
+    previous = _last_key(User)
+    _bulk_create(User, (
+        User(
+            username='{}{}'.format(prefix, number),
+            password=password,
+            date_joined=start,
+        )
+        for number in range(count)
+    ), batch_size)
+    return _new_keys(User, previous)
+
+
+def _groups(count, prefix, rng, batch_size):
+    previous = _last_key(Group)
+    _bulk_create(Group, (
+        Group(
+            title='Группа {}'.format(number),
+            slug='{}-group-{}'.format(prefix, number),
+            description=_text(rng, 5, 20),
+        )
+        for number in range(count)
+    ), batch_size)
+    return _new_keys(Group, previous)
+
+
+def _posts(count, user_ids, group_ids, alpha, start, end, rng, batch_size):
+    author = zipf_sampler(len(user_ids), alpha, rng)
+    group = zipf_sampler(len(group_ids), alpha, rng) if group_ids else None
+    span = (end - start).total_seconds()
+
+    def post(number):
+        in_group = group is not None and rng.random() < GROUP_SHARE
+        return Post(
+            author_id=user_ids[author()],
+            group_id=group_ids[group()] if in_group else None,
+            text=_text(rng, 5, 80),
+            # Посты равномерно распределены по истории и идут
+            # в порядке ключей, как на живом сайте
+            pub_date=start + timedelta(seconds=span * number / count),
+        )
+    previous = _last_key(Post)
+    _bulk_create(Post, map(post, range(count)), batch_size)
+    post_ids = array('q')
+    post_dates = array('d')
+    for pk, pub_date in _new_keys(Post, previous, 'pub_date'):
+        post_ids.append(pk)
+        post_dates.append(pub_date.timestamp())
+    return post_ids, post_dates
+
+
+def _comments(count, user_ids, post_ids, post_dates, alpha, end, rng,
+              batch_size):
+    # Чаще всего комментируют самые новые посты
+    post = zipf_sampler(len(post_ids), alpha, rng)
+    end = end.timestamp()
+
+    def comment(number):
+        index = len(post_ids) - 1 - post()
+        posted = post_dates[index]
+        return Comment(
+            post_id=post_ids[index],
+            author_id=user_ids[rng.randrange(len(user_ids))],
+            text=_text(rng, 3, 30),
+            created=datetime.fromtimestamp(
+                posted + rng.random() * (end - posted), tz=timezone.utc
+            ),
+        )
+    previous = _last_key(Comment)
+    _bulk_create(Comment, map(comment, range(count)), batch_size)
+    return Comment.objects.filter(pk__gt=previous).count()
+
+
+def _follows(count, user_ids, alpha, rng, batch_size):
+    # Подписчиков больше всего у самых активных авторов
+    author = zipf_sampler(len(user_ids), alpha, rng)
+
+    def follow(number):
+        return Follow(
+            user_id=user_ids[rng.randrange(len(user_ids))],
+            author_id=user_ids[author()],
+        )
+    # Повторные подписки и подписки на себя отбрасываются
+    edges = (
+        edge for edge in map(follow, range(count))
+        if edge.user_id != edge.author_id
+    )
+    previous = _last_key(Follow)
+    _bulk_create(Follow, edges, batch_size)
+    return Follow.objects.filter(pk__gt=previous).count()
+
+
+def generate(users, groups, posts, comments, follows, alpha=1.1,
+             batch_size=1000, prefix='load', seed=None, log=print):
+    '''
+    Создает граф заданного размера и возвращает число созданных строк
+    по таблицам. Сигналы моделей не отправляются: производные данные
+    пересчитывает transfer.rebuild_derived.
+    '''
+    rng = random.Random(seed)
+    end = timezone.now()
+    start = end - timedelta(days=HISTORY_DAYS)
+    user_ids = _users(users, prefix, start, batch_size)
+    log('Пользователи: {}'.format(len(user_ids)))
+    group_ids = _groups(groups, prefix, rng, batch_size)
+    log('Группы: {}'.format(len(group_ids)))
+    post_ids, post_dates = _posts(
+        posts, user_ids, group_ids, alpha, start, end, rng, batch_size
+    )
+    log('Посты: {}'.format(len(post_ids)))
+    created = {
+        'users': len(user_ids),
+        'groups': len(group_ids),
+        'posts': len(post_ids),
+        'comments': 0,
+    }
+    if post_ids:
+        created['comments'] = _comments(
+            comments, user_ids, post_ids, post_dates, alpha, end, rng,
+            batch_size,
+        )
+    log('Комментарии: {}'.format(created['comments']))
+    created['follows'] = _follows(follows, user_ids, alpha, rng, batch_size)
+    log('Подписки: {}'.format(created['follows']))
+    return created
@@ -0,0 +1,60 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core import thumbnails
+from posts.models import Post
+
+# Сколько картинок отдавать пулу потоков за один раз
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Создает недостающие миниатюры картинок существующих постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.THUMBNAIL_WORKERS,
+            help='Сколько картинок обрабатывать одновременно '
+                 '(1 - без фоновых потоков)',
+        )
+
+    def generate(self, name):
+        try:
+            thumbnails.generate(name)
+        except Exception as error:
+            self.stderr.write('Картинка {}: {}'.format(name, error))
+            return False
+        return True
+
+    def generate_in_pool(self, name):
+        try:
+            return self.generate(name)
+        finally:
+            # Соединения с базой у потоков пула свои
+            connections.close_all()
+
+    def handle(self, *args, **options):
+        # Без сброса сортировки модели DISTINCT учитывал бы и pub_date
+        names = Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True
+        ).distinct().iterator()
+        results = []
+        if options['workers'] <= 1:
+            results = [self.generate(name) for name in names]
+        else:
+            with ThreadPoolExecutor(options['workers']) as pool:
+                batch = list(islice(names, BATCH_SIZE))
+                while batch:
+                    results.extend(pool.map(self.generate_in_pool, batch))
+                    batch = list(islice(names, BATCH_SIZE))
+        self.stdout.write(self.style.SUCCESS(
+            'Обработано картинок: {}, с ошибками: {}'.format(
+                results.count(True), results.count(False)
+            )
+        ))
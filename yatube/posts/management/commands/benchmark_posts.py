@@ -0,0 +1,77 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время ответа, число запросов к базе и размер страниц '
+        'приложения posts и сравнивает их с базовой линией'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=30,
+            help='Сколько раз запрашивать каждый адрес',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=3,
+            help='Сколько прогревочных запросов не учитывать',
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл JSON, в который записать результаты',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Файл JSON с базовой линией для сравнения',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.2,
+            help='Допустимый рост p95 относительно базовой линии',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            results = benchmark.run(options['requests'], options['warmup'])
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write('{:<28} {:>6} {:>9} {:>9} {:>9} {:>7} {:>8}'.format(
+            'адрес', 'код', 'p50, мс', 'p95, мс', 'p99, мс', 'SQL', 'байт'
+        ))
+        for name, result in results.items():
+            self.stdout.write(
+                '{:<28} {status:>6} {p50_ms:>9.2f} {p95_ms:>9.2f} '
+                '{p99_ms:>9.2f} {queries:>7} {bytes:>8}'.format(
+                    name, **result
+                )
+            )
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(
+                    {'requests': options['requests'], 'results': results},
+                    output,
+                    ensure_ascii=False,
+                    indent=2,
+                )
+        if options['baseline']:
+            with open(options['baseline']) as baseline:
+                regressions = benchmark.compare(
+                    json.load(baseline)['results'],
+                    results,
+                    options['tolerance'],
+                )
+            if regressions:
+                raise CommandError(
+                    'Регрессии производительности:\n' + '\n'.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,106 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность запущенных серверов WSGI '
+        'и ASGI, пока медленные клиенты занимают соединения'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--wsgi',
+            help='Адрес сервера WSGI, например http://127.0.0.1:8000',
+        )
+        parser.add_argument(
+            '--asgi',
+            help='Адрес сервера ASGI, например http://127.0.0.1:8001',
+        )
+        parser.add_argument(
+            '--clients',
+            type=int,
+            default=10,
+            help='Сколько быстрых клиентов запрашивают страницы',
+        )
+        parser.add_argument(
+            '--slow-clients',
+            type=int,
+            default=50,
+            help='Сколько клиентов передают запросы медленно',
+        )
+        parser.add_argument(
+            '--delay',
+            type=float,
+            default=2.0,
+            help='За сколько секунд медленный клиент передает запрос',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=10.0,
+            help='Сколько секунд длится замер каждого сервера',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=30.0,
+            help='Сколько секунд ждать ответа',
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл JSON, в который записать результаты',
+        )
+
+    def handle(self, *args, **options):
+        servers = {
+            name: options[name] for name in ('wsgi', 'asgi') if options[name]
+        }
+        if not servers:
+            raise CommandError('Укажите адрес --wsgi и/или --asgi')
+        try:
+            paths = benchmark.server_paths()
+        except ValueError as error:
+            raise CommandError(error)
+        results = {
+            name: benchmark.throughput(
+                url,
+                paths,
+                clients=options['clients'],
+                slow_clients=options['slow_clients'],
+                delay=options['delay'],
+                duration=options['duration'],
+                timeout=options['timeout'],
+            )
+            for name, url in servers.items()
+        }
+        self.stdout.write('{:<8} {:>9} {:>9} {:>9} {:>9} {:>9} {:>7}'.format(
+            'сервер', 'запросов', 'в сек.', 'p50, мс', 'p95, мс', 'p99, мс',
+            'ошибок'
+        ))
+        for name, result in results.items():
+            self.stdout.write(
+                '{:<8} {requests:>9} {rps:>9.2f} {:>9} {:>9} {:>9} '
+                '{errors:>7}'.format(
+                    name,
+                    *(result['p{}_ms'.format(percent)]
+                      for percent in benchmark.PERCENTILES),
+                    **result
+                )
+            )
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(
+                    {'options': {
+                        key: options[key] for key in (
+                            'clients', 'slow_clients', 'delay', 'duration'
+                        )
+                    }, 'results': results},
+                    output,
+                    ensure_ascii=False,
+                    indent=2,
+                )
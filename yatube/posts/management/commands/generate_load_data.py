@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from posts import loadgen
+from posts import transfer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает синтетических пользователей, группы, посты, комментарии '
+        'и подписки для нагрузочного тестирования'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in (
+            ('users', 1000),
+            ('groups', 20),
+            ('posts', 10000),
+            ('comments', 30000),
+            ('follows', 5000),
+        ):
+            parser.add_argument(
+                '--{}'.format(name),
+                type=int,
+                default=default,
+                help='Сколько строк создать (по умолчанию {})'.format(
+                    default
+                ),
+            )
+        parser.add_argument(
+            '--alpha',
+            type=float,
+            default=1.1,
+            help='Показатель степенного распределения авторства',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк сохранять одним запросом',
+        )
+        parser.add_argument(
+            '--prefix',
+            default='load',
+            help='Начало имен создаваемых пользователей и групп',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Зерно генератора случайных чисел',
+        )
+        parser.add_argument(
+            '--skip-rebuild',
+            action='store_true',
+            help='Не пересчитывать счетчики, поисковый индекс и ленты',
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь')
+        if User.objects.filter(
+            username__startswith=options['prefix']
+        ).exists():
+            raise CommandError(
+                'Пользователи с префиксом {} уже есть, задайте другой '
+                '--prefix'.format(options['prefix'])
+            )
+        created = loadgen.generate(
+            options['users'],
+            options['groups'],
+            options['posts'],
+            options['comments'],
+            options['follows'],
+            alpha=options['alpha'],
+            batch_size=options['batch_size'],
+            prefix=options['prefix'],
+            seed=options['seed'],
+            log=self.stdout.write,
+        )
+        if not options['skip_rebuild']:
+            transfer.rebuild_derived()
+            self.stdout.write(
+                'Пересчитаны счетчики, поисковый индекс и ленты подписок'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Создано строк: {}'.format(sum(created.values()))
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Строит поисковый индекс заново по всем постам и комментариям'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько документов записывать за один запрос',
+        )
+
+    def handle(self, *args, **options):
+        # Пока индекс строится, поиск видит прежний индекс целиком
+        with transaction.atomic():
+            search.rebuild(options['batch_size'])
+        backend = 'FTS5' if search.use_fts() else 'SearchTerm'
+        self.stdout.write(
+            self.style.SUCCESS('Индекс построен ({})'.format(backend))
+        )
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.db.models import Max
+
+from posts import counters
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Сверяет счетчики комментариев постов с таблицей комментариев'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения, ничего не менять',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.order_by().annotate(
+            actual_count=Count('comments'),
+            actual_last=Max('comments__created'),
+        ).values_list(
+            'pk',
+            'comment_count',
+            'last_comment_at',
+            'actual_count',
+            'actual_last',
+        ).iterator()
+        fixed = 0
+        for post_id, stored, stored_last, actual, actual_last in posts:
+            if stored == actual and stored_last == actual_last:
+                continue
+            fixed += 1
+            self.stdout.write(
+                'Пост {}: {} -> {}, {} -> {}'.format(
+                    post_id, stored, actual, stored_last, actual_last
+                )
+            )
+            if options['dry_run']:
+                continue
+            # Пересчет одним UPDATE учтет и комментарии,
+            # добавленные после первого прохода
+            counters.recount_comments(post_id)
+        self.stdout.write(
+            self.style.SUCCESS('Исправлено счетчиков: {}'.format(fixed))
+        )
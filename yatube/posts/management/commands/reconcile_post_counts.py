@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts.models import AuthorStats
+from posts.models import Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Сверяет счетчики постов авторов с таблицей постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения, ничего не менять',
+        )
+
+    def handle(self, *args, **options):
+        actual = User.objects.annotate(
+            actual_count=Count('posts')
+        ).values_list('pk', 'actual_count').iterator()
+        stored = dict(AuthorStats.objects.values_list('author', 'post_count'))
+        fixed = 0
+        for author_id, actual_count in actual:
+            stored_count = stored.get(author_id)
+            if stored_count == actual_count:
+                continue
+            if stored_count is None and actual_count == 0:
+                continue
+            fixed += 1
+            self.stdout.write(
+                'Автор {}: {} -> {}'.format(
+                    author_id, stored_count, actual_count
+                )
+            )
+            if options['dry_run']:
+                continue
+            # Пересчитываем внутри транзакции, чтобы не затереть посты,
+            # добавленные после первого прохода
+            with transaction.atomic():
+                AuthorStats.objects.update_or_create(
+                    author_id=author_id,
+                    defaults={
+                        'post_count': Post.objects.filter(
+                            author_id=author_id
+                        ).count()
+                    },
+                )
+        self.stdout.write(
+            self.style.SUCCESS('Исправлено счетчиков: {}'.format(fixed))
+        )
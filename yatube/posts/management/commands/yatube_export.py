@@ -0,0 +1,73 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает пользователей, группы, посты, комментарии и подписки '
+        'в файлы JSON Lines или CSV'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог для файлов выгрузки')
+        parser.add_argument(
+            '--format',
+            choices=transfer.FORMATS,
+            default='jsonl',
+            help='Формат файлов',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Сколько строк читать из базы за один запрос',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Продолжить прерванную выгрузку с контрольной точки',
+        )
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        data_format = options['format']
+        os.makedirs(directory, exist_ok=True)
+        checkpoint_path = os.path.join(directory, transfer.EXPORT_CHECKPOINT)
+        checkpoint = {}
+        if options['resume']:
+            checkpoint = transfer.load_checkpoint(checkpoint_path)
+            if checkpoint and checkpoint['format'] != data_format:
+                raise CommandError(
+                    'Прерванная выгрузка была в формате {}'.format(
+                        checkpoint['format']
+                    )
+                )
+        if not checkpoint:
+            checkpoint = {
+                'format': data_format,
+                'bounds': transfer.bounds(),
+                'tables': {},
+            }
+            transfer.save_checkpoint(checkpoint_path, checkpoint)
+        for name, model, fields in transfer.TABLES:
+            states = transfer.export_table(
+                os.path.join(directory, transfer.file_name(name, data_format)),
+                model,
+                fields,
+                data_format,
+                options['chunk_size'],
+                checkpoint['tables'].get(name, {'pk': 0, 'offset': 0}),
+                checkpoint['bounds'][name],
+            )
+            for state in states:
+                checkpoint['tables'][name] = state
+                transfer.save_checkpoint(checkpoint_path, checkpoint)
+            self.stdout.write('Выгружена таблица {}'.format(name))
+        os.remove(checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(
+            'Выгрузка завершена: {}'.format(directory)
+        ))
@@ -0,0 +1,85 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает пользователей, группы, посты, комментарии и подписки '
+        'из файлов команды yatube_export'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог с файлами выгрузки')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько записей сохранять одним запросом',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Продолжить прерванную загрузку с контрольной точки',
+        )
+        parser.add_argument(
+            '--skip-rebuild',
+            action='store_true',
+            help='Не пересчитывать счетчики, поисковый индекс и ленты',
+        )
+
+    def data_format(self, directory, name):
+        formats = [
+            data_format for data_format in transfer.FORMATS
+            if os.path.exists(os.path.join(
+                directory, transfer.file_name(name, data_format)
+            ))
+        ]
+        if len(formats) > 1:
+            raise CommandError(
+                'Таблица {} выгружена в нескольких форматах'.format(name)
+            )
+        return formats[0] if formats else None
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        checkpoint_path = os.path.join(directory, transfer.IMPORT_CHECKPOINT)
+        offsets = {}
+        if options['resume']:
+            offsets = transfer.load_checkpoint(checkpoint_path)
+        for name, model, fields in transfer.TABLES:
+            data_format = self.data_format(directory, name)
+            if data_format is None:
+                self.stdout.write('Нет файла таблицы {}'.format(name))
+                continue
+            loaded = 0
+            batches = transfer.import_table(
+                os.path.join(directory, transfer.file_name(name, data_format)),
+                model,
+                fields,
+                data_format,
+                options['batch_size'],
+                offsets.get(name, 0),
+            )
+            for count, offset in batches:
+                loaded += count
+                offsets[name] = offset
+                transfer.save_checkpoint(checkpoint_path, offsets)
+            self.stdout.write(
+                'Таблица {}: загружено записей {}'.format(name, loaded)
+            )
+        transfer.reset_sequences()
+        if not options['skip_rebuild']:
+            transfer.rebuild_derived()
+            self.stdout.write(
+                'Пересчитаны счетчики, поисковый индекс и ленты подписок'
+            )
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(
+            'Загрузка завершена. Миниатюры картинок создает команда '
+            'backfill_thumbnails'
+        ))
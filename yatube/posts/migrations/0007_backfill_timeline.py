@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count
+
+
+def backfill_timelines(apps, schema_editor):
+    '''
+    Ленты подписок для подписок, созданных до появления Timeline:
+    без них лента каждого подписчика пуста до первой новой подписки.
+    Посты «знаменитостей» не рассылаются, они читаются при запросе.
+    '''
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    Timeline = apps.get_model('posts', 'Timeline')
+    celebrities = Follow.objects.values('author').annotate(
+        followers=Count('pk')
+    ).filter(
+        followers__gt=settings.FOLLOW_FANOUT_THRESHOLD
+    ).values('author')
+    entries = Post.objects.filter(
+        author__following__isnull=False
+    ).exclude(
+        author__in=celebrities
+    ).order_by().values_list('author__following__user', 'pk')
+    select, params = entries.query.sql_with_params()
+    connection = schema_editor.connection
+    ops = connection.ops
+    # Один INSERT ... SELECT, без передачи строк через Python
+    with connection.cursor() as cursor:
+        cursor.execute(
+            '{} {} (user_id, post_id) {}{}'.format(
+                ops.insert_statement(ignore_conflicts=True),
+                ops.quote_name(Timeline._meta.db_table),
+                select,
+                ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+            ),
+            params,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_timelines, migrations.RunPython.noop),
+    ]
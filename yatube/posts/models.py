@@ -17,14 +17,36 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        '''
+        Посты для лент: автор и группа выбираются тем же запросом,
+        загружаются только поля, которые выводят шаблоны лент.
+        '''
+        return self.select_related('author', 'group').only(
+            'text',
+            'pub_date',
+            'image',
+            'comment_count',
+            'author__username',
+            'author__first_name',
+            'author__last_name',
+            'group__slug',
+            'group__title',
+        )
+
+
 class Post(models.Model):
     text = models.TextField('Текст поста')
     pub_date = models.DateTimeField('Дата создания поста', auto_now_add=True)
+    # Отдельные индексы внешних ключей не нужны: их заменяют
+    # составные индексы из Meta, которые начинаются с этих полей
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='posts',
-        verbose_name='Автор поста'
+        verbose_name='Автор поста',
+        db_index=False,
     )
     group = models.ForeignKey(
         Group,
@@ -33,22 +55,62 @@ class Post(models.Model):
         blank=True,
         null=True,
         verbose_name='Группа к которой принадлежит пост',
+        db_index=False,
     )
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
         blank=True,
     )
+    # Денормализованные счетчики комментариев (см. posts.counters)
+    comment_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False,
+    )
+    last_comment_at = models.DateTimeField(
+        'Дата последнего комментария',
+        blank=True,
+        null=True,
+        editable=False,
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
+        # Индексы повторяют ключ страниц лент (см. posts.pagination):
+        # страница читается по индексу без сортировки выборки
+        indexes = [
+            # Главная страница
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='posts_post_pub_date_idx',
+            ),
+            # Профайл автора
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='posts_post_author_idx',
+            ),
+            # Страница группы
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='posts_post_group_idx',
+            ),
+            # Лента «Обсуждаемые»: ключ страниц (comment_count, id)
+            models.Index(
+                fields=['-comment_count', '-id'],
+                name='posts_post_discussed_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
 class Comment(models.Model):
+    # Индекс внешнего ключа заменяет составной индекс из Meta
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -56,6 +118,7 @@ class Comment(models.Model):
         verbose_name='Cсылка на пост',
         blank=False,
         null=False,
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
@@ -79,6 +142,13 @@ class Comment(models.Model):
     class Meta:
         ordering = ['-created']
         verbose_name = 'Комментарий'
+        indexes = [
+            # Комментарии поста по курсору на (created, id)
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='posts_comment_post_idx',
+            ),
+        ]
 
     def __str__(self):
         return 'Комментарий {}: {}'.format(
@@ -119,3 +189,89 @@ class Follow(models.Model):
             self.user,
             self.author
         )
+
+
+class Timeline(models.Model):
+    '''
+    Материализованная лента подписок: пост автора, разосланный
+    подписчику при публикации (fan-out on write).
+    '''
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Владелец ленты',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост в ленте',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                name='unique_timeline_entry',
+                fields=['user', 'post'],
+            ),
+        ]
+
+    def __str__(self):
+        return 'Лента {}: {}'.format(self.user, self.post)
+
+
+class AuthorStats(models.Model):
+    '''Денормализованные счетчики автора для страниц профайла и поста.'''
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Автор',
+    )
+    post_count = models.PositiveIntegerField(
+        'Количество постов автора',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Счетчики автора'
+
+    def __str__(self):
+        return 'Счетчики {}'.format(self.author)
+
+
+class SearchTerm(models.Model):
+    '''
+    Запись обратного индекса для поиска без FTS5: терм текста поста
+    или комментария к нему и сколько раз он встречается в этом тексте.
+    '''
+    term = models.CharField('Терм', max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+        verbose_name='Пост',
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+        blank=True,
+        null=True,
+        verbose_name='Комментарий (пусто для текста поста)',
+    )
+    weight = models.PositiveIntegerField('Вес терма в тексте')
+
+    class Meta:
+        verbose_name = 'Терм поискового индекса'
+        indexes = [
+            models.Index(
+                fields=['term', 'post'], name='posts_search_term_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return '{}: {}'.format(self.term, self.post_id)
@@ -0,0 +1,133 @@
+'''
+Кеш целых страниц для гостей.
+
+Ответ представления для неавторизованного посетителя сохраняется
+в кеше PAGE_CACHE_ALIAS вместе с метками (surrogate keys), от которых
+зависит страница: post:<id>, author:<id>, group:<slug> и index
+(а также метки name_tag страниц, где автор или группа упоминаются).
+Каждой метке соответствует поколение (core.cache.generations);
+закешированная страница отдается, только если поколения всех ее меток
+не сменились. Обработчики posts.signals сбрасывают метки измененных
+записей, поэтому устаревают ровно те страницы, на которых они видны.
+
+Метки расставляет само представление вызовами tag и tag_posts:
+известные заранее - до чтения данных, метки постов страницы - сразу
+после. Поколения запоминаются в момент вызова, а сбрасываются
+и при изменении, и после фиксации транзакции, поэтому страница
+с прежними данными не переживет изменения. Не кешируются ответы
+с CSRF-токеном и ответы, которые ставят cookie. В ключ входят год
+из подвала страниц и версия выпуска ETAG_VERSION.
+'''
+import hashlib
+from datetime import date
+from functools import wraps
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from core.cache import bump_generations
+from core.cache import generations
+
+PAGE_KEY = 'page:{}:{}:{}'
+TAG = 'page_tag:{}'
+# Метка всех страниц: сбрасывается после загрузки данных без сигналов
+ALL = 'all'
+
+
+def _names(tags):
+    # Адрес группы может содержать символы, недопустимые в ключах memcached
+    return [TAG.format(quote(name, safe=':')) for name in tags]
+
+
+def tag(request, *tags):
+    '''Отмечает, что страница запроса зависит от меток tags.'''
+    versions = getattr(request, 'page_tags', None)
+    if versions is None:
+        return
+    tags = sorted(set(tags).difference(versions))
+    if tags:
+        versions.update(zip(
+            tags, generations(*_names(tags)).split('.')
+        ))
+
+
+def tag_posts(request, posts):
+    '''Метки постов страницы и имен их авторов и групп.'''
+    tags = []
+    for post in posts:
+        tags.append('post:{}'.format(post.pk))
+        tags.append(name_tag('author:{}'.format(post.author_id)))
+        if post.group_id is not None:
+            tags.append(name_tag('group:{}'.format(post.group.slug)))
+    tag(request, *tags)
+
+
+def name_tag(name):
+    '''
+    Метка страниц, где автор или группа name только упоминается:
+    ее сбрасывает переименование, но не новые посты автора или группы.
+    '''
+    return name + ':name'
+
+
+def purge(*tags):
+    '''
+    Сбрасывает страницы с метками tags. Внутри транзакции метки
+    сбрасываются еще раз после фиксации: пока она шла, страница
+    могла закешироваться с прежними данными.
+    '''
+    names = _names(tags)
+    bump_generations(*names)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: bump_generations(*names))
+
+
+def purge_all():
+    purge(ALL)
+
+
+def _key(request):
+    url = request.build_absolute_uri().encode()
+    return PAGE_KEY.format(
+        settings.ETAG_VERSION, date.today().year, hashlib.md5(url).hexdigest()
+    )
+
+
+def _cacheable(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_USED')
+    )
+
+
+def cache_anonymous(view):
+    '''Декоратор представления: кеш страниц для гостей.'''
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (
+            request.method not in ('GET', 'HEAD')
+            or request.user.is_authenticated
+        ):
+            return view(request, *args, **kwargs)
+        cache = caches[settings.PAGE_CACHE_ALIAS]
+        key = _key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            tags, versions, response = entry
+            if generations(*_names(tags)) == versions:
+                return response
+        request.page_tags = {}
+        tag(request, ALL)
+        response = view(request, *args, **kwargs)
+        if _cacheable(request, response):
+            tags = sorted(request.page_tags)
+            versions = '.'.join(request.page_tags[name] for name in tags)
+            cache.set(
+                key, (tags, versions, response), settings.PAGE_CACHE_TIMEOUT
+            )
+        return response
+    return wrapper
@@ -0,0 +1,252 @@
+import base64
+import binascii
+import hashlib
+import json
+from math import ceil
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from core.cache import get_or_recompute
+
+# Направления курсора: следующая страница, предыдущая и последняя
+FORWARD = 'n'
+BACKWARD = 'p'
+LAST = 'l'
+
+
+class CursorPaginator(Paginator):
+    '''
+    Постраничное разбиение по ключу (keyset) вместо LIMIT/OFFSET.
+
+    Страница выбирается условием по паре полей ключа, например
+    (pub_date, id), поэтому стоимость запроса не зависит от номера
+    страницы, а общий COUNT(*) не выполняется. Соседние страницы
+    адресуются непрозрачными токенами ``?cursor=``.
+    '''
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'pk'),
+                 approximate_count=False, cache_key=None,
+                 cache_timeout=None):
+        self.keys = keys
+        self.approximate_count = approximate_count
+        # Если задан ключ, выбранная страница кешируется целиком
+        self.cache_key = cache_key
+        self.cache_timeout = cache_timeout
+        # Ключ сортировки всегда по убыванию: сначала новые записи
+        super().__init__(
+            object_list.order_by(*['-' + key for key in keys]),
+            per_page,
+        )
+        self.cursor = None
+        self.page_number = 1
+        self.next_cursor = None
+        self.previous_cursor = None
+        self._has_next = False
+        # Выбрана последняя страница: за ней нет ни одной строки
+        self._is_last = False
+
+    @cached_property
+    def count(self):
+        '''
+        Количество объектов: точное либо приблизительное.
+
+        В приблизительном режиме число берется из статистики
+        PostgreSQL или из кеша, поэтому таблица сканируется не чаще,
+        чем раз в PAGINATOR_COUNT_CACHE_TIMEOUT секунд.
+        '''
+        if not self.approximate_count:
+            return super().count
+        queryset = self.object_list.order_by()
+        estimate = self._estimate_count(queryset)
+        if estimate is not None:
+            return estimate
+        sql = str(queryset.query).encode()
+        key = 'paginator_count:{}'.format(hashlib.md5(sql).hexdigest())
+        return cache.get_or_set(
+            key, queryset.count, settings.PAGINATOR_COUNT_CACHE_TIMEOUT
+        )
+
+    @staticmethod
+    def _estimate_count(queryset):
+        # Для таблицы без фильтров PostgreSQL хранит оценку числа строк
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql' or queryset.query.where:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row is None or row[0] < 0:
+            return None
+        return int(row[0])
+
+    @property
+    def num_pages(self):
+        # Без приблизительного подсчета известно лишь, есть ли
+        # следующая страница, поэтому «последней» считается текущая
+        known = self.page_number + (1 if self._has_next else 0)
+        # Устаревшая оценка не должна давать страницы за последней:
+        # Page.has_next сравнивает номер страницы с их числом
+        if not self.approximate_count or self._is_last:
+            return known
+        return max(known, ceil(self.count / self.per_page))
+
+    def encode_cursor(self, direction, number, obj=None):
+        '''Упаковывает позицию в непрозрачный токен.'''
+        # Строки страницы - объекты модели или словари values()
+        get = dict.get if isinstance(obj, dict) else getattr
+        values = [] if obj is None else [
+            str(get(obj, key)) for key in self.keys
+        ]
+        payload = json.dumps([direction, number, values])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, token):
+        '''Распаковывает токен, для битого токена возвращает None.'''
+        try:
+            payload = base64.urlsafe_b64decode(token.encode())
+            direction, number, values = json.loads(payload.decode())
+            number = max(int(number), 1)
+            if direction not in (FORWARD, BACKWARD, LAST):
+                raise ValueError
+            if direction != LAST and len(values) != len(self.keys):
+                raise ValueError
+            meta = self.object_list.model._meta
+            values = [
+                meta.get_field(
+                    meta.pk.name if key == 'pk' else key
+                ).to_python(value)
+                for key, value in zip(self.keys, values)
+            ]
+        except (binascii.Error, UnicodeError, TypeError, ValueError,
+                ValidationError):
+            return None
+        return direction, number, values
+
+    def _after(self, values, newer=False):
+        # Условие «строго после позиции» для составного ключа:
+        # (k1 < v1) OR (k1 = v1 AND k2 < v2) ...
+        lookup = 'gt' if newer else 'lt'
+        condition = Q()
+        for i, key in enumerate(self.keys):
+            term = Q(**{'{}__{}'.format(key, lookup): values[i]})
+            for prev_key, prev_value in zip(self.keys[:i], values[:i]):
+                term &= Q(**{prev_key: prev_value})
+            condition |= term
+        return condition
+
+    def get_page(self, cursor=None, number=None):
+        '''
+        Возвращает страницу по курсору.
+
+        Номер страницы ``number`` поддерживается для старых ссылок
+        вида ``?page=N``: такая страница выбирается через OFFSET один
+        раз, а ссылки с нее уже ведут по курсорам.
+        '''
+        if self.cache_key is None:
+            return self._fetch_page(cursor, number)
+        position = hashlib.md5(
+            '{}:{}'.format(cursor, number).encode()
+        ).hexdigest()
+        key = 'paginator_page:{}:{}'.format(self.cache_key, position)
+        snapshot = get_or_recompute(
+            key,
+            lambda: self._snapshot(self._fetch_page(cursor, number)),
+            self.cache_timeout,
+        )
+        return self._restore(snapshot)
+
+    def _snapshot(self, page):
+        return (
+            list(page.object_list),
+            page.number,
+            self._has_next,
+            self.cursor,
+            self.next_cursor,
+            self.previous_cursor,
+        )
+
+    def _restore(self, snapshot):
+        (rows, number, self._has_next, self.cursor, self.next_cursor,
+         self.previous_cursor) = snapshot
+        self.page_number = number
+        self._is_last = not self._has_next
+        return self._get_page(rows, number, self)
+
+    def _fetch_page(self, cursor, number):
+        self.cursor = cursor
+        position = self.decode_cursor(cursor) if cursor else None
+        if position is None:
+            try:
+                number = max(int(number), 1)
+            except (TypeError, ValueError):
+                number = 1
+            bottom = (number - 1) * self.per_page
+            rows = list(
+                self.object_list[bottom:bottom + self.per_page + 1]
+            )
+            if not rows and number > 1:
+                return self._fetch_page(None, None)
+            return self._build_page(rows, number, reverse=False)
+        direction, number, values = position
+        if direction == FORWARD:
+            rows = list(
+                self.object_list.filter(self._after(values))
+                [:self.per_page + 1]
+            )
+            return self._build_page(rows, number, reverse=False)
+        queryset = self.object_list.reverse()
+        if direction == BACKWARD:
+            queryset = queryset.filter(self._after(values, newer=True))
+        rows = list(queryset[:self.per_page + 1])
+        return self._build_page(
+            rows, number, reverse=True, last=direction == LAST
+        )
+
+    def _build_page(self, rows, number, reverse, last=False):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            # Шли от старых записей к новым: разворачиваем выборку
+            rows.reverse()
+            has_next = not last
+            if not has_more:
+                number = 1
+            elif number == 1:
+                number = 2
+        else:
+            has_next = has_more
+        if not rows:
+            has_next = False
+        if reverse and not rows:
+            number = 1
+        self.page_number = number
+        self._has_next = has_next
+        self._is_last = not has_next
+        if has_next:
+            self.next_cursor = self.encode_cursor(
+                FORWARD, number + 1, rows[-1]
+            )
+        if number > 1:
+            self.previous_cursor = self.encode_cursor(
+                BACKWARD, number - 1, rows[0]
+            )
+        return self._get_page(rows, number, self)
+
+    @property
+    def last_cursor(self):
+        '''Курсор последней страницы, имеет смысл при подсчете.'''
+        if not self.approximate_count:
+            return None
+        return self.encode_cursor(LAST, self.num_pages)
+
+    def page(self, number):
+        return self.get_page(number=number)
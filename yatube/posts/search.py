@@ -0,0 +1,309 @@
+'''
+Полнотекстовый поиск по постам и комментариям.
+
+Обратный индекс обновляется при сохранении и удалении постов
+и комментариев (см. posts.signals), поэтому запрос читает только
+записи индекса с термами запроса и не просматривает таблицу постов.
+
+Документ индекса - текст поста или одного комментария. В SQLite
+индекс хранится в таблице FTS5 posts_search_fts (rowid документа:
+2 * id для поста, 2 * id + 1 для комментария), в остальных базах -
+в таблице SearchTerm. Бэкенд задается настройкой SEARCH_BACKEND.
+
+Пост находится, если все термы запроса встречаются в нем или его
+комментариях. Вес текста поста вдвое больше веса комментария.
+'''
+from collections import Counter
+from functools import lru_cache
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case
+from django.db.models import Count
+from django.db.models import ExpressionWrapper
+from django.db.models import F
+from django.db.models import FloatField
+from django.db.models import Sum
+from django.db.models import When
+
+from .models import Comment
+from .models import Post
+from .models import SearchTerm
+from .stemmer import terms
+
+FTS_TABLE = 'posts_search_fts'
+# Во сколько раз совпадение в тексте поста важнее, чем в комментарии
+POST_WEIGHT = 2
+
+
+@lru_cache(maxsize=None)
+def _fts_available(alias):
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+def use_fts():
+    '''Хранится ли индекс в таблице FTS5.'''
+    backend = settings.SEARCH_BACKEND
+    if backend == 'auto':
+        return (
+            connection.vendor == 'sqlite'
+            and _fts_available(connection.alias)
+        )
+    return backend == 'fts5'
+
+
+def _post_rowid(post_id):
+    return 2 * post_id
+
+
+def _comment_rowid(comment_id):
+    return 2 * comment_id + 1
+
+
+def _fts_write(rowid, post_id, text):
+    body = ' '.join(terms(text))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'DELETE FROM {} WHERE rowid = %s'.format(FTS_TABLE), [rowid]
+        )
+        if body:
+            cursor.execute(
+                'INSERT INTO {} (rowid, body, post_id) '
+                'VALUES (%s, %s, %s)'.format(FTS_TABLE),
+                [rowid, body, post_id],
+            )
+
+
+def _fts_delete(rowid):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'DELETE FROM {} WHERE rowid = %s'.format(FTS_TABLE), [rowid]
+        )
+
+
+def _search_terms(post_id, comment_id, text, weight):
+    return [
+        SearchTerm(
+            term=term,
+            post_id=post_id,
+            comment_id=comment_id,
+            weight=count * weight,
+        )
+        for term, count in Counter(terms(text)).items()
+    ]
+
+
+def index_post(post):
+    '''Добавляет текст поста в индекс или обновляет его.'''
+    if use_fts():
+        _fts_write(_post_rowid(post.pk), post.pk, post.text)
+        return
+    SearchTerm.objects.filter(post=post.pk, comment=None).delete()
+    SearchTerm.objects.bulk_create(
+        _search_terms(post.pk, None, post.text, POST_WEIGHT)
+    )
+
+
+def index_comment(comment):
+    '''Добавляет текст комментария в индекс или обновляет его.'''
+    if use_fts():
+        _fts_write(
+            _comment_rowid(comment.pk), comment.post_id, comment.text
+        )
+        return
+    SearchTerm.objects.filter(comment=comment.pk).delete()
+    SearchTerm.objects.bulk_create(
+        _search_terms(comment.post_id, comment.pk, comment.text, 1)
+    )
+
+
+def index_created(posts=(), comments=()):
+    '''
+    Добавляет в индекс новые посты и комментарии (например, созданные
+    через bulk_create) одной пачкой: удалять прежние записи не нужно.
+    '''
+    documents = [(post.pk, None, post.text) for post in posts] + [
+        (comment.post_id, comment.pk, comment.text) for comment in comments
+    ]
+    if use_fts():
+        rows = [
+            (
+                _post_rowid(post_id) if comment_id is None
+                else _comment_rowid(comment_id),
+                ' '.join(terms(text)),
+                post_id,
+            )
+            for post_id, comment_id, text in documents
+        ]
+        rows = [row for row in rows if row[1]]
+        if rows:
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    'INSERT INTO {} (rowid, body, post_id) '
+                    'VALUES (%s, %s, %s)'.format(FTS_TABLE),
+                    rows,
+                )
+        return
+    SearchTerm.objects.bulk_create([
+        entry
+        for post_id, comment_id, text in documents
+        for entry in _search_terms(
+            post_id,
+            comment_id,
+            text,
+            POST_WEIGHT if comment_id is None else 1,
+        )
+    ])
+
+
+def remove_post(post, comment_ids=()):
+    '''
+    Убирает из индекса текст поста и его комментариев comment_ids,
+    удаленных каскадно вместе с ним.
+    '''
+    # Записи SearchTerm удаляются каскадно вместе с постом
+    if not use_fts():
+        return
+    rowids = [(_post_rowid(post.pk),)] + [
+        (_comment_rowid(comment_id),) for comment_id in comment_ids
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            'DELETE FROM {} WHERE rowid = %s'.format(FTS_TABLE), rowids
+        )
+
+
+def remove_comment(comment):
+    '''Убирает текст комментария из индекса.'''
+    if use_fts():
+        _fts_delete(_comment_rowid(comment.pk))
+
+
+def _fts_match(term):
+    # Термы состоят из букв и цифр, кавычки защищают
+    # от разбора слов как операторов FTS5
+    return '"{}"'.format(term)
+
+
+def _fts_search(query_terms, limit):
+    sql = (
+        'SELECT post_id, SUM(rank * CASE rowid %% 2 WHEN 0 THEN {weight} '
+        'ELSE 1 END) AS score FROM {table} WHERE {table} MATCH %s'
+    ).format(table=FTS_TABLE, weight=POST_WEIGHT)
+    params = [' OR '.join(_fts_match(term) for term in query_terms)]
+    if len(query_terms) > 1:
+        # Все термы должны найтись в посте или его комментариях,
+        # не обязательно в одном документе
+        sql += ' AND post_id IN ({})'.format(' INTERSECT '.join(
+            'SELECT post_id FROM {table} WHERE {table} MATCH %s'.format(
+                table=FTS_TABLE
+            )
+            for term in query_terms
+        ))
+        params.extend(_fts_match(term) for term in query_terms)
+    # rank в FTS5 отрицательный: чем меньше, тем документ релевантнее
+    sql += ' GROUP BY post_id ORDER BY score, post_id DESC LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [post_id for post_id, score in cursor.fetchall()]
+
+
+def _table_search(query_terms, limit):
+    entries = SearchTerm.objects.filter(term__in=query_terms)
+    frequencies = dict(
+        entries.values_list('term').annotate(
+            posts=Count('post', distinct=True)
+        )
+    )
+    if len(frequencies) < len(query_terms):
+        return []
+    # Редкие термы важнее частых (обратная частота документа)
+    score = Sum(Case(
+        *(
+            When(term=term, then=ExpressionWrapper(
+                F('weight') / float(posts), output_field=FloatField()
+            ))
+            for term, posts in frequencies.items()
+        ),
+        output_field=FloatField(),
+    ))
+    return list(
+        entries.values('post').annotate(
+            matched=Count('term', distinct=True), score=score
+        ).filter(
+            matched=len(query_terms)
+        ).order_by('-score', '-post').values_list('post', flat=True)[:limit]
+    )
+
+
+def search(query, limit=None):
+    '''Посты, найденные по запросу, от более к менее релевантным.'''
+    query_terms = sorted(set(terms(query)))
+    if not query_terms:
+        return []
+    limit = limit or settings.SEARCH_RESULTS_LIMIT
+    if use_fts():
+        post_ids = _fts_search(query_terms, limit)
+    else:
+        post_ids = _table_search(query_terms, limit)
+    posts = Post.objects.for_feed().in_bulk(post_ids)
+    return [posts[post_id] for post_id in post_ids if post_id in posts]
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
+def _documents(batch_size):
+    # (id поста, id комментария или None, текст) всех документов
+    posts = Post.objects.values_list('pk', 'text').iterator(batch_size)
+    for post_id, text in posts:
+        yield post_id, None, text
+    comments = Comment.objects.values_list(
+        'post', 'pk', 'text'
+    ).iterator(batch_size)
+    yield from comments
+
+
+def rebuild(batch_size=1000):
+    '''Строит индекс заново по всем постам и комментариям.'''
+    documents = _documents(batch_size)
+    if use_fts():
+        rows = (
+            (
+                _post_rowid(post_id) if comment_id is None
+                else _comment_rowid(comment_id),
+                ' '.join(terms(text)),
+                post_id,
+            )
+            for post_id, comment_id, text in documents
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {}'.format(FTS_TABLE))
+            rows = (row for row in rows if row[1])
+            for batch in _batches(rows, batch_size):
+                cursor.executemany(
+                    'INSERT INTO {} (rowid, body, post_id) '
+                    'VALUES (%s, %s, %s)'.format(FTS_TABLE),
+                    batch,
+                )
+        return
+    SearchTerm.objects.all().delete()
+    entries = (
+        entry
+        for post_id, comment_id, text in documents
+        for entry in _search_terms(
+            post_id,
+            comment_id,
+            text,
+            POST_WEIGHT if comment_id is None else 1,
+        )
+    )
+    for batch in _batches(entries, batch_size):
+        SearchTerm.objects.bulk_create(batch)
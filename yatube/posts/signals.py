@@ -0,0 +1,152 @@
+import threading
+
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.db.models.signals import pre_delete
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+
+from core import thumbnails
+
+from . import counters
+from . import live
+from . import pagecache
+from . import search
+from . import timeline
+from .caching import USER_NAME_FIELDS
+from .caching import invalidate_comments
+from .caching import invalidate_posts
+from .models import Comment
+from .models import Follow
+from .models import Group
+from .models import Post
+from .models import User
+
+_thread = threading.local()
+
+
+def _deleting_posts():
+    # Посты, удаляемые в этом потоке: id поста -> id его комментариев,
+    # удаленных каскадно
+    if not hasattr(_thread, 'posts'):
+        _thread.posts = {}
+    return _thread.posts
+
+
+def _purge_post_pages(post):
+    '''
+    Пост виден на своей странице и в лентах; появление и удаление
+    поста сдвигает главную, ленту группы и профайл автора, где еще
+    меняется число постов.
+    '''
+    tags = [
+        'post:{}'.format(post.pk), 'author:{}'.format(post.author_id),
+        'index',
+    ]
+    if post.group_id is not None:
+        tags.append('group:{}'.format(post.group.slug))
+    pagecache.purge(*tags)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    '''
+    Новый пост учитывается в счетчике и рассылается по лентам,
+    при правке поста сбрасывается кеш лент подписчиков.
+    Миниатюры картинки создаются в фоне.
+    '''
+    search.index_post(instance)
+    thumbnails.schedule(instance.image)
+    if created:
+        counters.change_post_count(instance.author_id, 1)
+        timeline.fan_out([instance])
+        live.posts_created([instance])
+    else:
+        timeline.invalidate_author_feeds(instance.author_id)
+    invalidate_posts()
+    _purge_post_pages(instance)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    '''
+    Комментарии удаляются каскадно до самого поста: счетчики
+    и кеш удаляемого поста по каждому из них не обновляются.
+    '''
+    _deleting_posts()[instance.pk] = []
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    comment_ids = _deleting_posts().pop(instance.pk, ())
+    search.remove_post(instance, comment_ids)
+    counters.change_post_count(instance.author_id, -1)
+    timeline.invalidate_author_feeds(instance.author_id)
+    invalidate_posts()
+    _purge_post_pages(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.comment_added(instance.post_id, instance.created)
+        live.comments_created([instance])
+    search.index_comment(instance)
+    invalidate_comments()
+    pagecache.purge('post:{}'.format(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    cascade = _deleting_posts().get(instance.post_id)
+    if cascade is not None:
+        # Текст комментария уберется из индекса вместе с постом
+        cascade.append(instance.pk)
+        return
+    counters.comment_removed(instance.post_id)
+    search.remove_comment(instance)
+    invalidate_comments()
+    pagecache.purge('post:{}'.format(instance.post_id))
+
+
+@receiver(pre_save, sender=Group)
+def group_saving(sender, instance, **kwargs):
+    '''Страницы по прежнему адресу группы тоже устаревают.'''
+    if instance.pk is None:
+        return
+    slug = Group.objects.filter(
+        pk=instance.pk
+    ).values_list('slug', flat=True).first()
+    if slug is not None and slug != instance.slug:
+        group = 'group:{}'.format(slug)
+        pagecache.purge(group, pagecache.name_tag(group))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    invalidate_posts()
+    group = 'group:{}'.format(instance.slug)
+    pagecache.purge(group, pagecache.name_tag(group))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    '''Имя автора выводится в лентах: его смена сбрасывает кеш.'''
+    # При входе на сайт сохраняется только last_login
+    if update_fields and not USER_NAME_FIELDS.intersection(update_fields):
+        return
+    invalidate_posts()
+    author = 'author:{}'.format(instance.pk)
+    pagecache.purge(author, pagecache.name_tag(author))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        timeline.follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    timeline.unfollow(instance.user_id, instance.author_id)
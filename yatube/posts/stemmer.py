@@ -0,0 +1,173 @@
+'''
+Разбиение текста на термы для полнотекстового поиска.
+
+Русские слова приводятся к основе стеммером Snowball (алгоритм
+Портера для русского языка), остальные слова только переводятся
+в нижний регистр. Частые служебные слова в индекс не попадают.
+'''
+import re
+from functools import lru_cache
+
+# Длиннее терм не бывает: обрезаем, чтобы влезть в поле индекса
+MAX_TERM_LENGTH = 64
+
+WORD_RE = re.compile(r'[0-9a-zа-я]+')
+CYRILLIC_RE = re.compile(r'[а-я]')
+
+STOP_WORDS = frozenset((
+    'а', 'без', 'бы', 'был', 'была', 'были', 'было', 'быть', 'в', 'вам',
+    'вас', 'весь', 'во', 'вот', 'все', 'всего', 'вы', 'где', 'да', 'для',
+    'до', 'его', 'ее', 'ей', 'ему', 'если', 'есть', 'еще', 'же', 'за',
+    'и', 'из', 'или', 'им', 'их', 'к', 'как', 'ко', 'когда', 'кто', 'ли',
+    'мне', 'мы', 'на', 'над', 'нас', 'не', 'нет', 'ни', 'но', 'о', 'об',
+    'он', 'она', 'они', 'оно', 'от', 'по', 'под', 'при', 'с', 'со', 'так',
+    'там', 'то', 'тот', 'ты', 'у', 'уже', 'что', 'это', 'эта', 'этот',
+    'я', 'a', 'an', 'and', 'in', 'is', 'of', 'on', 'or', 'the', 'to',
+))
+
+VOWELS = 'аеиоуыэюя'
+
+# Окончания, которые отбрасываются только после «а» или «я»
+PERFECTIVE_GERUND_AFTER_A = ('в', 'вши', 'вшись')
+PERFECTIVE_GERUND = ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись')
+ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE_AFTER_A = ('ем', 'нн', 'вш', 'ющ', 'щ')
+PARTICIPLE = ('ивш', 'ывш', 'ующ')
+REFLEXIVE = ('ся', 'сь')
+VERB_AFTER_A = (
+    'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+    'ют', 'ны', 'ть', 'ешь', 'нно',
+)
+VERB = (
+    'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+    'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+    'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+)
+NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+    'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+    'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+    'ья', 'я',
+)
+SUPERLATIVE = ('ейш', 'ейше')
+DERIVATIONAL = ('ост', 'ость')
+
+
+def _endings(endings, after_a=()):
+    # Самое длинное окончание проверяется первым, как в Snowball
+    return sorted(
+        [(ending, False) for ending in endings]
+        + [(ending, True) for ending in after_a],
+        key=lambda item: -len(item[0]),
+    )
+
+
+PERFECTIVE_GERUND_ENDINGS = _endings(
+    PERFECTIVE_GERUND, PERFECTIVE_GERUND_AFTER_A
+)
+ADJECTIVE_ENDINGS = _endings(ADJECTIVE)
+PARTICIPLE_ENDINGS = _endings(PARTICIPLE, PARTICIPLE_AFTER_A)
+REFLEXIVE_ENDINGS = _endings(REFLEXIVE)
+VERB_ENDINGS = _endings(VERB, VERB_AFTER_A)
+NOUN_ENDINGS = _endings(NOUN)
+SUPERLATIVE_ENDINGS = _endings(SUPERLATIVE)
+DERIVATIONAL_ENDINGS = _endings(DERIVATIONAL)
+
+
+def _regions(word):
+    # RV - часть слова после первой гласной,
+    # R2 - область R1 внутри R1 (см. описание алгоритма Snowball)
+    rv = r1 = r2 = len(word)
+    for i, char in enumerate(word):
+        if char in VOWELS:
+            rv = i + 1
+            break
+    for i in range(1, len(word)):
+        if word[i - 1] in VOWELS and word[i] not in VOWELS:
+            r1 = i + 1
+            break
+    for i in range(r1 + 1, len(word)):
+        if word[i - 1] in VOWELS and word[i] not in VOWELS:
+            r2 = i + 1
+            break
+    return rv, r2
+
+
+def _strip(word, start, endings):
+    '''Слово без найденного в области start окончания или None.'''
+    for ending, after_a in endings:
+        cut = len(word) - len(ending)
+        if cut < start or not word.endswith(ending):
+            continue
+        if after_a and (cut - 1 < start or word[cut - 1] not in 'ая'):
+            return None
+        return word[:cut]
+    return None
+
+
+def _step1(word, rv):
+    '''
+    Шаг 1: окончание деепричастия, иначе возвратная частица
+    и окончание прилагательного (причастия), глагола или существительного.
+    '''
+    result = _strip(word, rv, PERFECTIVE_GERUND_ENDINGS)
+    if result is not None:
+        return result
+    reflexive = _strip(word, rv, REFLEXIVE_ENDINGS)
+    if reflexive is not None:
+        word = reflexive
+    result = _strip(word, rv, ADJECTIVE_ENDINGS)
+    if result is not None:
+        participle = _strip(result, rv, PARTICIPLE_ENDINGS)
+        return result if participle is None else participle
+    result = _strip(word, rv, VERB_ENDINGS)
+    if result is None:
+        result = _strip(word, rv, NOUN_ENDINGS)
+    return word if result is None else result
+
+
+def _step4(word, rv):
+    '''Шаг 4: «нн», превосходная степень и мягкий знак.'''
+    if word.endswith('нн') and len(word) - 1 > rv:
+        return word[:-1]
+    result = _strip(word, rv, SUPERLATIVE_ENDINGS)
+    if result is not None:
+        if result.endswith('нн') and len(result) - 1 > rv:
+            return result[:-1]
+        return result
+    if word.endswith('ь') and len(word) > rv:
+        return word[:-1]
+    return word
+
+
+# Словарь текстов невелик по сравнению с числом слов в них:
+# при перестроении индекса основы в основном берутся из кеша
+@lru_cache(maxsize=100000)
+def stem(word):
+    '''Основа русского слова.'''
+    rv, r2 = _regions(word)
+    word = _step1(word, rv)
+    # Шаг 2: «и» на конце
+    if word.endswith('и') and len(word) > rv:
+        word = word[:-1]
+    # Шаг 3: словообразовательное окончание в области R2
+    result = _strip(word, r2, DERIVATIONAL_ENDINGS)
+    if result is not None:
+        word = result
+    return _step4(word, rv)
+
+
+def terms(text):
+    '''Термы текста в порядке появления, с повторами.'''
+    result = []
+    for word in WORD_RE.findall(text.lower().replace('ё', 'е')):
+        if word in STOP_WORDS:
+            continue
+        if CYRILLIC_RE.search(word):
+            word = stem(word)
+        result.append(word[:MAX_TERM_LENGTH])
+    return result
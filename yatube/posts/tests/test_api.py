@@ -0,0 +1,160 @@
+import gzip
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.test import TestCase
+from django.test import override_settings
+from django.urls import reverse
+
+from posts.models import Comment
+from posts.models import Group
+from posts.models import Post
+from posts.tests.utils import QueryBudgetMixin
+
+User = get_user_model()
+
+
+@override_settings(API_PAGE_SIZE=5)
+class ApiTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        for i in range(12):
+            Post.objects.create(
+                author=cls.author,
+                group=cls.group if i % 2 else None,
+                text=f'Пост {i}',
+            )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Последний'
+        )
+        for i in range(7):
+            Comment.objects.create(
+                post=cls.post, author=cls.author, text=f'Ком {i}'
+            )
+        cls.post.refresh_from_db()
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response, json.loads(response.content)
+
+    def walk(self, url, **params):
+        '''Все записи ленты API по ссылкам next.'''
+        response, data = self.get(url, **params)
+        results = data['results']
+        while data['next']:
+            response, data = self.get(data['next'])
+            results += data['results']
+        return results
+
+    def test_feed_walk(self):
+        """Лента API проходится по курсорам целиком и по порядку."""
+        ids = [post['id'] for post in self.walk(reverse('api:feed'))]
+        self.assertEqual(ids, list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True
+            )
+        ))
+
+    def test_post(self):
+        """Пост отдается со всеми полями."""
+        response, data = self.get(
+            reverse('api:post', kwargs={'post_id': self.post.pk})
+        )
+        self.assertEqual(data, {
+            'id': self.post.pk,
+            'text': 'Последний',
+            'pub_date': DjangoJSONEncoder().default(self.post.pub_date),
+            'author': 'author',
+            'group': 'group',
+            'image': None,
+            'comment_count': 7,
+        })
+
+    def test_sparse_fields(self):
+        """?fields= оставляет только запрошенные поля."""
+        response, data = self.get(reverse('api:feed'), fields='id,text')
+        self.assertEqual(set(data['results'][0]), {'id', 'text'})
+        self.assertIn('fields=id%2Ctext', data['next'])
+        posts = self.walk(reverse('api:feed'), fields='text')
+        self.assertEqual(len(posts), Post.objects.count())
+
+    def test_unknown_field(self):
+        """Неизвестное поле - ошибка 400."""
+        response, data = self.get(reverse('api:feed'), fields='id,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', data['error'])
+
+    def test_group_and_profile(self):
+        """Группа и профайл отдаются вместе со своими постами."""
+        response, data = self.get(
+            reverse('api:group', kwargs={'slug': 'group'})
+        )
+        self.assertEqual(data['group']['title'], 'Группа')
+        posts = self.walk(reverse('api:group', kwargs={'slug': 'group'}))
+        self.assertEqual(len(posts), self.group.posts.count())
+        response, data = self.get(
+            reverse('api:profile', kwargs={'username': 'author'})
+        )
+        self.assertEqual(data['author'], {
+            'username': 'author',
+            'first_name': 'Лев',
+            'last_name': 'Толстой',
+            'post_count': 13,
+        })
+
+    def test_comments(self):
+        """Комментарии идут от новых к старым по курсорам."""
+        comments = self.walk(
+            reverse('api:comments', kwargs={'post_id': self.post.pk})
+        )
+        self.assertEqual(
+            [comment['text'] for comment in comments],
+            [f'Ком {i}' for i in reversed(range(7))],
+        )
+
+    def test_not_found(self):
+        """Отсутствующие записи - ошибка 404 в JSON."""
+        for url in (
+            reverse('api:post', kwargs={'post_id': 0}),
+            reverse('api:comments', kwargs={'post_id': 0}),
+            reverse('api:group', kwargs={'slug': 'missing'}),
+            reverse('api:profile', kwargs={'username': 'missing'}),
+        ):
+            with self.subTest(url=url):
+                response, data = self.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertIn('error', data)
+
+    def test_compact_gzip_output(self):
+        """Ответ без лишних пробелов, кириллица не экранируется."""
+        response = self.client.get(
+            reverse('api:feed'), HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        content = gzip.decompress(response.content).decode()
+        self.assertIn('"text":"Последний"', content)
+        self.assertNotIn(', ', content)
+
+    def test_page_in_one_query(self):
+        """Страница ленты выбирается одним запросом."""
+        with self.assertMaxQueries(1):
+            self.client.get(reverse('api:feed'))
+
+    def test_not_modified(self):
+        """API поддерживает условные запросы."""
+        url = reverse('api:feed')
+        response = self.client.get(url)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
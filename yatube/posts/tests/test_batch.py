@@ -0,0 +1,145 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import Client
+from django.test import TestCase
+from django.test import override_settings
+from django.urls import reverse
+
+from posts import search
+from posts import timeline
+from posts.models import Comment
+from posts.models import Follow
+from posts.models import Group
+from posts.models import Post
+from posts.tests.utils import QueryBudgetMixin
+
+User = get_user_model()
+
+
+class BatchApiTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='-'
+        )
+        cls.post = Post.objects.create(author=cls.reader, text='Пост')
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def send(self, name, items, client=None):
+        response = (client or self.client).post(
+            reverse(name),
+            json.dumps({'items': items}),
+            content_type='application/json',
+        )
+        return response, json.loads(response.content)
+
+    def test_posts_created(self):
+        """Посты пачки создаются, отклоненные записи - с ошибками."""
+        response, data = self.send('api:batch_posts', [
+            {'text': 'Кот на крыше'},
+            {'text': ''},
+            {'text': 'Пост в группе', 'group': self.group.pk},
+            {'text': 'Нет группы', 'group': 0},
+            'не объект',
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['created'], 2)
+        results = data['results']
+        self.assertIn('text', results[1]['errors'])
+        self.assertIn('group', results[3]['errors'])
+        self.assertIn('__all__', results[4]['errors'])
+        first = Post.objects.get(pk=results[0]['id'])
+        self.assertEqual(
+            (first.text, first.author, first.group),
+            ('Кот на крыше', self.author, None),
+        )
+        second = Post.objects.get(pk=results[2]['id'])
+        self.assertEqual(second.group, self.group)
+
+    def test_posts_postprocessed(self):
+        """Счетчик, ленты подписчиков, поиск и кеш обновлены."""
+        self.client.get(reverse('posts:index'))
+        response, data = self.send('api:batch_posts', [
+            {'text': 'Кот на крыше'}, {'text': 'Собака в лесу'},
+        ])
+        ids = [result['id'] for result in data['results']]
+        self.assertEqual(self.author.stats.post_count, 2)
+        self.assertEqual(
+            set(timeline.feed(self.reader).values_list('pk', flat=True)),
+            set(ids),
+        )
+        self.assertEqual([post.pk for post in search.search('кот')], ids[:1])
+        self.assertContains(
+            Client().get(reverse('posts:index')), 'Собака в лесу'
+        )
+
+    def test_comments_created(self):
+        """Комментарии пачки учитываются в счетчиках поста."""
+        self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        response, data = self.send('api:batch_comments', [
+            {'post': self.post.pk, 'text': 'Первый'},
+            {'post': self.post.pk, 'text': 'Второй кот'},
+            {'post': 0, 'text': 'Нет поста'},
+            {'post': self.post.pk, 'text': ''},
+        ])
+        self.assertEqual(data['created'], 2)
+        self.assertEqual(data['results'][2]['errors'], {
+            'post': ['Пост не найден'],
+        })
+        self.assertIn('text', data['results'][3]['errors'])
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.comment_count, 2)
+        last = Comment.objects.get(pk=data['results'][1]['id'])
+        self.assertEqual(last.text, 'Второй кот')
+        self.assertEqual(post.last_comment_at, last.created)
+        self.assertEqual(search.search('кот'), [post])
+        self.assertContains(
+            Client().get(
+                reverse('posts:post_detail', kwargs={'post_id': post.pk})
+            ),
+            'Второй кот',
+        )
+
+    def test_queries_do_not_grow_with_batch(self):
+        """Число запросов не растет с размером пачки."""
+        def queries(size):
+            with self.assertMaxQueries(1000) as context:
+                self.send('api:batch_posts', [
+                    {'text': f'Пост {i}'} for i in range(size)
+                ])
+            return len(context)
+        # Первая пачка еще создает счетчик постов автора
+        queries(1)
+        self.assertEqual(queries(2), queries(20))
+
+    @override_settings(API_BATCH_LIMIT=2)
+    def test_bad_requests(self):
+        """Гость, неверное тело и слишком большая пачка отклоняются."""
+        response, data = self.send(
+            'api:batch_posts', [{'text': 'Пост'}], client=Client()
+        )
+        self.assertEqual(response.status_code, 401)
+        for items in ([], {'text': 'Пост'}, [{'text': 'Пост'}] * 3):
+            with self.subTest(items=items):
+                response, data = self.send('api:batch_posts', items)
+                self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            reverse('api:batch_posts'), 'не JSON', content_type='text/plain'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            self.client.get(reverse('api:batch_posts')).status_code, 405
+        )
+        self.assertFalse(Post.objects.filter(author=self.author).exists())
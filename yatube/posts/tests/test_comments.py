@@ -0,0 +1,152 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment
+from posts.models import Post
+from posts.tests.utils import QueryBudgetMixin
+
+User = get_user_model()
+
+
+@override_settings(NUM_DISP_COMMENTS=5)
+class CommentPaginationTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        # У каждого комментария свой автор: так проявился бы N+1
+        for i in range(12):
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create_user(username=f'reader{i}'),
+                text=f'Комментарий {i}',
+            )
+        cls.expected = list(Comment.objects.filter(
+            post=cls.post
+        ).order_by('-created', '-pk').values_list('text', flat=True))
+
+    def texts(self, response):
+        return [comment.text for comment in response.context['comments']]
+
+    def test_post_detail_shows_first_batch(self):
+        """Страница поста выводит только первую порцию комментариев."""
+        with self.assertMaxQueries(5):
+            response = self.client.get(reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.pk}
+            ))
+        self.assertEqual(self.texts(response), self.expected[:5])
+        cursor = response.context['comments'].paginator.next_cursor
+        self.assertContains(
+            response,
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+            + f'?cursor={cursor}',
+        )
+
+    def test_fragment_returns_next_batches(self):
+        """Фрагмент по курсору выдает следующие комментарии без повторов."""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        texts = []
+        cursor = ''
+        while cursor is not None:
+            with self.assertMaxQueries(2):
+                response = self.client.get(url, {'cursor': cursor})
+            self.assertNotContains(response, '<html')
+            texts.extend(self.texts(response))
+            cursor = response.context['comments'].paginator.next_cursor
+        self.assertEqual(texts, self.expected)
+
+    def test_fragment_for_missing_post(self):
+        """Фрагмент несуществующего поста - 404."""
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 999})
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class CommentCountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        self.post = Post.objects.create(author=self.author, text='Пост')
+
+    def refresh(self):
+        self.post.refresh_from_db()
+        return self.post.comment_count, self.post.last_comment_at
+
+    def test_counters_follow_add_and_delete(self):
+        """Счетчик и дата последнего комментария меняются сразу."""
+        self.client.force_login(self.author)
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Первый'},
+        )
+        first = Comment.objects.get(text='Первый')
+        second = Comment.objects.create(
+            post=self.post, author=self.author, text='Второй'
+        )
+        self.assertEqual(self.refresh(), (2, second.created))
+        second.delete()
+        self.assertEqual(self.refresh(), (1, first.created))
+        first.delete()
+        self.assertEqual(self.refresh(), (0, None))
+
+    def test_cascade_delete_skips_per_comment_work(self):
+        """Удаление поста не обновляет счетчики по каждому комментарию."""
+        def delete_queries(comments):
+            post = Post.objects.create(author=self.author, text='Пост')
+            for i in range(comments):
+                Comment.objects.create(
+                    post=post, author=self.author, text=f'Слово {i}'
+                )
+            with CaptureQueriesContext(connection) as context:
+                post.delete()
+            return [query['sql'] for query in context]
+
+        single = delete_queries(1)
+        many = delete_queries(5)
+        self.assertEqual(len(many), len(single))
+        self.assertFalse(any(
+            sql.startswith('UPDATE') and 'comment_count' in sql
+            for sql in many
+        ))
+
+    def test_reconcile_command(self):
+        """Команда исправляет счетчики, сбитые массовой вставкой."""
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.author, text=str(i))
+            for i in range(3)
+        )
+        self.assertEqual(self.refresh(), (0, None))
+        out = StringIO()
+        call_command('reconcile_comment_counts', '--dry-run', stdout=out)
+        self.assertEqual(self.refresh(), (0, None))
+        self.assertIn(f'Пост {self.post.pk}: 0 -> 3', out.getvalue())
+        call_command('reconcile_comment_counts', stdout=StringIO())
+        last = Comment.objects.order_by('-created').first().created
+        self.assertEqual(self.refresh(), (3, last))
+
+    def test_discussed_feed_order(self):
+        """Лента «Обсуждаемые» упорядочена по числу комментариев."""
+        quiet = Post.objects.create(author=self.author, text='Тихий пост')
+        busy = Post.objects.create(author=self.author, text='Горячий пост')
+        for post, count in ((self.post, 1), (busy, 3)):
+            for i in range(count):
+                Comment.objects.create(
+                    post=post, author=self.author, text=str(i)
+                )
+        response = self.client.get(reverse('posts:discussed'))
+        self.assertEqual(
+            list(response.context['page_obj']), [busy, self.post, quiet]
+        )
+        self.assertContains(response, 'Комментариев: 3')
@@ -0,0 +1,134 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment
+from posts.models import Follow
+from posts.models import Group
+from posts.models import Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+        cls.other_post = Post.objects.create(author=cls.author, text='Еще')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def revalidate(self, url, response, client=None):
+        return (client or self.client).get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+
+    def test_not_modified(self):
+        """Неизменившаяся страница отдается ответом 304 без шаблона."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.has_header('Last-Modified'))
+                response = self.revalidate(url, response)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                self.assertEqual(response.templates, [])
+
+    def test_if_modified_since(self):
+        """Last-Modified тоже подтверждает неизменившуюся страницу."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                response = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_feed_validated_without_queries(self):
+        """Ленты проверяются без запросов к базе."""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+    def test_changes_invalidate(self):
+        """Новый пост, правка и комментарий меняют ETag."""
+        changes = (
+            lambda: Post.objects.create(author=self.author, text='Новый'),
+            lambda: self.post.save(),
+            lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Ком'
+            ),
+        )
+        for change in changes:
+            responses = [self.client.get(url) for url in self.urls]
+            change()
+            for url, response in zip(self.urls, responses):
+                with self.subTest(url=url):
+                    self.assertEqual(
+                        self.revalidate(url, response).status_code, 200
+                    )
+
+    def test_comment_on_other_post(self):
+        """Комментарий к другому посту не меняет страницу поста."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.client.get(url)
+        Comment.objects.create(
+            post=self.other_post, author=self.reader, text='Ком'
+        )
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+    def test_etag_depends_on_visitor(self):
+        """Гость и пользователь получают разные ETag."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertNotEqual(
+                    self.client.get(url)['ETag'],
+                    self.reader_client.get(url)['ETag'],
+                )
+
+    def test_follow_changes_profile(self):
+        """Подписка меняет профайл автора для подписчика."""
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        response = self.reader_client.get(url)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            self.revalidate(url, response, self.reader_client).status_code,
+            200,
+        )
+
+    def test_release_changes_etag(self):
+        """Новый выпуск меняет ETag."""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        with self.settings(ETAG_VERSION='2'):
+            self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_missing_objects(self):
+        """Несуществующие пост, группа и автор - по-прежнему 404."""
+        for url in (
+            reverse('posts:post_detail', kwargs={'post_id': 0}),
+            reverse('posts:group_list', kwargs={'slug': 'missing'}),
+            reverse('posts:profile', kwargs={'username': 'missing'}),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
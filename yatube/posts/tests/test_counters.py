@@ -0,0 +1,58 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import AuthorStats
+from posts.models import Post
+
+User = get_user_model()
+
+
+class AuthorPostCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='userok')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    def stored_count(self):
+        return AuthorStats.objects.get(author=self.user).post_count
+
+    def test_counter_follows_create_and_delete(self):
+        """Счетчик меняется при создании и удалении поста."""
+        self.authorized_client.post(
+            reverse('posts:post_create'), data={'text': 'Первый пост'}
+        )
+        Post.objects.create(author=self.user, text='Второй пост')
+        self.assertEqual(self.stored_count(), 2)
+        Post.objects.filter(text='Второй пост').delete()
+        self.assertEqual(self.stored_count(), 1)
+
+    def test_profile_does_not_count_posts(self):
+        """Профайл берет число постов из счетчика без COUNT."""
+        Post.objects.create(author=self.user, text='Пост')
+        url = reverse('posts:profile', kwargs={'username': 'userok'})
+        self.authorized_client.get(url)
+        AuthorStats.objects.filter(author=self.user).update(post_count=42)
+        response = self.authorized_client.get(url)
+        self.assertEqual(response.context['count_user_posts'], 42)
+
+    def test_reconcile_command_fixes_drift(self):
+        """Команда сверки исправляет расхождение счетчика."""
+        Post.objects.create(author=self.user, text='Пост')
+        # bulk_create не отправляет сигналы, счетчик отстает
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'{i} пост') for i in range(3)
+        )
+        self.assertEqual(self.stored_count(), 1)
+        out = StringIO()
+        call_command('reconcile_post_counts', '--dry-run', stdout=out)
+        self.assertEqual(self.stored_count(), 1)
+        self.assertIn('1 -> 4', out.getvalue())
+        call_command('reconcile_post_counts', stdout=StringIO())
+        self.assertEqual(self.stored_count(), 4)
@@ -0,0 +1,110 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment
+from posts.models import Follow
+from posts.models import Group
+from posts.models import Post
+
+User = get_user_model()
+
+# Полный просмотр таблицы без индекса: «SCAN posts_post»
+FULL_SCAN_RE = re.compile(r'^SCAN (TABLE )?\w+$')
+TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Планы запросов SQLite')
+class QueryPlanTests(TestCase):
+    '''Запросы лент читают страницы по индексам, без полной сортировки.'''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(15):
+            cls.post = Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}'
+            )
+        for i in range(25):
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f'Комментарий {i}'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def plans(self, url, params=None):
+        '''Планы всех SELECT-запросов, выполненных страницей.'''
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        plans = []
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plans.append((sql, [row[-1] for row in cursor.fetchall()]))
+        return response, plans
+
+    def assertIndexedPlans(self, url, params=None, allow_sort=False):
+        response, plans = self.plans(url, params)
+        for sql, plan in plans:
+            for step in plan:
+                self.assertIsNone(
+                    FULL_SCAN_RE.match(step),
+                    f'Полный просмотр таблицы: {step}\n{sql}',
+                )
+                if not allow_sort:
+                    self.assertNotEqual(
+                        step, TEMP_SORT, f'Сортировка выборки:\n{sql}'
+                    )
+        return response
+
+    def test_feeds_use_indexes(self):
+        """Главная, группа, профайл и «Обсуждаемые» читают по индексу."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'group'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:discussed'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.assertIndexedPlans(url)
+                cursor = response.context['page_obj'].paginator.next_cursor
+                # Следующая страница по курсору тоже читается по индексу
+                self.assertIndexedPlans(url, {'cursor': cursor})
+
+    def test_post_comments_use_index(self):
+        """Комментарии поста выбираются по индексу (post, created)."""
+        response = self.assertIndexedPlans(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        ))
+        cursor = response.context['comments'].paginator.next_cursor
+        self.assertIndexedPlans(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            {'cursor': cursor},
+        )
+
+    def test_follow_feed_has_no_full_scans(self):
+        """Лента подписок не просматривает таблицы целиком."""
+        # Посты ленты сортируются после выборки записей Timeline
+        # пользователя: сортировка ограничена размером его ленты
+        self.assertIndexedPlans(
+            reverse('posts:follow_index'), allow_sort=True
+        )
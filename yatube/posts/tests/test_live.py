@@ -0,0 +1,257 @@
+import asyncio
+import json
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.cache import caches
+from django.test import Client
+from django.test import TestCase
+from django.test import TransactionTestCase
+from django.test import override_settings
+from django.urls import reverse
+
+from posts import live
+from posts.models import Comment
+from posts.models import Post
+
+User = get_user_model()
+
+
+class BrokerTests(TestCase):
+    def test_wait_returns_events_of_channels_after_id(self):
+        """Ожидание отдает только события нужных каналов после номера."""
+        broker = live.Broker(10)
+        broker.publish('posts', 'posts', {'count': 1})
+        broker.publish('post:1', 'comment', {'id': 1})
+        broker.publish('posts', 'posts', {'count': 2})
+        events = broker.wait(1, {'posts'}, 0)
+        self.assertEqual(events, [(3, 'posts', 'posts', {'count': 2})])
+
+    def test_wait_wakes_up_on_publish(self):
+        """Ожидающий подписчик получает событие, опубликованное позже."""
+        broker = live.Broker(10)
+        timer = threading.Timer(0.05, broker.publish, ('posts', 'posts', {}))
+        timer.start()
+        events = broker.wait(0, {'posts'}, 5)
+        timer.join()
+        self.assertEqual(events, [(1, 'posts', 'posts', {})])
+
+    def test_wait_times_out(self):
+        """Без событий ожидание заканчивается пустым списком."""
+        broker = live.Broker(10)
+        self.assertEqual(broker.wait(0, {'posts'}, 0.01), [])
+
+    def test_async_wait_wakes_up_on_publish(self):
+        """Асинхронное ожидание просыпается от публикации в другом потоке."""
+        broker = live.Broker(10)
+        broker.publish('post:1', 'comment', {})
+        timer = threading.Timer(0.05, broker.publish, ('posts', 'posts', {}))
+        timer.start()
+        events = asyncio.run(broker.wait_async(0, {'posts'}, 5))
+        timer.join()
+        self.assertEqual(events, [(2, 'posts', 'posts', {})])
+        self.assertEqual(broker.waiters, set())
+
+    def test_async_wait_times_out(self):
+        broker = live.Broker(10)
+        self.assertEqual(
+            asyncio.run(broker.wait_async(0, {'posts'}, 0.01)), []
+        )
+
+    def test_buffer_keeps_last_events(self):
+        """Брокер помнит только последние события."""
+        broker = live.Broker(2)
+        for count in range(3):
+            broker.publish('posts', 'posts', {'count': count})
+        self.assertEqual(
+            [event[0] for event in broker.wait(0, {'posts'}, 0)], [2, 3]
+        )
+
+
+@override_settings(
+    LIVE_HEARTBEAT=0.01, LIVE_STREAM_SECONDS=0.05, LIVE_POLL_TIMEOUT=0.01
+)
+class LiveViewsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = Client()
+
+    def test_stream_sends_missed_events(self):
+        """Поток отдает события после Last-Event-ID в формате SSE."""
+        last_id = live.broker.current()
+        live.broker.publish(
+            live.POSTS, live.POSTS_EVENT, {'count': 2, 'ids': [1, 2]}
+        )
+        response = self.client.get(
+            reverse('api:live_posts'), HTTP_LAST_EVENT_ID=str(last_id)
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        body = b''.join(response.streaming_content).decode()
+        self.assertTrue(body.startswith('retry: '))
+        self.assertIn(
+            'id: {}\nevent: posts\ndata: {{"count":2,"ids":[1,2]}}\n\n'.format(
+                last_id + 1
+            ),
+            body,
+        )
+        self.assertIn(': ping\n\n', body)
+
+    def test_async_stream(self):
+        """Для сервера ASGI у потока есть асинхронный итератор."""
+        last_id = live.broker.current()
+        live.broker.publish(
+            live.POSTS, live.POSTS_EVENT, {'count': 1, 'ids': [1]}
+        )
+        response = self.client.get(
+            reverse('api:live_posts'), HTTP_LAST_EVENT_ID=str(last_id)
+        )
+
+        async def read():
+            return [chunk async for chunk in response.async_streaming_content]
+
+        body = ''.join(asyncio.run(read()))
+        self.assertTrue(body.startswith('retry: '))
+        self.assertIn('event: posts\ndata: {"count":1,"ids":[1]}', body)
+        self.assertEqual(live.async_slots.used, 0)
+
+    @override_settings(LIVE_MAX_STREAMS=0, LIVE_MAX_ASYNC_STREAMS=0)
+    def test_stream_limit(self):
+        """Без свободных мест поток сразу завершается с долгой паузой."""
+        response = self.client.get(reverse('api:live_posts'))
+        busy = 'retry: {}\n\n'.format(settings.LIVE_BUSY_RETRY_MS)
+        self.assertEqual(b''.join(response.streaming_content).decode(), busy)
+
+        async def read():
+            return [chunk async for chunk in response.async_streaming_content]
+
+        self.assertEqual(asyncio.run(read()), [busy])
+
+    @override_settings(LIVE_MAX_STREAMS=0, LIVE_POLL_TIMEOUT=5)
+    def test_poll_without_free_slot_does_not_wait(self):
+        """Long-poll без свободного места отвечает без ожидания."""
+        last_id = live.broker.current()
+        started = time.monotonic()
+        response = self.client.get(
+            reverse('api:live_posts'),
+            {'poll': 1, 'last_event_id': last_id},
+        )
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(response.json()['events'], [])
+
+    def test_pages_do_not_open_stream(self):
+        """Поток событий открывается кнопкой, а не при выводе страницы."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'id="live-posts"')
+        self.assertContains(
+            response, "livePosts.addEventListener('click'"
+        )
+
+    def test_new_subscriber_skips_old_events(self):
+        """Новый подписчик не получает события до подключения."""
+        live.broker.publish(
+            live.POSTS, live.POSTS_EVENT, {'count': 1, 'ids': [1]}
+        )
+        response = self.client.get(reverse('api:live_posts'))
+        body = b''.join(response.streaming_content).decode()
+        self.assertNotIn('event: posts', body)
+
+    def test_poll_returns_comments_of_post(self):
+        """Long-poll возвращает комментарии только своего поста."""
+        last_id = live.broker.current()
+        for post_id in (self.post.pk, self.post.pk + 1):
+            live.broker.publish(
+                live.COMMENTS.format(post_id), live.COMMENT_EVENT,
+                {'id': post_id},
+            )
+        response = self.client.get(
+            reverse('api:live_comments', args=(self.post.pk,)),
+            {'poll': 1, 'last_event_id': last_id},
+        )
+        self.assertEqual(response.json(), {
+            'last_event_id': last_id + 1,
+            'events': [
+                {
+                    'id': last_id + 1,
+                    'event': 'comment',
+                    'data': {'id': self.post.pk},
+                },
+            ],
+        })
+
+    def test_poll_without_events(self):
+        """Пустой long-poll возвращает прежний номер события."""
+        last_id = live.broker.current()
+        response = self.client.get(
+            reverse('api:live_posts'),
+            {'poll': 1, 'last_event_id': last_id},
+        )
+        self.assertEqual(
+            response.json(), {'last_event_id': last_id, 'events': []}
+        )
+
+    def test_unknown_post(self):
+        response = self.client.get(
+            reverse('api:live_comments', args=(self.post.pk + 100,))
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class LivePublishTests(TransactionTestCase):
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.last_id = live.broker.current()
+
+    def events(self, channel):
+        return [
+            data
+            for _, _, _, data in live.broker.wait(self.last_id, {channel}, 0)
+        ]
+
+    def test_new_post_and_comment_are_published(self):
+        """Новые пост и комментарий публикуются после сохранения."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.author, text='Комментарий'
+        )
+        self.assertEqual(
+            self.events(live.POSTS), [{'count': 1, 'ids': [post.pk]}]
+        )
+        self.assertEqual(self.events(live.COMMENTS.format(post.pk)), [{
+            'id': comment.pk,
+            'author': 'author',
+            'text': 'Комментарий',
+            'created': comment.created,
+        }])
+
+    def test_edit_is_not_published(self):
+        """Правка поста не считается новым постом."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.last_id = live.broker.current()
+        post.text = 'Правка'
+        post.save()
+        self.assertEqual(self.events(live.POSTS), [])
+
+    def test_batch_publishes_once(self):
+        """Пачка постов из API - одно событие с их числом."""
+        client = Client()
+        client.force_login(self.author)
+        response = client.post(
+            reverse('api:batch_posts'),
+            json.dumps({'items': [{'text': 'Один'}, {'text': 'Два'}]}),
+            content_type='application/json',
+        )
+        ids = [result['id'] for result in response.json()['results']]
+        self.assertEqual(
+            self.events(live.POSTS), [{'count': 2, 'ids': ids}]
+        )
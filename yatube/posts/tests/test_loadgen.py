@@ -0,0 +1,189 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count
+from django.db.models import Sum
+from django.test import LiveServerTestCase
+from django.test import TestCase
+
+from posts import benchmark
+from posts import urls
+from posts.models import AuthorStats
+from posts.models import Comment
+from posts.models import Follow
+from posts.models import Post
+
+User = get_user_model()
+
+
+class LoadDataTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'generate_load_data',
+            users=50,
+            groups=3,
+            posts=400,
+            comments=600,
+            follows=200,
+            seed=1,
+            stdout=StringIO(),
+        )
+
+    def test_rows_created(self):
+        """Создается заданное число строк."""
+        self.assertEqual(User.objects.count(), 50)
+        self.assertEqual(Post.objects.count(), 400)
+        self.assertEqual(Comment.objects.count(), 600)
+        # Повторные подписки и подписки на себя отбрасываются
+        self.assertTrue(0 < Follow.objects.count() <= 200)
+
+    def test_authorship_follows_power_law(self):
+        """Несколько авторов пишут большую часть постов."""
+        counts = list(User.objects.annotate(
+            total=Count('posts')
+        ).order_by('-total').values_list('total', flat=True))
+        self.assertGreater(sum(counts[:5]), sum(counts) / 2)
+        self.assertGreater(counts[0], 10 * counts[len(counts) // 2])
+
+    def test_derived_data_rebuilt(self):
+        """Счетчики и ленты пересчитаны после bulk_create."""
+        self.assertEqual(
+            AuthorStats.objects.aggregate(total=Sum('post_count'))['total'],
+            400,
+        )
+        self.assertEqual(
+            Post.objects.aggregate(total=Sum('comment_count'))['total'], 600
+        )
+        follow = Follow.objects.first()
+        self.assertEqual(
+            follow.user.timeline.filter(post__author=follow.author).count(),
+            Post.objects.filter(author=follow.author).count(),
+        )
+
+    def test_prefix_must_be_new(self):
+        """Повторный запуск с тем же префиксом отклоняется."""
+        with self.assertRaises(CommandError):
+            call_command('generate_load_data', users=1, stdout=StringIO())
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'generate_load_data',
+            users=10,
+            groups=2,
+            posts=30,
+            comments=30,
+            follows=20,
+            seed=1,
+            stdout=StringIO(),
+        )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = os.path.join(directory.name, 'baseline.json')
+
+    def test_percentile(self):
+        """Перцентиль считается по ближайшему рангу."""
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 95), 95)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([7], 99), 7)
+
+    def test_all_urls_measured(self):
+        """Замеряются все адреса чтения, результаты пишутся в JSON."""
+        follows = list(Follow.objects.values_list('pk', flat=True))
+        call_command(
+            'benchmark_posts',
+            requests=2,
+            warmup=0,
+            output=self.output,
+            stdout=StringIO(),
+        )
+        with open(self.output) as output:
+            results = json.load(output)['results']
+        self.assertEqual(
+            set(results),
+            {'posts:{}'.format(pattern.name) for pattern in urls.urlpatterns}
+            - benchmark.WRITE_ENDPOINTS,
+        )
+        for result in results.values():
+            self.assertLess(result['status'], 400)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertGreater(results['posts:index']['bytes'], 0)
+        # Замер не подписывает и не отписывает пользователя
+        self.assertEqual(
+            list(Follow.objects.values_list('pk', flat=True)), follows
+        )
+
+    def test_regression_detected(self):
+        """Рост числа запросов относительно базовой линии - регрессия."""
+        call_command(
+            'benchmark_posts',
+            requests=2,
+            warmup=0,
+            output=self.output,
+            stdout=StringIO(),
+        )
+        with open(self.output) as output:
+            baseline = json.load(output)
+        baseline['results']['posts:post_detail']['queries'] = 0
+        with open(self.output, 'w') as output:
+            json.dump(baseline, output)
+        with self.assertRaisesMessage(CommandError, 'posts:post_detail'):
+            call_command(
+                'benchmark_posts',
+                requests=2,
+                warmup=0,
+                baseline=self.output,
+                tolerance=100,
+                stdout=StringIO(),
+            )
+
+
+class ServerBenchmarkTests(LiveServerTestCase):
+    def setUp(self):
+        call_command(
+            'generate_load_data',
+            users=5,
+            groups=1,
+            posts=10,
+            comments=10,
+            follows=5,
+            seed=1,
+            stdout=StringIO(),
+        )
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = os.path.join(directory.name, 'servers.json')
+
+    def test_server_measured(self):
+        """Быстрые клиенты получают ответы, пока медленные шлют запросы."""
+        call_command(
+            'benchmark_servers',
+            wsgi=self.live_server_url,
+            clients=2,
+            slow_clients=2,
+            delay=0.2,
+            duration=0.5,
+            output=self.output,
+            stdout=StringIO(),
+        )
+        with open(self.output) as output:
+            result = json.load(output)['results']['wsgi']
+        self.assertGreater(result['requests'], 0)
+        self.assertEqual(result['errors'], 0)
+        self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+    def test_server_required(self):
+        with self.assertRaises(CommandError):
+            call_command('benchmark_servers', stdout=StringIO())
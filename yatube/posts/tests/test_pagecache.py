@@ -0,0 +1,169 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.test import Client
+from django.test import RequestFactory
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import pagecache
+from posts.models import Comment
+from posts.models import Group
+from posts.models import Post
+
+User = get_user_model()
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='-'
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая', slug='other-group', description='-'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+        cls.other_post = Post.objects.create(
+            author=cls.other, group=cls.other_group, text='Другой'
+        )
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.index = reverse('posts:index')
+        self.group_url = reverse('posts:group_list', kwargs={'slug': 'group'})
+        self.other_group_url = reverse(
+            'posts:group_list', kwargs={'slug': 'other-group'}
+        )
+        self.profile = reverse('posts:profile', kwargs={'username': 'author'})
+        self.post_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+        self.other_post_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.other_post.pk}
+        )
+        self.urls = (
+            self.index, self.group_url, self.other_group_url, self.profile,
+            self.post_url, self.other_post_url,
+        )
+
+    def cached(self, url, client=None):
+        '''Отдана ли страница из кеша (без вывода шаблонов).'''
+        response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, 200)
+        return not response.templates
+
+    def warm(self):
+        for url in self.urls:
+            self.client.get(url)
+
+    def assertPurged(self, purged):
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.cached(url), url not in purged)
+
+    def test_guest_pages_cached(self):
+        """Повторный запрос гостя отдается из кеша без запросов к ленте."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertFalse(self.cached(url))
+                self.assertTrue(self.cached(url))
+        with self.assertNumQueries(0):
+            self.client.get(self.index)
+
+    def test_authorized_not_cached(self):
+        """Страницы пользователей не кешируются."""
+        client = Client()
+        client.force_login(self.author)
+        for url in self.urls:
+            with self.subTest(url=url):
+                client.get(url)
+                self.assertFalse(self.cached(url, client))
+
+    def test_comment_purges_post(self):
+        """Комментарий сбрасывает страницы, где виден его пост."""
+        self.warm()
+        Comment.objects.create(post=self.post, author=self.other, text='Ком')
+        self.assertPurged({
+            self.post_url, self.index, self.group_url, self.profile,
+        })
+
+    def test_new_post_purges_feeds(self):
+        """Новый пост сбрасывает главную, ленту группы и посты автора."""
+        self.warm()
+        Post.objects.create(author=self.other, group=self.group, text='Новый')
+        # На странице поста выводится число постов автора
+        self.assertPurged({self.index, self.group_url, self.other_post_url})
+
+    def test_edit_moves_post(self):
+        """Перенос поста в другую группу сбрасывает обе ленты групп."""
+        self.warm()
+        # Объекты setUpTestData общие для тестов: меняем копию
+        post = Post.objects.get(pk=self.post.pk)
+        post.group = self.other_group
+        post.save()
+        self.assertPurged({
+            self.index, self.group_url, self.other_group_url, self.profile,
+            self.post_url,
+        })
+
+    def test_author_rename(self):
+        """Смена имени автора сбрасывает страницы с его постами."""
+        self.warm()
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Лев'
+        author.save()
+        self.assertPurged({
+            self.index, self.group_url, self.profile, self.post_url,
+        })
+
+    def test_group_slug_change(self):
+        """Прежний адрес группы перестает отдаваться из кеша."""
+        self.warm()
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed'
+        group.save()
+        self.assertEqual(self.client.get(self.group_url).status_code, 404)
+
+    def test_purge_all(self):
+        """purge_all сбрасывает все страницы."""
+        self.warm()
+        pagecache.purge_all()
+        self.assertPurged(set(self.urls))
+
+    def test_year_in_key(self):
+        """С новым годом страницы выводятся заново."""
+        self.warm()
+        with mock.patch('posts.pagecache.date') as date:
+            date.today.return_value.year = 3000
+            self.assertFalse(self.cached(self.index))
+
+    def test_csrf_and_cookies_not_cached(self):
+        """Ответы с CSRF-токеном и cookie не кешируются."""
+        def with_token(request):
+            return HttpResponse(get_token(request))
+
+        def with_cookie(request):
+            response = HttpResponse('')
+            response.set_cookie('seen', '1')
+            return response
+
+        factory = RequestFactory()
+        for view in (with_token, with_cookie):
+            with self.subTest(view=view.__name__):
+                view = mock.Mock(wraps=view)
+                cached = pagecache.cache_anonymous(view)
+                for _ in range(2):
+                    request = factory.get('/')
+                    request.user = AnonymousUser()
+                    cached(request)
+                self.assertEqual(view.call_count, 2)
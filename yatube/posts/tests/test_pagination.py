@@ -0,0 +1,142 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client
+from django.test import TestCase
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Post
+from posts.pagination import CursorPaginator
+
+User = get_user_model()
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='userok')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'{i} пост') for i in range(25)
+        )
+        # Половина постов с одинаковой датой: порядок решает id
+        same_date = timezone.now()
+        Post.objects.filter(pk__lte=12).update(pub_date=same_date)
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True
+            )
+        )
+
+    def setUp(self):
+        # Число записей кешируется между тестами
+        cache.clear()
+
+    def walk(self, direction='next_cursor'):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        page = paginator.get_page()
+        pages = [page]
+        while getattr(paginator, direction):
+            cursor = getattr(paginator, direction)
+            paginator = CursorPaginator(Post.objects.all(), 10)
+            page = paginator.get_page(cursor)
+            pages.append(page)
+        return pages
+
+    def test_forward_walk_covers_all_posts(self):
+        """Переход по курсорам вперед выдает все посты без повторов."""
+        pages = self.walk()
+        self.assertEqual([page.number for page in pages], [1, 2, 3])
+        self.assertEqual(
+            [post.pk for page in pages for post in page], self.expected
+        )
+        self.assertFalse(pages[-1].has_next())
+
+    def test_backward_cursor(self):
+        """Курсор назад возвращает предыдущую страницу целиком."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        paginator.get_page()
+        second = CursorPaginator(Post.objects.all(), 10)
+        second.get_page(paginator.next_cursor)
+        back = CursorPaginator(Post.objects.all(), 10)
+        page = back.get_page(second.previous_cursor)
+        self.assertEqual(page.number, 1)
+        self.assertFalse(page.has_previous())
+        self.assertEqual([post.pk for post in page], self.expected[:10])
+
+    def test_page_is_single_query(self):
+        """Страница по курсору выбирается одним запросом без COUNT."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        paginator.get_page()
+        cursor = paginator.next_cursor
+        with self.assertNumQueries(1):
+            page = CursorPaginator(Post.objects.all(), 10).get_page(cursor)
+            self.assertTrue(page.has_next())
+            self.assertTrue(page.has_previous())
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Битый курсор приводит на первую страницу."""
+        page = CursorPaginator(Post.objects.all(), 10).get_page('broken')
+        self.assertEqual(page.number, 1)
+        self.assertEqual([post.pk for post in page], self.expected[:10])
+
+    def test_page_number_links_still_work(self):
+        """Старые ссылки ?page=N открывают нужную страницу."""
+        page = CursorPaginator(Post.objects.all(), 10).get_page(number=3)
+        self.assertEqual(page.number, 3)
+        self.assertEqual([post.pk for post in page], self.expected[20:])
+
+    def test_approximate_count_and_last_page(self):
+        """Приблизительный подсчет дает число страниц и последнюю."""
+        paginator = CursorPaginator(
+            Post.objects.all(), 10, approximate_count=True
+        )
+        paginator.get_page()
+        self.assertEqual(paginator.num_pages, 3)
+        last = CursorPaginator(
+            Post.objects.all(), 10, approximate_count=True
+        )
+        page = last.get_page(paginator.last_cursor)
+        self.assertEqual(page.number, 3)
+        self.assertFalse(page.has_next())
+        self.assertEqual([post.pk for post in page], self.expected[-10:])
+
+    def test_overestimated_count_has_no_next_page(self):
+        """Устаревшая оценка числа записей не дает ссылки в никуда."""
+        # Оценка 25 записей запоминается до удаления
+        CursorPaginator(
+            Post.objects.all(), 10, approximate_count=True
+        ).count
+        Post.objects.filter(pk__in=self.expected[:10]).delete()
+        paginator = CursorPaginator(
+            Post.objects.all(), 10, approximate_count=True
+        )
+        page = paginator.get_page(number=2)
+        self.assertEqual(paginator.num_pages, 2)
+        self.assertIsNone(paginator.next_cursor)
+        self.assertFalse(page.has_next())
+        response = Client().get(
+            reverse('posts:profile', kwargs={'username': 'userok'}),
+            {'page': 2},
+        )
+        self.assertNotContains(response, '?cursor=None')
+
+    @override_settings(PAGINATOR_APPROXIMATE_COUNT=False)
+    def test_views_emit_cursor_links(self):
+        """Навигация на странице ведет по курсорам."""
+        client = Client()
+        response = client.get(
+            reverse('posts:profile', kwargs={'username': 'userok'})
+        )
+        cursor = response.context['page_obj'].paginator.next_cursor
+        self.assertContains(response, f'?cursor={cursor}')
+        response = client.get(
+            reverse('posts:profile', kwargs={'username': 'userok'}),
+            {'cursor': cursor},
+        )
+        self.assertEqual(response.context['page_obj'].number, 2)
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            self.expected[10:20],
+        )
@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client
+from django.test import TestCase
+from django.test import override_settings
+from django.urls import reverse
+
+from posts.models import Comment
+from posts.models import Follow
+from posts.models import Group
+from posts.models import Post
+from posts.tests.utils import QueryBudgetMixin
+
+User = get_user_model()
+
+
+# Повтор одного запроса для каждого поста страницы - ошибка
+@override_settings(QUERY_STRICT=True, QUERY_REPEAT_LIMIT=2)
+class FeedQueryBudgetTests(QueryBudgetMixin, TestCase):
+    '''Число запросов страниц не зависит от числа постов на них.'''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        # У каждого поста свой автор и группа: так проявился бы N+1
+        for i in range(10):
+            author = User.objects.create_user(
+                username=f'author{i}', first_name='Имя', last_name=str(i)
+            )
+            group = Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{i}', description='-'
+            )
+            Follow.objects.create(user=cls.reader, author=author)
+            post = Post.objects.create(
+                author=author, group=group, text=f'Пост {i}'
+            )
+            Post.objects.create(author=author, group=cls.group, text='Пост')
+            Comment.objects.create(post=post, author=author, text='Ком')
+        cls.post = post
+        cls.client_reader = Client()
+        cls.client_reader.force_login(cls.reader)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_views_query_budget(self):
+        """Ленты укладываются в фиксированный бюджет запросов."""
+        budgets = {
+            reverse('posts:index'): 4,
+            reverse('posts:group_list', kwargs={'slug': 'group'}): 5,
+            reverse('posts:profile', kwargs={'username': 'author1'}): 7,
+            reverse('posts:follow_index'): 5,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}):
+                5,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                with self.assertMaxQueries(budget):
+                    response = self.client_reader.get(url)
+                self.assertEqual(response.status_code, 200)
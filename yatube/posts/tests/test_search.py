@@ -0,0 +1,134 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test import TestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment
+from posts.models import Post
+from posts.models import SearchTerm
+from posts.stemmer import terms
+
+User = get_user_model()
+
+
+class StemmerTests(TestCase):
+    def test_word_forms_share_stem(self):
+        """Формы одного слова дают один терм."""
+        self.assertEqual(
+            set(terms('книга книги книгах книгами')), {'книг'}
+        )
+
+    def test_stop_words_and_case(self):
+        """Служебные слова отбрасываются, регистр и ё не важны."""
+        self.assertEqual(
+            terms('Ёжик и КОТ в Python'), ['ежик', 'кот', 'python']
+        )
+
+
+@override_settings(SEARCH_BACKEND='fts5')
+class Fts5SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='userok')
+
+    def setUp(self):
+        self.cat = Post.objects.create(
+            author=self.user, text='Кошки любят спать на солнце'
+        )
+        self.dog = Post.objects.create(
+            author=self.user, text='Собака охраняет дом'
+        )
+
+    def found(self, query):
+        return [post.pk for post in search.search(query)]
+
+    def test_finds_other_word_forms(self):
+        """Запрос находит пост по другой форме слова."""
+        self.assertEqual(self.found('кошка'), [self.cat.pk])
+        self.assertEqual(self.found('собаки'), [self.dog.pk])
+        self.assertEqual(self.found('жираф'), [])
+
+    def test_all_terms_required(self):
+        """Пост находится, только если в нем есть все слова запроса."""
+        self.assertEqual(self.found('кошки солнце'), [self.cat.pk])
+        self.assertEqual(self.found('кошки дом'), [])
+
+    def test_comments_are_searched(self):
+        """Пост находится по тексту комментария; удаление убирает его."""
+        comment = Comment.objects.create(
+            post=self.dog, author=self.user, text='Отличный сторож'
+        )
+        self.assertEqual(self.found('сторожа'), [self.dog.pk])
+        self.assertEqual(self.found('собака сторож'), [self.dog.pk])
+        comment.delete()
+        self.assertEqual(self.found('сторож'), [])
+
+    def test_edit_and_delete_update_index(self):
+        """Правка и удаление поста сразу видны в поиске."""
+        self.cat.text = 'Коты любят рыбу'
+        self.cat.save()
+        self.assertEqual(self.found('солнце'), [])
+        self.assertEqual(self.found('рыба'), [self.cat.pk])
+        self.cat.delete()
+        self.assertEqual(self.found('рыба'), [])
+
+    def test_post_delete_removes_its_comments(self):
+        """Комментарии, удаленные вместе с постом, уходят из индекса."""
+        Comment.objects.create(
+            post=self.dog, author=self.user, text='Отличный сторож'
+        )
+        post_id = self.dog.pk
+        self.dog.delete()
+        if search.use_fts():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT COUNT(*) FROM {} WHERE post_id = %s'.format(
+                        search.FTS_TABLE
+                    ),
+                    [post_id],
+                )
+                self.assertEqual(cursor.fetchone(), (0,))
+        self.assertFalse(SearchTerm.objects.filter(term='сторож').exists())
+
+    def test_post_text_ranks_above_comment(self):
+        """Совпадение в тексте поста важнее совпадения в комментарии."""
+        Comment.objects.create(
+            post=self.dog, author=self.user, text='Похож на кошку'
+        )
+        self.assertEqual(self.found('кошка'), [self.cat.pk, self.dog.pk])
+
+    def test_rebuild_command(self):
+        """Команда перестраивает индекс по всем записям."""
+        Post.objects.filter(pk=self.cat.pk).update(text='Попугай')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.found('попугай'), [self.cat.pk])
+        self.assertEqual(self.found('кошки'), [])
+
+    def test_search_view(self):
+        """Страница поиска выводит найденные посты одним запросом."""
+        client = Client()
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(reverse('posts:search'), {'q': 'кошками'})
+        self.assertEqual(response.context['posts'], [self.cat])
+        self.assertContains(response, 'Кошки любят спать')
+        self.assertLessEqual(len(context), 3)
+
+
+@override_settings(SEARCH_BACKEND='table')
+class TableSearchTests(Fts5SearchTests):
+    def test_index_rows(self):
+        """Термы поста записываются в таблицу индекса."""
+        self.assertEqual(
+            set(SearchTerm.objects.filter(
+                post=self.dog
+            ).values_list('term', flat=True)),
+            {'собак', 'охраня', 'дом'},
+        )
@@ -0,0 +1,206 @@
+import shutil
+import tempfile
+from io import BytesIO
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.template import Context
+from django.template import Template
+from django.test import TestCase
+from django.test import override_settings
+
+from PIL import Image as PILImage
+
+from core import image_variants
+from core import thumbnails
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class PregeneratedThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='userok')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        caches['thumbnails'].clear()
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    def run_on_commit(self):
+        # TestCase не фиксирует транзакцию: выполняем отложенное сами
+        callbacks, connection.run_on_commit = connection.run_on_commit, []
+        for _, callback in callbacks:
+            callback()
+
+    def image_url(self):
+        return Template(
+            '{% load images %}'
+            '{% pregenerated_thumbnail post.image "960x339" as im %}'
+            '{{ im.url }}'
+        ).render(Context({'post': self.post}))
+
+    def test_original_is_served_until_thumbnail_is_ready(self):
+        """Пока миниатюры нет, выводится исходная картинка."""
+        self.assertEqual(self.image_url(), self.post.image.url)
+        thumbnails.generate(self.post.image.name)
+        url = self.image_url()
+        self.assertNotEqual(url, self.post.image.url)
+        self.assertTrue(url.startswith(settings.MEDIA_URL + 'cache/'))
+
+    def test_saving_post_schedules_generation(self):
+        """Миниатюры создаются после фиксации транзакции."""
+        self.assertIsNone(
+            thumbnails.cached_thumbnail(self.post.image, '960x339')
+        )
+        self.run_on_commit()
+        self.assertIsNotNone(
+            thumbnails.cached_thumbnail(self.post.image, '960x339')
+        )
+
+    def test_backfill_command(self):
+        """Команда создает миниатюры уже сохраненных картинок."""
+        call_command('backfill_thumbnails', workers=1, stdout=StringIO())
+        self.assertIsNotNone(
+            thumbnails.cached_thumbnail(self.post.image, '960x339')
+        )
+
+    def test_ready_variants_are_not_regenerated(self):
+        """Правка поста и повторный запуск команды не пережимают картинку."""
+        Post.objects.create(
+            author=self.user, text='Та же картинка', image=self.post.image
+        )
+        with mock.patch.object(
+            image_variants, 'generate', wraps=image_variants.generate
+        ) as generate:
+            call_command('backfill_thumbnails', workers=1, stdout=StringIO())
+            self.assertEqual(generate.call_count, 1)
+            self.post.text = 'Правка'
+            self.post.save()
+            self.run_on_commit()
+            call_command('backfill_thumbnails', workers=1, stdout=StringIO())
+            self.assertEqual(generate.call_count, 1)
+
+    def test_broken_image_is_not_rescheduled(self):
+        """Картинку, которую не удалось обработать, не ставят в очередь."""
+        self.run_on_commit()
+        broken = Post.objects.create(
+            author=self.user,
+            text='Битая картинка',
+            image=SimpleUploadedFile('broken.gif', b'not a gif', 'image/gif'),
+        )
+        with mock.patch.object(
+            thumbnails, 'generate', wraps=thumbnails.generate
+        ) as generate, self.assertLogs('core.thumbnails', 'ERROR'):
+            for _ in range(3):
+                thumbnails.schedule(broken.image)
+                self.run_on_commit()
+        self.assertEqual(generate.call_count, 1)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageVariantsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='userok')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        caches['thumbnails'].clear()
+        buffer = BytesIO()
+        PILImage.new('RGB', (1200, 800), 'red').save(buffer, 'PNG')
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Пост с большой картинкой',
+            image=SimpleUploadedFile('big.png', buffer.getvalue()),
+        )
+
+    def render(self):
+        return Template(
+            '{% load images %}'
+            '{% responsive_image post.image "feed" css_class="card-img" %}'
+        ).render(Context({'post': self.post}))
+
+    def test_variants_are_cropped_and_not_upscaled(self):
+        """Варианты обрезаны под кадр и не шире оригинала."""
+        manifest = image_variants.generate(self.post.image.name)
+        self.assertIn('jpeg', manifest['feed'])
+        for variants in manifest['feed'].values():
+            self.assertEqual(
+                [width for width, name in variants], [480, 960]
+            )
+            for width, name in variants:
+                with default_storage.open(name) as image_file:
+                    size = PILImage.open(image_file).size
+                self.assertEqual(size, (width, round(width * 339 / 960)))
+
+    def test_picture_tag(self):
+        """Тег выводит srcset после создания вариантов."""
+        self.assertNotIn('srcset', self.render())
+        self.assertIn(self.post.image.url, self.render())
+        image_variants.generate(self.post.image.name)
+        html = self.render()
+        self.assertIn('<picture>', html)
+        self.assertIn('.feed-480w.jpg 480w', html)
+        self.assertIn('.feed-960w.jpg 960w', html)
+        self.assertEqual(
+            html.count('<source'), len(image_variants.supported_formats()) - 1
+        )
+
+    def test_missing_manifest_is_cached(self):
+        """Отсутствие вариантов не ищется в хранилище при каждом выводе."""
+        with mock.patch.object(
+            default_storage, 'exists', wraps=default_storage.exists
+        ) as exists:
+            for _ in range(3):
+                self.assertIsNone(
+                    image_variants.get(self.post.image.name, 'feed')
+                )
+        self.assertEqual(exists.call_count, 1)
+        # Созданные варианты видны сразу, без ожидания TTL
+        image_variants.generate(self.post.image.name)
+        self.assertIsNotNone(
+            image_variants.get(self.post.image.name, 'feed')
+        )
+
+    def test_manifest_is_read_from_storage(self):
+        """Манифест находится и после очистки кеша."""
+        image_variants.generate(self.post.image.name)
+        caches['thumbnails'].clear()
+        self.assertIsNotNone(
+            image_variants.get(self.post.image.name, 'feed')
+        )
@@ -0,0 +1,230 @@
+import time
+from importlib import import_module
+from types import SimpleNamespace
+from unittest import mock
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.db import transaction
+from django.test import TestCase
+from django.test import TransactionTestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Follow
+from posts.models import Post
+from posts.models import Timeline
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.other = User.objects.create_user(username='other')
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def setUp(self):
+        # Список «знаменитостей» кешируется между тестами
+        cache.clear()
+
+    def feed_texts(self, user):
+        return set(timeline.feed(user).values_list('text', flat=True))
+
+    def test_new_post_is_fanned_out(self):
+        """Новый пост автора попадает в ленты подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(
+            Timeline.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertFalse(Timeline.objects.filter(user=self.other).exists())
+
+    def test_follow_and_unfollow_keep_timeline_consistent(self):
+        """Подписка добавляет старые посты, отписка убирает их."""
+        Post.objects.create(author=self.author, text='Старый пост')
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'author'}
+        ))
+        self.assertEqual(self.feed_texts(self.reader), {'Старый пост'})
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'author'}
+        ))
+        self.assertEqual(self.feed_texts(self.reader), set())
+        self.assertFalse(Timeline.objects.filter(user=self.reader).exists())
+
+    def test_deleted_post_leaves_timeline(self):
+        """Удаленный пост исчезает из ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Пост')
+        post.delete()
+        self.assertFalse(Timeline.objects.filter(user=self.reader).exists())
+
+    @override_settings(FOLLOW_FANOUT_THRESHOLD=1)
+    def test_celebrity_posts_are_read_on_demand(self):
+        """Посты автора с большим числом подписчиков не рассылаются."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        Post.objects.create(author=self.author, text='Пост знаменитости')
+        self.assertFalse(
+            Timeline.objects.filter(post__author=self.author).exists()
+        )
+        self.assertEqual(
+            self.feed_texts(self.reader), {'Пост знаменитости'}
+        )
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['subscription'], 'posts_found')
+        self.assertEqual(len(response.context['page_obj']), 1)
+
+    @override_settings(FOLLOW_FANOUT_THRESHOLD=1)
+    def test_celebrities_expire(self):
+        """Список знаменитостей пересчитывается по истечении TTL."""
+        self.assertEqual(timeline.celebrities(), frozenset())
+        # bulk_create не шлет сигналы: так подписки меняет другой процесс
+        Follow.objects.bulk_create([
+            Follow(user=self.reader, author=self.author),
+            Follow(user=self.other, author=self.author),
+        ])
+        self.assertEqual(timeline.celebrities(), frozenset())
+        later = time.time() + settings.FOLLOW_CELEBRITIES_CACHE_TIMEOUT + 1
+        with mock.patch('time.time', return_value=later):
+            self.assertEqual(
+                timeline.celebrities(), frozenset([self.author.pk])
+            )
+
+    @override_settings(FOLLOW_FANOUT_THRESHOLD=1)
+    def test_author_below_threshold_is_backfilled(self):
+        """Когда подписчиков стало меньше порога, ленты достраиваются."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        Post.objects.create(author=self.author, text='Пост знаменитости')
+        Follow.objects.filter(user=self.other, author=self.author).delete()
+        self.assertTrue(Timeline.objects.filter(user=self.reader).exists())
+        self.assertEqual(
+            self.feed_texts(self.reader), {'Пост знаменитости'}
+        )
+
+    def test_migration_backfills_existing_follows(self):
+        """Миграция заполняет ленты подписок, созданных до Timeline."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Старый пост')
+        Timeline.objects.all().delete()
+        migration = import_module('posts.migrations.0007_backfill_timeline')
+        # Функции миграции нужно только соединение редактора схемы
+        migration.backfill_timelines(
+            apps, SimpleNamespace(connection=connection)
+        )
+        self.assertEqual(
+            list(Timeline.objects.values_list('user', 'post')),
+            [(self.reader.pk, post.pk)],
+        )
+
+    def test_follow_index_without_posts(self):
+        """Подписки есть, а постов нет."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['subscription'], 'zero_posts')
+
+
+class FollowFeedCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.second_author = User.objects.create_user(username='second')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.other = User.objects.create_user(username='other')
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+        cls.other_client = Client()
+        cls.other_client.force_login(cls.other)
+
+    def setUp(self):
+        cache.clear()
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.second_author)
+        Post.objects.create(author=self.author, text='Пост автора')
+        Post.objects.create(author=self.second_author, text='Пост второго')
+
+    def feed(self, client):
+        return client.get(reverse('posts:follow_index'))
+
+    def test_users_do_not_share_cached_page(self):
+        """Два пользователя на первой странице видят свои ленты."""
+        self.assertContains(self.feed(self.reader_client), 'Пост автора')
+        response = self.feed(self.other_client)
+        self.assertContains(response, 'Пост второго')
+        self.assertNotContains(response, 'Пост автора')
+
+    def test_cached_page_skips_feed_query(self):
+        """Повторный запрос ленты не выбирает посты из базы."""
+        self.feed(self.reader_client)
+        with CaptureQueriesContext(connection) as context:
+            self.feed(self.reader_client)
+        self.assertFalse(
+            any('posts_post' in query['sql'] for query in context)
+        )
+
+    def test_new_post_of_followed_author_invalidates(self):
+        """Новый пост автора из подписок сразу виден в ленте."""
+        self.feed(self.reader_client)
+        Post.objects.create(author=self.author, text='Свежий пост')
+        self.assertContains(self.feed(self.reader_client), 'Свежий пост')
+
+    def test_edited_and_deleted_posts_invalidate(self):
+        """Правка и удаление поста сбрасывают кеш ленты."""
+        self.feed(self.reader_client)
+        post = Post.objects.get(text='Пост автора')
+        post.text = 'Исправленный пост'
+        post.save()
+        self.assertContains(
+            self.feed(self.reader_client), 'Исправленный пост'
+        )
+        post.delete()
+        self.assertNotContains(
+            self.feed(self.reader_client), 'Исправленный пост'
+        )
+
+    def test_author_rename_invalidates(self):
+        """Новое имя автора из подписок сразу видно в ленте."""
+        self.feed(self.reader_client)
+        self.author.first_name = 'Лев'
+        self.author.save()
+        self.assertContains(self.feed(self.reader_client), 'Лев')
+
+    def test_follow_set_change_invalidates(self):
+        """Подписка на нового автора сразу меняет ленту."""
+        self.feed(self.reader_client)
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'second'}
+        ))
+        self.assertContains(self.feed(self.reader_client), 'Пост второго')
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'second'}
+        ))
+        self.assertNotContains(self.feed(self.reader_client), 'Пост второго')
+
+
+class FollowFeedCommitTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_version_changes_after_commit(self):
+        """Лента, закешированная до фиксации поста, устаревает после нее."""
+        with transaction.atomic():
+            Post.objects.create(author=self.author, text='Пост')
+            during = timeline.feed_version(self.reader.pk)
+        self.assertNotEqual(during, timeline.feed_version(self.reader.pk))
@@ -0,0 +1,143 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import search
+from posts import transfer
+from posts.models import AuthorStats
+from posts.models import Comment
+from posts.models import Follow
+from posts.models import Group
+from posts.models import Post
+from posts.models import Timeline
+
+User = get_user_model()
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupt_after(calls):
+    '''Подмена save_checkpoint, которая падает после calls вызовов.'''
+    save = transfer.save_checkpoint
+    state = {'calls': 0}
+
+    def save_checkpoint(path, data):
+        save(path, data)
+        state['calls'] += 1
+        if state['calls'] == calls:
+            raise Interrupted
+    return mock.patch.object(transfer, 'save_checkpoint', save_checkpoint)
+
+
+class TransferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', password='secret'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        for i in range(5):
+            Post.objects.create(
+                author=cls.author,
+                group=cls.group if i % 2 else None,
+                # Кавычки и переводы строк проверяют экранирование CSV
+                text='Пост "{}",\nвторая строка про котов'.format(i),
+                image='posts/{}.jpg'.format(i) if i == 3 else '',
+            )
+        for post in Post.objects.all():
+            Comment.objects.create(
+                post=post, author=cls.reader, text='Комментарий'
+            )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def snapshot(self):
+        return {
+            name: list(model.objects.order_by('pk').values_list(*fields))
+            for name, model, fields in transfer.TABLES
+        }
+
+    def export(self, directory=None, **options):
+        call_command(
+            'yatube_export',
+            directory or self.directory,
+            stdout=StringIO(),
+            **options,
+        )
+
+    def clear(self):
+        Group.objects.all().delete()
+        User.objects.all().delete()
+
+    def import_(self, **options):
+        call_command('yatube_import', self.directory, stdout=StringIO(),
+                     **options)
+
+    def assert_round_trip(self, data_format):
+        expected = self.snapshot()
+        self.export(format=data_format, chunk_size=2)
+        self.clear()
+        self.import_(batch_size=2)
+        self.assertEqual(self.snapshot(), expected)
+        # Производные данные пересчитаны после bulk_create
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.author).post_count, 5
+        )
+        self.assertEqual(Timeline.objects.filter(user=self.reader).count(), 5)
+        self.assertEqual(len(search.search('коты')), 5)
+
+    def test_round_trip_jsonl(self):
+        """Выгрузка в JSON Lines загружается без потерь."""
+        self.assert_round_trip('jsonl')
+
+    def test_round_trip_csv(self):
+        """Выгрузка в CSV загружается без потерь."""
+        self.assert_round_trip('csv')
+
+    def test_export_resumes_from_checkpoint(self):
+        """Прерванная выгрузка продолжается и дает те же файлы."""
+        full = os.path.join(self.directory, 'full')
+        self.export(full, format='csv', chunk_size=2)
+        partial = os.path.join(self.directory, 'partial')
+        with interrupt_after(4), self.assertRaises(Interrupted):
+            self.export(partial, format='csv', chunk_size=2)
+        self.export(partial, format='csv', chunk_size=2, resume=True)
+        for name, _, _ in transfer.TABLES:
+            file_name = transfer.file_name(name, 'csv')
+            with open(os.path.join(full, file_name), 'rb') as expected, \
+                    open(os.path.join(partial, file_name), 'rb') as actual:
+                self.assertEqual(actual.read(), expected.read())
+        self.assertFalse(os.path.exists(
+            os.path.join(partial, transfer.EXPORT_CHECKPOINT)
+        ))
+
+    def test_import_resumes_from_checkpoint(self):
+        """Прерванная загрузка продолжается без дублей."""
+        expected = self.snapshot()
+        self.export(chunk_size=2)
+        self.clear()
+        with interrupt_after(5), self.assertRaises(Interrupted):
+            self.import_(batch_size=2)
+        self.assertLess(Comment.objects.count(), 5)
+        self.import_(batch_size=2, resume=True)
+        self.assertEqual(self.snapshot(), expected)
+
+    def test_images_exported_by_reference(self):
+        """Картинка выгружается путем в MEDIA_ROOT, а не содержимым."""
+        self.export()
+        with open(os.path.join(self.directory, 'posts.jsonl')) as posts:
+            self.assertIn('"image":"posts/3.jpg"', posts.read())
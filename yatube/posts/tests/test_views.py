@@ -1,8 +1,10 @@
 from django.contrib.auth import get_user_model
 from django.test import Client
 from django.test import TestCase
+from django.test import TransactionTestCase
 from django.urls import reverse
 from django.core.cache import cache
+from django.db import transaction
 from django import forms
 
 from posts.models import Group
@@ -10,6 +12,7 @@ from posts.models import Post
 from posts.models import Follow
 from posts.models import Comment
 from posts.forms import PostForm
+from posts.caching import feed_generation
 
 User = get_user_model()
 
@@ -319,19 +322,20 @@ class PostViewsTests(TestCase):
         first_cache = self.authorized_client.get(reverse(
             'posts:index')
         ).content
-        # Удаляем крайний пост
-        self.authorized_client.get(reverse(
+        # Меняем текст крайнего поста в обход сигналов модели
+        last_post = self.authorized_client.get(reverse(
             'posts:index')
-        ).context['page_obj'][0].delete()
-        # Убеждаемся что количество постов уменьшилось
-        self.assertEqual(Post.objects.count(), object_count - 1)
-        # Cравниваем получаемый контент, зная что крайнего поста уже нет в БД
+        ).context['page_obj'][0]
+        Post.objects.filter(pk=last_post.pk).update(text='Мимо кеша')
+        # Cравниваем получаемый контент: страница отдается из кэша
         self.assertEqual(first_cache, self.authorized_client.get(reverse(
             'posts:index')
         ).content)
-        # Чистим Кэш
-        cache.clear()
-        # Теперь содержимое контента не должно быть равно первоначальному
+        # Удаляем крайний пост
+        last_post.delete()
+        # Убеждаемся что количество постов уменьшилось
+        self.assertEqual(Post.objects.count(), object_count - 1)
+        # Удаление поста сбрасывает кэш, ждать его истечения не нужно
         self.assertNotEqual(first_cache, self.authorized_client.get(reverse(
             'posts:index')
         ).content)
@@ -408,3 +412,76 @@ class PostViewsTests(TestCase):
             'zero_authors'
         )
         self.assertEqual(len(response.context['page_obj']), 0)
+
+
+class IndexGenerationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            slug='group', title='Группа', description='Описание'
+        )
+        Post.objects.create(author=cls.user, text='Пост', group=cls.group)
+        cls.guest_client = Client()
+
+    def setUp(self):
+        cache.clear()
+
+    def index(self):
+        return self.guest_client.get(reverse('posts:index'))
+
+    def test_new_post_is_visible_at_once(self):
+        """Новый пост виден на главной без ожидания истечения кеша."""
+        self.index()
+        Post.objects.create(author=self.user, text='Свежий пост')
+        self.assertContains(self.index(), 'Свежий пост')
+
+    def test_author_name_change_invalidates(self):
+        """Смена имени автора сбрасывает кеш главной."""
+        self.index()
+        self.user.last_name = 'Достоевский'
+        self.user.save()
+        self.assertContains(self.index(), 'Достоевский')
+
+    def test_new_comment_updates_count_in_cached_feeds(self):
+        """Число комментариев в закешированных лентах не устаревает."""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.user)
+        reader_client = Client()
+        reader_client.force_login(reader)
+        pages = [
+            (self.guest_client, reverse('posts:index')),
+            (reader_client, reverse('posts:index')),
+            (reader_client, reverse('posts:follow_index')),
+        ]
+        for client, url in pages:
+            self.assertContains(client.get(url), 'Комментариев: 0')
+        Comment.objects.create(
+            post=Post.objects.get(text='Пост'), author=reader, text='Ого'
+        )
+        for client, url in pages:
+            with self.subTest(url=url):
+                self.assertContains(client.get(url), 'Комментариев: 1')
+
+    def test_last_login_does_not_invalidate(self):
+        """Вход пользователя на сайт не сбрасывает кеш главной."""
+        first = self.index().context['index_generation']
+        self.user.save(update_fields=['last_login'])
+        # Повторный запрос гостя отдается из кеша страниц без контекста
+        self.assertEqual(first, feed_generation())
+
+
+class IndexGenerationCommitTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+
+    def test_generation_changes_after_commit(self):
+        """Главная, закешированная до фиксации поста, устаревает после."""
+        with transaction.atomic():
+            Post.objects.create(author=self.user, text='Пост')
+            during = feed_generation()
+        self.assertNotEqual(during, feed_generation())
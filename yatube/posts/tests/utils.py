@@ -0,0 +1,26 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    '''Проверка верхней границы числа SQL-запросов для TestCase.'''
+
+    @contextmanager
+    def assertMaxQueries(self, number, using=DEFAULT_DB_ALIAS):
+        with CaptureQueriesContext(connections[using]) as context:
+            yield context
+        executed = len(context)
+        queries = '\n'.join(
+            '{}. {}'.format(i, query['sql'])
+            for i, query in enumerate(context.captured_queries, start=1)
+        )
+        self.assertLessEqual(
+            executed,
+            number,
+            'Выполнено {} запросов при бюджете {}:\n{}'.format(
+                executed, number, queries
+            ),
+        )
@@ -0,0 +1,204 @@
+'''
+Лента подписок с рассылкой при записи (fan-out on write).
+
+Новый пост автора копируется в таблицу Timeline каждого подписчика,
+поэтому чтение ленты не зависит от числа подписок. Посты авторов,
+у которых подписчиков больше FOLLOW_FANOUT_THRESHOLD, не рассылаются,
+а подмешиваются в ленту при чтении (fan-out on read).
+
+Кеш ленты подписок версионирован для каждого пользователя: версия
+меняется, когда автор из подписок публикует, правит или удаляет пост
+и когда меняется набор подписок. Старые записи кеша просто перестают
+читаться и вытесняются по TTL. Версия меняется еще раз после фиксации
+транзакции: лента, прочитанная до фиксации, не переживет изменения.
+'''
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.db.models import Q
+
+from core.cache import bump_generations_on_commit
+from core.cache import generations
+
+from .models import Follow
+from .models import Post
+from .models import Timeline
+
+CELEBRITIES_KEY = 'timeline_celebrities:{}'
+FEED_VERSION_KEY = 'follow_feed:{}'
+# Версия для постов, которые читаются при запросе (fan-out on read)
+CELEBRITY_VERSION = FEED_VERSION_KEY.format('celebrities')
+
+
+def celebrities():
+    '''Авторы, чьи посты читаются при запросе, а не рассылаются.'''
+    threshold = settings.FOLLOW_FANOUT_THRESHOLD
+    key = CELEBRITIES_KEY.format(threshold)
+    authors = cache.get(key)
+    if authors is None:
+        authors = frozenset(
+            Follow.objects.values('author').annotate(
+                followers=Count('pk')
+            ).filter(
+                followers__gt=threshold
+            ).values_list('author', flat=True)
+        )
+        cache.set(key, authors, settings.FOLLOW_CELEBRITIES_CACHE_TIMEOUT)
+    return authors
+
+
+def _insert(entries):
+    batch_size = settings.FOLLOW_FANOUT_BATCH_SIZE
+    entries = iter(entries)
+    batch = list(islice(entries, batch_size))
+    while batch:
+        Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+        batch = list(islice(entries, batch_size))
+
+
+def feed_version(user_id):
+    '''Текущая версия кеша ленты подписок пользователя.'''
+    return generations(FEED_VERSION_KEY.format(user_id), CELEBRITY_VERSION)
+
+
+def invalidate_feeds(user_ids):
+    '''Сбрасывает кеш лент подписок пользователей.'''
+    bump_generations_on_commit(
+        *(FEED_VERSION_KEY.format(user_id) for user_id in user_ids)
+    )
+
+
+def invalidate_author_feeds(author_id):
+    '''Сбрасывает кеш лент всех подписчиков автора.'''
+    if author_id in celebrities():
+        bump_generations_on_commit(CELEBRITY_VERSION)
+        return
+    invalidate_feeds(
+        Follow.objects.filter(
+            author=author_id
+        ).values_list('user', flat=True)
+    )
+
+
+def fan_out(posts):
+    '''Рассылает новые посты по лентам подписчиков их авторов.'''
+    skip = celebrities()
+    by_author = defaultdict(list)
+    for post in posts:
+        if post.author_id in skip:
+            bump_generations_on_commit(CELEBRITY_VERSION)
+        else:
+            by_author[post.author_id].append(post.pk)
+    if not by_author:
+        return
+    followers = Follow.objects.filter(
+        author__in=by_author
+    ).values_list('author', 'user')
+    users = set()
+    entries = []
+    for author_id, user_id in followers.iterator():
+        users.add(user_id)
+        entries.extend(
+            Timeline(user_id=user_id, post_id=post_id)
+            for post_id in by_author[author_id]
+        )
+    _insert(entries)
+    invalidate_feeds(users)
+
+
+def backfill(user_id, author_id):
+    '''Добавляет в ленту пользователя все посты автора.'''
+    if author_id in celebrities():
+        return
+    post_ids = Post.objects.filter(
+        author=author_id
+    ).values_list('pk', flat=True).iterator()
+    _insert(
+        Timeline(user_id=user_id, post_id=post_id) for post_id in post_ids
+    )
+
+
+def rebuild():
+    '''
+    Достраивает ленты всех подписчиков, например после загрузки
+    подписок и постов через bulk_create, который не шлет сигналы.
+    '''
+    cache.delete(CELEBRITIES_KEY.format(settings.FOLLOW_FANOUT_THRESHOLD))
+    # Все записи лент создаются одним INSERT ... SELECT, без передачи
+    # строк через Python
+    entries = Post.objects.filter(
+        author__following__isnull=False
+    ).exclude(
+        author__in=celebrities()
+    ).order_by().values_list('author__following__user', 'pk')
+    select, params = entries.query.sql_with_params()
+    ops = connection.ops
+    with connection.cursor() as cursor:
+        cursor.execute(
+            '{} {} (user_id, post_id) {}{}'.format(
+                ops.insert_statement(ignore_conflicts=True),
+                ops.quote_name(Timeline._meta.db_table),
+                select,
+                ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+            ),
+            params,
+        )
+    bump_generations_on_commit(CELEBRITY_VERSION)
+    users = Follow.objects.values_list(
+        'user', flat=True
+    ).distinct().iterator()
+    batch_size = settings.FOLLOW_FANOUT_BATCH_SIZE
+    batch = list(islice(users, batch_size))
+    while batch:
+        invalidate_feeds(batch)
+        batch = list(islice(users, batch_size))
+
+
+def _check_threshold(author_id, followed):
+    # Автор перешел порог рассылки: сбрасываем кеш знаменитостей,
+    # а при переходе вниз достраиваем ленты всех его подписчиков
+    threshold = settings.FOLLOW_FANOUT_THRESHOLD
+    followers = Follow.objects.filter(author=author_id).count()
+    if followed and followers == threshold + 1:
+        cache.delete(CELEBRITIES_KEY.format(threshold))
+    elif not followed and followers == threshold:
+        cache.delete(CELEBRITIES_KEY.format(threshold))
+        users = Follow.objects.filter(
+            author=author_id
+        ).values_list('user', flat=True)
+        for user_id in users:
+            backfill(user_id, author_id)
+
+
+def follow(user_id, author_id):
+    '''Подписка: посты автора попадают в ленту пользователя.'''
+    _check_threshold(author_id, followed=True)
+    backfill(user_id, author_id)
+    invalidate_feeds([user_id])
+
+
+def unfollow(user_id, author_id):
+    '''Отписка: посты автора убираются из ленты пользователя.'''
+    Timeline.objects.filter(user=user_id, post__author=author_id).delete()
+    _check_threshold(author_id, followed=False)
+    invalidate_feeds([user_id])
+
+
+def feed(user):
+    '''Посты ленты подписок пользователя.'''
+    condition = Q(timeline_entries__user=user)
+    skip = celebrities()
+    if skip:
+        # Подзапросы вместо JOIN, чтобы посты не дублировались
+        condition = Q(
+            pk__in=Timeline.objects.filter(user=user).values('post')
+        ) | Q(
+            author__in=Follow.objects.filter(
+                user=user, author__in=skip
+            ).values('author')
+        )
+    return Post.objects.filter(condition)
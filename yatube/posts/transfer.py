@@ -0,0 +1,256 @@
+'''
+Потоковая выгрузка и загрузка данных (команды yatube_export
+и yatube_import).
+
+Каждая таблица выгружается в свой файл <таблица>.jsonl (JSON Lines)
+или <таблица>.csv. Строки читаются из базы по возрастанию ключа
+итератором и записываются в файл по одной, а загружаются пачками
+через bulk_create, поэтому память не зависит от объема данных.
+Картинки постов не копируются: в файле остается путь в MEDIA_ROOT.
+
+После каждой пачки в файл контрольной точки записывается, докуда
+дошла работа: для выгрузки - последний ключ и размер файла, для
+загрузки - смещение в файле. Прерванную команду можно продолжить
+с этого места (--resume).
+'''
+import csv
+import json
+import os
+from contextlib import contextmanager
+from io import StringIO
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.color import no_style
+from django.db import connection
+from django.db import transaction
+from django.db.models import Max
+
+from . import pagecache
+from . import timeline
+from .caching import invalidate_comments
+from .caching import invalidate_posts
+from .models import Comment
+from .models import Follow
+from .models import Group
+from .models import Post
+
+User = get_user_model()
+
+FORMATS = ('jsonl', 'csv')
+EXPORT_CHECKPOINT = 'export.checkpoint.json'
+IMPORT_CHECKPOINT = 'import.checkpoint.json'
+# Текст поста в CSV может быть длиннее ограничения модуля csv
+CSV_FIELD_SIZE_LIMIT = 64 * 1024 * 1024
+
+# Таблицы в порядке загрузки: сначала те, на которые ссылаются.
+# Первым полем идет первичный ключ
+TABLES = (
+    ('users', User, (
+        'id', 'username', 'password', 'first_name', 'last_name', 'email',
+        'is_active', 'is_staff', 'is_superuser', 'last_login',
+        'date_joined',
+    )),
+    ('groups', Group, ('id', 'title', 'slug', 'description')),
+    ('posts', Post, (
+        'id', 'text', 'pub_date', 'author_id', 'group_id', 'image',
+        'comment_count', 'last_comment_at',
+    )),
+    ('comments', Comment, ('id', 'post_id', 'author_id', 'text', 'created')),
+    ('follows', Follow, ('id', 'user_id', 'author_id')),
+)
+
+
+def file_name(table, data_format):
+    return '{}.{}'.format(table, data_format)
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as checkpoint:
+        return json.load(checkpoint)
+
+
+def save_checkpoint(path, state):
+    # Файл заменяется целиком: прерванная запись не испортит его
+    with open(path + '.tmp', 'w') as checkpoint:
+        json.dump(state, checkpoint)
+    os.replace(path + '.tmp', path)
+
+
+def _dump(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def _jsonl_line(fields, row):
+    return json.dumps(
+        dict(zip(fields, map(_dump, row))),
+        ensure_ascii=False,
+        separators=(',', ':'),
+    ) + '\n'
+
+
+def _csv_line(row):
+    buffer = StringIO()
+    csv.writer(buffer).writerow(
+        '' if value is None else _dump(value) for value in row
+    )
+    return buffer.getvalue()
+
+
+def bounds():
+    '''
+    Наибольшие ключи таблиц в начале выгрузки. Строки, добавленные
+    позже, не выгружаются: иначе комментарий мог бы попасть в выгрузку
+    без своего поста.
+    '''
+    return {
+        name: model._base_manager.aggregate(upto=Max('pk'))['upto'] or 0
+        for name, model, _ in TABLES
+    }
+
+
+def export_table(path, model, fields, data_format, chunk_size, state, upto):
+    '''
+    Дописывает в файл path строки модели с ключом больше state['pk']
+    и не больше upto. Генератор: после каждой пачки отдает новое
+    состояние выгрузки.
+    '''
+    with open(path, 'r+b' if state['offset'] else 'wb') as output:
+        # Строки, записанные после контрольной точки, выгрузятся снова
+        output.truncate(state['offset'])
+        output.seek(state['offset'])
+        if data_format == 'csv' and not state['offset']:
+            output.write(_csv_line(fields).encode())
+        rows = model._base_manager.filter(
+            pk__gt=state['pk'], pk__lte=upto
+        ).order_by('pk').values_list(*fields).iterator(chunk_size)
+        for batch in _batches(rows, chunk_size):
+            for row in batch:
+                if data_format == 'csv':
+                    line = _csv_line(row)
+                else:
+                    line = _jsonl_line(fields, row)
+                output.write(line.encode())
+            output.flush()
+            state = {'pk': batch[-1][0], 'offset': output.tell()}
+            yield state
+
+
+def _jsonl_records(source):
+    for line in source:
+        if line.strip():
+            yield json.loads(line.decode()), source.tell()
+
+
+def _csv_records(source, offset):
+    csv.field_size_limit(max(csv.field_size_limit(), CSV_FIELD_SIZE_LIMIT))
+    lines = (line.decode() for line in source)
+    reader = csv.reader(lines)
+    columns = next(reader)
+    if offset:
+        source.seek(offset)
+    # Строка CSV может занимать несколько строк файла: модуль csv
+    # читает их по одной, поэтому позиция файла - конец записи
+    for row in reader:
+        if row:
+            yield dict(zip(columns, row)), source.tell()
+
+
+def _convert(model, columns, record, data_format):
+    values = {}
+    for attname, value in record.items():
+        field = columns[attname]
+        if data_format == 'csv' and value == '' and field.null:
+            value = None
+        if field.remote_field is not None:
+            field = field.target_field
+        values[attname] = None if value is None else field.to_python(value)
+    return model(**values)
+
+
+@contextmanager
+def keep_dates(model):
+    '''
+    Отключает auto_now_add у полей модели: иначе bulk_create заменит
+    заданные даты текущим временем.
+    '''
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def import_table(path, model, fields, data_format, batch_size, offset):
+    '''
+    Загружает записи модели из файла path, начиная со смещения offset.
+    Генератор: после каждой пачки отдает число загруженных записей
+    и новое смещение.
+    '''
+    columns = {
+        field.attname: field for field in model._meta.concrete_fields
+        if field.attname in fields
+    }
+    with open(path, 'rb') as source:
+        if data_format == 'csv':
+            records = _csv_records(source, offset)
+        else:
+            source.seek(offset)
+            records = _jsonl_records(source)
+        for batch in _batches(records, batch_size):
+            objs = [
+                _convert(model, columns, record, data_format)
+                for record, _ in batch
+            ]
+            # Уже загруженные записи (например, после сбоя между
+            # фиксацией и контрольной точкой) пропускаются
+            with keep_dates(model), transaction.atomic():
+                model._base_manager.bulk_create(objs, ignore_conflicts=True)
+            yield len(objs), batch[-1][1]
+
+
+def reset_sequences():
+    '''Сдвигает счетчики ключей за загруженные явно ключи.'''
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), [model for _, model, _ in TABLES]
+    )
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def rebuild_derived():
+    '''
+    Пересчитывает то, что обычно обновляют обработчики posts.signals:
+    bulk_create сигналы не шлет.
+    '''
+    for command in (
+        'reconcile_post_counts',
+        'reconcile_comment_counts',
+        'rebuild_search_index',
+    ):
+        # Расхождения по каждой строке здесь не интересны
+        call_command(command, stdout=StringIO())
+    timeline.rebuild()
+    invalidate_posts()
+    invalidate_comments()
+    pagecache.purge_all()
@@ -7,12 +7,22 @@ app_name = 'posts'
 urlpatterns = [
     # Главная страница
     path('', views.index, name='index'),
+    # Самые обсуждаемые посты
+    path('discussed/', views.discussed, name='discussed'),
     # Страница на которой будут посты, отфильтрованные по группам
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     # Профайл пользователя
     path('profile/<str:username>/', views.profile, name='profile'),
     # Просмотр записи
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    # Поиск по постам и комментариям
+    path('search/', views.post_search, name='search'),
+    # Следующая порция комментариев к посту (фрагмент страницы)
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     # Cтраница для редактирования постов
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     # Cтраница для публикации постов
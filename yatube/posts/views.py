@@ -1,9 +1,13 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.shortcuts import render
 from django.shortcuts import get_object_or_404
 from django.shortcuts import redirect
 from django.conf import settings
+from django.db import transaction
+
+from core.concurrency import run_concurrently
+from core.routers import pins_primary
+from core.routers import replica_reads
 
 from .models import Post
 from .models import Group
@@ -12,36 +16,86 @@ from .models import User
 from .models import Comment
 from .forms import PostForm
 from .forms import CommentForm
+from . import counters
+from . import pagecache
+from . import search
+from .caching import feed_generation
+from . import timeline
+from .pagination import CursorPaginator
+from .conditional import conditional
+from .conditional import feed_validators
+from .conditional import post_validators
+from .conditional import profile_validators
 
 
-def paginator(post_list, num_disp, request):
-    return Paginator(
-        post_list, num_disp
-    ).get_page(request.GET.get('page'))
+def paginator(post_list, num_disp, request, keys=('pub_date', 'pk')):
+    '''Страница ленты по курсору (?cursor=) или номеру (?page=)'''
+    return CursorPaginator(
+        post_list,
+        num_disp,
+        keys=keys,
+        approximate_count=settings.PAGINATOR_APPROXIMATE_COUNT,
+    ).get_page(request.GET.get('cursor'), request.GET.get('page'))
 
 
+@replica_reads
+@conditional(feed_validators)
+@pagecache.cache_anonymous
 def index(request):
     '''Представление главной старницы'''
     template = 'posts/index.html'
-    post_list = Post.objects.all()
-    num_disp = settings.NUM_DISP_POSTS_INDEX
-    page_obj = paginator(post_list, num_disp, request)
+    # Поколение меняется при изменении постов, групп, имен авторов
+    # и комментариев, поэтому закешированная страница не устаревает
+    # по времени
+    index_generation = feed_generation()
+    pagecache.tag(request, 'index')
+    post_list = Post.objects.for_feed()
+    page_obj = CursorPaginator(
+        post_list,
+        settings.NUM_DISP_POSTS_INDEX,
+        approximate_count=settings.PAGINATOR_APPROXIMATE_COUNT,
+        cache_key='index:{}'.format(index_generation),
+        cache_timeout=settings.INDEX_CACHE_TIMEOUT,
+    ).get_page(request.GET.get('cursor'), request.GET.get('page'))
+    pagecache.tag_posts(request, page_obj)
     context = {
         'page_obj': page_obj,
+        'index_generation': index_generation,
+        'cache_timeout': settings.INDEX_CACHE_TIMEOUT,
     }
     return render(request, template, context)
 
 
+@replica_reads
+def discussed(request):
+    '''Лента самых обсуждаемых постов'''
+    template = 'posts/discussed.html'
+    # Порядок по счетчику комментариев поддержан индексом
+    # posts_post_discussed_idx, страницы выбираются по ключу
+    page_obj = paginator(
+        Post.objects.for_feed(),
+        settings.NUM_DISP_POSTS_INDEX,
+        request,
+        keys=('comment_count', 'pk'),
+    )
+    return render(request, template, {'page_obj': page_obj})
+
+
+@replica_reads
+@conditional(feed_validators)
+@pagecache.cache_anonymous
 def group_posts(request, slug):
     '''
     Представление страницы с сообществами
     Cтраница, на которой будут посты, отфильтрованные по группам.
     '''
     template = 'posts/group_list.html'
+    pagecache.tag(request, 'group:{}'.format(slug))
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    post_list = group.posts.for_feed()
     num_disp = settings.NUM_DISP_POSTS_GR_POSTS
     page_obj = paginator(post_list, num_disp, request)
+    pagecache.tag_posts(request, page_obj)
     context = {
         'group': group,
         'slug': slug,
@@ -50,35 +104,72 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@replica_reads
+@conditional(profile_validators)
+@pagecache.cache_anonymous
 def profile(request, username):
     '''Представление страницы профайла'''
     template = 'posts/profile.html'
     user = get_object_or_404(User, username=username)
-    post_list = user.posts.all()
-    count_user_posts = post_list.count()
+    pagecache.tag(request, 'author:{}'.format(user.pk))
+    post_list = user.posts.for_feed()
     num_disp = settings.NUM_DISP_POSTS_PROFILE
-    page_obj = paginator(post_list, num_disp, request)
+    # Страница постов, счетчик и подписка не зависят друг от друга
+    calls = [
+        lambda: paginator(post_list, num_disp, request),
+        lambda: counters.post_count(user),
+    ]
+    if not request.user.is_anonymous:
+        follower_user = request.user
+        calls.append(lambda: Follow.objects.filter(
+            user=follower_user,
+            author=user).exists())
+    page_obj, count_user_posts, *following = run_concurrently(*calls)
+    pagecache.tag_posts(request, page_obj)
     context = {
         'username': user,
         'page_obj': page_obj,
         'count_user_posts': count_user_posts
     }
-    if not request.user.is_anonymous:
-        follower_user = request.user
-        following = Follow.objects.filter(
-            user=follower_user,
-            author=user).exists()
-        context['following'] = following
+    if following:
+        context['following'] = following[0]
     return render(request, template, context)
 
 
+def comments_page(post_id, cursor):
+    '''Порция комментариев поста по курсору на (created, id)'''
+    comment_list = Comment.objects.filter(
+        post=post_id
+    ).select_related('author').only('text', 'created', 'author__username')
+    return CursorPaginator(
+        comment_list,
+        settings.NUM_DISP_COMMENTS,
+        keys=('created', 'pk'),
+    ).get_page(cursor)
+
+
+@replica_reads
+@conditional(post_validators)
+@pagecache.cache_anonymous
 def post_detail(request, post_id):
     '''Представление отдельного поста'''
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
-    count_user_posts = post.author.posts.count()
+    pagecache.tag(request, 'post:{}'.format(post_id))
+    # Комментарии выбираются по ключу поста одновременно с ним
+    post, comments = run_concurrently(
+        lambda: get_object_or_404(
+            Post.objects.select_related('author', 'group'), pk=post_id
+        ),
+        lambda: comments_page(post_id, request.GET.get('comments')),
+    )
+    count_user_posts = counters.post_count(post.author)
     form = CommentForm()
-    comments = Comment.objects.filter(post=post_id)
+    # Страница выводит число постов автора и имена комментаторов
+    pagecache.tag_posts(request, [post])
+    pagecache.tag(request, 'author:{}'.format(post.author_id), *(
+        pagecache.name_tag('author:{}'.format(comment.author_id))
+        for comment in comments
+    ))
     context = {
         'post': post,
         'count_user_posts': count_user_posts,
@@ -89,6 +180,30 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+@replica_reads
+def post_comments(request, post_id):
+    '''Фрагмент со следующей порцией комментариев поста'''
+    template = 'posts/includes/comments.html'
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'post': post,
+        'comments': comments_page(post_id, request.GET.get('cursor')),
+    }
+    return render(request, template, context)
+
+
+def post_search(request):
+    '''Полнотекстовый поиск по постам и комментариям'''
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    context = {
+        'query': query,
+        'posts': search.search(query) if query else [],
+    }
+    return render(request, template, context)
+
+
+@pins_primary
 @login_required
 def post_create(request):
     '''Страница создания поста'''
@@ -100,11 +215,14 @@ def post_create(request):
     if request.method == 'POST' and form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        # Пост и счетчики автора сохраняются в одной транзакции
+        with transaction.atomic():
+            post.save()
         return redirect('posts:profile', username=post.author)
     return render(request, template, {'form': form})
 
 
+@pins_primary
 @login_required
 def post_edit(request, post_id):
     '''Страница редактирования поста'''
@@ -129,6 +247,7 @@ def post_edit(request, post_id):
     return redirect('posts:post_detail', post_id)
 
 
+@pins_primary
 @login_required
 def add_comment(request, post_id):
     '''Обработчик добавления комментария'''
@@ -139,31 +258,49 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        # Комментарий, счетчики поста и индекс поиска записываются
+        # одной транзакцией: одна блокировка записи и одна фиксация
+        with transaction.atomic():
+            comment.save()
     return redirect(template, post_id=post_id)
 
 
+@replica_reads
 @login_required
 def follow_index(request):
     '''Страница с подписками'''
     template = 'posts/follow.html'
     follower_user = request.user
-    post_list = Post.objects.filter(author__following__user=follower_user)
-    num_disp = settings.NUM_DISP_FOLLOW
-    page_obj = paginator(post_list, num_disp, request)
-    context = {'page_obj': page_obj}
+    # Лента собирается заранее при публикации постов (posts.timeline),
+    # страница кешируется под версией ленты пользователя и поколением
+    # лент: в ней выводятся имена авторов, группы и число комментариев
+    feed_version = '{}.{}'.format(
+        timeline.feed_version(follower_user.pk), feed_generation()
+    )
+    post_list = timeline.feed(follower_user).for_feed()
+    page_obj = CursorPaginator(
+        post_list,
+        settings.NUM_DISP_FOLLOW,
+        cache_key='follow:{}:{}'.format(follower_user.pk, feed_version),
+        cache_timeout=settings.FOLLOW_FEED_CACHE_TIMEOUT,
+    ).get_page(request.GET.get('cursor'), request.GET.get('page'))
+    context = {
+        'page_obj': page_obj,
+        'feed_version': feed_version,
+        'cache_timeout': settings.FOLLOW_FEED_CACHE_TIMEOUT,
+    }
+    # Проверяем что у авторов, на которых подписаны, есть посты
+    if page_obj.object_list:
+        context['subscription'] = 'posts_found'
     # Проверяем что есть подписки
-    if Follow.objects.filter(user=follower_user).exists():
-        # Проверяем что у авторов, на которых подписаны, есть посты
-        if post_list.count() > 0:
-            context['subscription'] = 'posts_found'
-        else:
-            context['subscription'] = 'zero_posts'
+    elif Follow.objects.filter(user=follower_user).exists():
+        context['subscription'] = 'zero_posts'
     else:
         context['subscription'] = 'zero_authors'
     return render(request, template, context)
 
 
+@pins_primary
 @login_required
 def profile_follow(request, username):
     '''Подписаться на Автора'''
@@ -180,6 +317,7 @@ def profile_follow(request, username):
     return redirect('posts:profile', username=author.username)
 
 
+@pins_primary
 @login_required
 def profile_unfollow(request, username):
     '''Отписка от Автора'''
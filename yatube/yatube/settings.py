@@ -49,11 +49,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым, чтобы замерять работу всех остальных
+    'core.middleware.PerformanceMiddleware',
+    'core.middleware.QueryLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -65,7 +69,8 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Бэкенд Django, который замеряет время вывода шаблонов
+        'BACKEND': 'core.template_backends.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -86,12 +91,83 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Профиль базы выбирается переменной окружения YATUBE_DB_ENGINE:
+# sqlite - файл SQLite (по умолчанию),
+# postgresql - PostgreSQL, параметры подключения в YATUBE_DB_NAME,
+# YATUBE_DB_USER, YATUBE_DB_PASSWORD, YATUBE_DB_HOST и YATUBE_DB_PORT.
+# Если PostgreSQL доступен через пул соединений PgBouncer в режиме
+# транзакций, задайте YATUBE_DB_POOLER=pgbouncer.
+DB_ENGINE = os.getenv('YATUBE_DB_ENGINE', 'sqlite')
+DB_POOLER = os.getenv('YATUBE_DB_POOLER', '')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение живет между запросами столько секунд
+        'CONN_MAX_AGE': int(os.getenv('YATUBE_DB_CONN_MAX_AGE', 60)),
+        # Перед запросом долгоживущее соединение проверяется,
+        # оборванное закрывается (см. core.db)
+        'CONN_HEALTH_CHECKS': True,
     }
 }
+if DB_ENGINE == 'postgresql':
+    DATABASES['default'].update({
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('YATUBE_DB_NAME', 'yatube'),
+        'USER': os.getenv('YATUBE_DB_USER', 'yatube'),
+        'PASSWORD': os.getenv('YATUBE_DB_PASSWORD', ''),
+        'HOST': os.getenv('YATUBE_DB_HOST', 'localhost'),
+        'PORT': os.getenv('YATUBE_DB_PORT', '5432'),
+        'OPTIONS': {'connect_timeout': 5},
+    })
+    if DB_POOLER == 'pgbouncer':
+        # Серверные курсоры не переживают смену соединения PgBouncer
+        # между транзакциями
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+else:
+    DATABASES['default'].update({
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv(
+            'YATUBE_DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')
+        ),
+        # Сколько секунд ждать освобождения блокировки записи
+        'OPTIONS': {'timeout': 20},
+    })
+
+# Реплики базы только для чтения: YATUBE_DB_REPLICAS - файлы SQLite
+# или хосты PostgreSQL через запятую. С реплик читают ленты и страница
+# поста (см. core.routers), в тестах реплики совпадают с основной базой
+DATABASE_REPLICAS = []
+REPLICA_LOCATIONS = os.getenv('YATUBE_DB_REPLICAS', '')
+for number, location in enumerate(
+    filter(None, REPLICA_LOCATIONS.split(',')), start=1
+):
+    alias = 'replica{}'.format(number)
+    DATABASES[alias] = dict(
+        DATABASES['default'], TEST={'MIRROR': 'default'}
+    )
+    if DB_ENGINE == 'postgresql':
+        DATABASES[alias]['HOST'] = location.strip()
+    else:
+        DATABASES[alias]['NAME'] = location.strip()
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после записи пользователь читает с основной базы
+REPLICA_PIN_SECONDS = 10
+# Наибольшее отставание реплик, с: запрос, прочитавший поколение
+# кеша моложе этого, читает с основной базы (см. core.routers)
+REPLICA_LAG_SECONDS = 10
+
+# Настройки SQLite, которые выполняются на каждом новом соединении:
+# журнал WAL не блокирует чтение во время записи, synchronous=NORMAL
+# в режиме WAL сбрасывает на диск только контрольные точки, файл базы
+# читается через mmap, а занятая база ожидается busy_timeout мс
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 20000,
+}
 
 
 # Password validation
@@ -153,6 +229,32 @@ NUM_DISP_POSTS_GR_POSTS = 10
 NUM_DISP_POSTS_PROFILE = 10
 # Страница с постами на которые подписан пользователь(follow_index)
 NUM_DISP_FOLLOW = 10
+# Комментарии на странице поста и в каждой догружаемой порции
+NUM_DISP_COMMENTS = 20
+# Записей на странице JSON API (posts.api)
+API_PAGE_SIZE = 50
+# Сколько постов или комментариев можно создать одним запросом к API
+API_BATCH_LIMIT = 100
+
+# Живые обновления (posts.live): сколько последних событий помнит
+# процесс для переподключившихся клиентов
+LIVE_BUFFER = 1000
+# Через сколько секунд тишины в поток отправляется пустой комментарий
+LIVE_HEARTBEAT = 15
+# Сколько секунд держится один поток до переподключения клиента
+LIVE_STREAM_SECONDS = 60
+# Пауза перед переподключением EventSource, мс
+LIVE_RETRY_MS = 3000
+# Пауза перед переподключением, если мест для потоков нет, мс
+LIVE_BUSY_RETRY_MS = 30000
+# Сколько секунд ждет событий запрос long-poll
+LIVE_POLL_TIMEOUT = 5
+# Сколько потоков событий и long-poll могут одновременно ждать
+# в потоках сервера (WSGI) и в цикле событий сервера ASGI
+LIVE_MAX_STREAMS = int(os.getenv('YATUBE_LIVE_MAX_STREAMS', 8))
+LIVE_MAX_ASYNC_STREAMS = int(
+    os.getenv('YATUBE_LIVE_MAX_ASYNC_STREAMS', 1000)
+)
 
 # Имя view-функции, обрабатывающей ошибку 403
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
@@ -161,9 +263,189 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-# Подключение бэкенда кеширования
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Подключение бэкенда кеширования.
+# Бэкенд выбирается переменной окружения YATUBE_CACHE_BACKEND:
+# locmem - память процесса (по умолчанию, для разработки и тестов),
+# file - файлы на диске, общие для всех процессов сервера,
+# redis - Redis через пакет django-redis,
+# memcached - memcached через пакет python-memcached.
+# Адрес сервера или каталог задается в YATUBE_CACHE_LOCATION.
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django_redis.cache.RedisCache',
+    'memcached': 'django.core.cache.backends.memcached.MemcachedCache',
+}
+CACHE_BACKEND = os.getenv('YATUBE_CACHE_BACKEND', 'locmem')
+CACHE_LOCATION = os.getenv(
+    'YATUBE_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+)
+
+
+def cache_alias(alias, timeout=300):
+    '''Настройки кеша с псевдонимом alias и счетчиками попаданий.'''
+    if CACHE_BACKEND == 'locmem':
+        location = alias
+    elif CACHE_BACKEND == 'file':
+        location = os.path.join(CACHE_LOCATION, alias)
+    else:
+        location = CACHE_LOCATION
+    return {
+        'BACKEND': 'core.cache_backends.StatsCache',
+        'LOCATION': location,
+        # Псевдонимы на одном сервере не пересекаются по ключам
+        'KEY_PREFIX': alias,
+        'TIMEOUT': timeout,
+        'OPTIONS': {
+            'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+            'ALIAS': alias,
+        },
     }
+
+
+CACHES = {
+    # Поколения, счетчики и прочие небольшие служебные значения
+    'default': cache_alias('default'),
+    # Фрагменты шаблонов и закешированные страницы лент
+    'fragments': cache_alias('fragments'),
+    # Сессии пользователей (поверх базы данных)
+    'sessions': cache_alias('sessions', timeout=60 * 60 * 24 * 14),
+    # Хранилище ключей sorl-thumbnail
+    'thumbnails': cache_alias('thumbnails', timeout=60 * 60 * 24 * 30),
 }
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+THUMBNAIL_CACHE = 'thumbnails'
+# Миниатюры картинок постов, которые создаются заранее (core.thumbnails):
+# размер и опции sorl-thumbnail для каждого размера
+THUMBNAIL_SIZES = {
+    '960x339': {'crop': 'center', 'upscale': True},
+}
+# Создавать миниатюры в фоновых потоках (False - сразу при сохранении)
+THUMBNAIL_ASYNC = True
+# Число фоновых потоков, создающих миниатюры
+THUMBNAIL_WORKERS = 2
+# Сколько секунд не пытаться снова создать миниатюры картинки,
+# которую не удалось обработать (например, битого файла)
+THUMBNAIL_FAILURE_TIMEOUT = 60 * 60
+# Адаптивные варианты картинок постов (core.image_variants): пропорции
+# кадра, ширины вариантов в пикселях и атрибут sizes для srcset
+IMAGE_VARIANTS = {
+    'feed': {
+        'size': (960, 339),
+        'widths': (480, 960, 1440),
+        'sizes': '(max-width: 960px) 100vw, 960px',
+    },
+}
+# Форматы вариантов в порядке предпочтения; последний выводится в <img>
+# для старых браузеров, форматы без поддержки в Pillow пропускаются
+IMAGE_VARIANT_FORMATS = ('avif', 'webp', 'jpeg')
+IMAGE_VARIANT_QUALITY = 80
+# Сколько секунд помнить, что манифеста вариантов картинки нет,
+# чтобы вывод страницы не проверял хранилище каждый раз
+IMAGE_VARIANT_MISSING_TIMEOUT = 60
+
+# Постраничное разбиение по курсору (posts.pagination.CursorPaginator):
+# показывать ли приблизительное число страниц в навигации
+PAGINATOR_APPROXIMATE_COUNT = True
+# Как долго (в секундах) хранится в кеше посчитанное число записей
+PAGINATOR_COUNT_CACHE_TIMEOUT = 60
+
+# Лента подписок (posts.timeline): посты авторов, у которых подписчиков
+# больше порога, не рассылаются по лентам, а читаются при запросе
+FOLLOW_FANOUT_THRESHOLD = 1000
+# Размер пачки при массовой записи в ленты
+FOLLOW_FANOUT_BATCH_SIZE = 500
+# Время жизни (в секундах) кеша списка авторов выше порога: сброс
+# при переходе порога виден только своему процессу, остальные процессы
+# пересчитают список не позже чем через это время
+FOLLOW_CELEBRITIES_CACHE_TIMEOUT = 60
+# Время жизни (в секундах) кеша страниц ленты подписок; кеш сбрасывается
+# при новых постах авторов из подписок и при изменении подписок
+FOLLOW_FEED_CACHE_TIMEOUT = 300
+# Время жизни (в секундах) кеша главной страницы; кеш сбрасывается
+# сменой поколения при изменении постов, групп и имен авторов
+INDEX_CACHE_TIMEOUT = 600
+# Кеш целых страниц лент и постов для гостей (posts.pagecache): алиас
+# кеша и время жизни страницы (в секундах); устаревшие страницы
+# сбрасываются по меткам сразу при изменении записей
+PAGE_CACHE_ALIAS = 'fragments'
+PAGE_CACHE_TIMEOUT = 600
+# Версия выпуска входит в ETag лент и страниц постов (posts.conditional)
+# и в ключи кеша страниц: после выкладки с измененными шаблонами
+# браузеры и гости получат новые страницы
+ETAG_VERSION = os.getenv('YATUBE_RELEASE', '1')
+
+# Полнотекстовый поиск (posts.search): fts5 - таблица FTS5 в SQLite,
+# table - обратный индекс в таблице SearchTerm, auto - FTS5, если
+# база SQLite и таблица FTS5 создана миграцией
+SEARCH_BACKEND = os.getenv('YATUBE_SEARCH_BACKEND', 'auto')
+# Сколько самых релевантных постов выводит страница поиска
+SEARCH_RESULTS_LIMIT = 20
+
+# Метрики производительности запросов (core.performance):
+# сколько последних замеров каждого представления хранить в сводке
+PERFORMANCE_WINDOW = 1000
+# Добавлять ли к ответам заголовок Server-Timing
+PERFORMANCE_SERVER_TIMING = True
+# Сколько самых медленных представлений показывать персоналу
+PERFORMANCE_SLOWEST_LIMIT = 20
+
+# Потоки для одновременных запросов представлений (core.concurrency);
+# у каждого потока свое соединение с базой, 0 - выполнять по очереди
+VIEW_THREADS = int(os.getenv('YATUBE_VIEW_THREADS', 4))
+# Потоки, в которых точка входа ASGI (yatube/asgi.py) выполняет
+# обработчик Django
+ASGI_THREADS = int(os.getenv('YATUBE_ASGI_THREADS', 32))
+# Отдельные потоки, в которых читаются части потоковых ответов:
+# долгие потоки не отнимают потоки у обычных запросов
+ASGI_STREAM_THREADS = int(os.getenv('YATUBE_ASGI_STREAM_THREADS', 8))
+
+# Журнал запросов к базе (core.queries): сколько раз один запрос
+# (с точностью до параметров) может выполниться за запрос к сайту
+QUERY_REPEAT_LIMIT = int(os.getenv('YATUBE_QUERY_REPEAT_LIMIT', 5))
+# Лимиты отдельных представлений: {'posts:index': 3}
+QUERY_REPEAT_LIMITS = {}
+# Запросы дольше этого (мс) попадают в журнал медленных запросов
+SLOW_QUERY_THRESHOLD_MS = int(os.getenv('YATUBE_SLOW_QUERY_MS', 100))
+# Строгий режим: превышение лимита повторов - ошибка (для тестов)
+QUERY_STRICT = os.getenv('YATUBE_QUERY_STRICT', '') == '1'
+# Файл журнала медленных запросов (строки JSON); без него - stderr
+SLOW_QUERY_LOG = os.getenv('YATUBE_SLOW_QUERY_LOG', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+        'slow_queries': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'plain',
+        },
+    },
+    'loggers': {
+        'core.queries': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'core.queries.slow': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+if SLOW_QUERY_LOG:
+    LOGGING['handlers']['slow_queries'] = {
+        # Переоткрывает файл после ротации logrotate
+        'class': 'logging.handlers.WatchedFileHandler',
+        'filename': SLOW_QUERY_LOG,
+        'formatter': 'plain',
+    }